@@ -47,31 +47,253 @@
     if (lastHighlighted) updateHighlight(lastHighlighted);
   }, { passive: true });
 
+  // Scroll indicator: the controller's scroll engine (python_controller/scroll.py)
+  // reports its velocity as {"type": "scroll", "velocity", "speed", "source"}
+  // whenever it changes noticeably and once when it stops (velocity 0).
+  // Units are wheel units/s, + = up, 120 = one notch.
+  const SCROLL_BADGE_ID = 'voiceclick-scroll-indicator';
+  function makeScrollBadge() {
+    let el = document.getElementById(SCROLL_BADGE_ID);
+    if (!el) {
+      el = document.createElement('div');
+      el.id = SCROLL_BADGE_ID;
+      el.style.position = 'fixed';
+      el.style.right = '12px';
+      el.style.top = '50%';
+      el.style.zIndex = '2147483647';
+      el.style.pointerEvents = 'none';
+      el.style.padding = '4px 8px';
+      el.style.borderRadius = '4px';
+      el.style.font = '12px sans-serif';
+      el.style.color = '#fff';
+      el.style.background = 'rgba(0,150,255,0.9)';
+      el.style.opacity = '0';
+      el.style.transition = 'opacity 0.15s ease';
+      document.body.appendChild(el);
+    }
+    return el;
+  }
+  const scrollBadge = makeScrollBadge();
+
+  function showScroll(msg) {
+    const v = Number(msg.velocity) || 0;
+    if (v === 0) {
+      scrollBadge.style.opacity = '0';
+      return;
+    }
+    const notches = Math.abs(v) / 120;
+    scrollBadge.textContent = (v > 0 ? '\u25B2 ' : '\u25BC ') + notches.toFixed(1) + '/s' +
+      (msg.source ? ' (' + msg.source + ')' : '');
+    scrollBadge.style.opacity = '1';
+  }
+
+  // Clickable-element index: every clickable element gets a stable id and its
+  // label is pushed to the controller (python_controller/page_index.py), first
+  // in full and then as diffs from a MutationObserver. Voice targets are
+  // resolved there and come back as {"command", "target_id"}. Only done when
+  // the welcome says the server accepts "labels" (the embedded relay with a
+  // page index); the Node relay would just broadcast them to everyone.
+  const CLICKABLE = "button, a, input[type='submit'], input[type='button'], [role='button'], [aria-label], [title]";
+  const MAX_LABEL = 80;
+  const FLUSH_MS = 250;
+  const idOf = new WeakMap();   // element -> id
+  const byId = new Map();       // id -> element
+  const labels = new Map();     // id -> last label sent
+  let nextId = 1;
+  let dirtyAdd = new Set();     // elements to (re)label
+  let dirtyRemove = new Set();  // ids whose element left the DOM
+  let flushTimer = null;
+  let indexing = false;         // the server takes our labels
+
+  function labelOf(el) {
+    const text = el.getAttribute("aria-label") || el.innerText || el.value || el.title || "";
+    return text.trim().replace(/\s+/g, " ").slice(0, MAX_LABEL);
+  }
+
+  function clickableIn(node) {
+    if (node.nodeType !== Node.ELEMENT_NODE) return [];
+    const found = Array.from(node.querySelectorAll(CLICKABLE));
+    if (node.matches(CLICKABLE)) found.push(node);
+    return found;
+  }
+
+  function elementId(el) {
+    let id = idOf.get(el);
+    if (!id) {
+      id = "vk" + (nextId++);
+      idOf.set(el, id);
+      byId.set(id, el);
+    }
+    return id;
+  }
+
+  function collect(els) {
+    const add = [];
+    for (const el of els) {
+      if (!el.isConnected) continue;
+      const id = elementId(el);
+      const label = labelOf(el);
+      if (labels.get(id) === label) continue;
+      labels.set(id, label);
+      add.push({ id, label });
+    }
+    return add;
+  }
+
+  function send(msg) {
+    if (ws.readyState === WebSocket.OPEN) ws.send(JSON.stringify(msg));
+  }
+
+  function sendAll() {
+    labels.clear();
+    dirtyAdd.clear();
+    dirtyRemove.clear();
+    const add = collect(document.querySelectorAll(CLICKABLE));
+    send({ type: "labels", reset: true, focused: document.hasFocus(), add, remove: [] });
+  }
+
+  function flush() {
+    flushTimer = null;
+    const remove = [];
+    for (const id of dirtyRemove) {
+      const el = byId.get(id);
+      if (el && el.isConnected) continue;   // moved, not removed
+      byId.delete(id);
+      if (labels.delete(id)) remove.push(id);
+    }
+    const add = collect(dirtyAdd);
+    dirtyAdd = new Set();
+    dirtyRemove = new Set();
+    if (add.length || remove.length) send({ type: "labels", reset: false, add, remove });
+  }
+
+  const observer = new MutationObserver((mutations) => {
+    for (const m of mutations) {
+      if (m.type === "childList") {
+        m.addedNodes.forEach(n => clickableIn(n).forEach(el => dirtyAdd.add(el)));
+        m.removedNodes.forEach(n => clickableIn(n).forEach(el => {
+          const id = idOf.get(el);
+          if (id) dirtyRemove.add(id);
+        }));
+      }
+      // text or attribute change: relabel the clickable element it belongs to
+      const target = m.target.nodeType === Node.ELEMENT_NODE ? m.target : m.target.parentElement;
+      const owner = target && target.closest(CLICKABLE);
+      if (owner) dirtyAdd.add(owner);
+    }
+    if (flushTimer === null) flushTimer = setTimeout(flush, FLUSH_MS);
+  });
+
+  function clickByText(command) {
+    // fallback when the controller has no index for this page (e.g. Node relay)
+    const text = command.replace(/^click\s+/, "");
+    const selectors = ["button", "a", "input[type='submit']", "input[type='button']"];
+    const allEls = selectors.flatMap(sel => Array.from(document.querySelectorAll(sel)));
+    let el = allEls.find(e => (e.innerText || e.value || "").trim().toLowerCase() === command);
+    if (!el) el = allEls.find(e => (e.innerText || e.value || "").trim().toLowerCase() === text);
+    if (!el) el = allEls.find(e => (e.innerText || e.value || "").toLowerCase().includes(text));
+    if (!el) el = Array.from(document.querySelectorAll("[aria-label], [title]")).find(e => ((e.getAttribute("aria-label")||e.title)||"").toLowerCase().includes(text));
+    return el;
+  }
+
+  // Acknowledgements: every message with a seq is acked with the time it took
+  // effect here (hover: the next painted frame; commands: after the click), so
+  // the controller can measure capture -> DOM latency. Acks are batched, and
+  // only sent when the welcome says the server reads them (the Node relay
+  // doesn't; it would broadcast them to everyone).
+  const ACK_FLUSH_MS = 100;
+  let acksOn = false;
+  let pendingAcks = [];
+  let ackTimer = null;
+
+  function now() {
+    return performance.timeOrigin + performance.now();
+  }
+
+  function flushAcks() {
+    ackTimer = null;
+    if (pendingAcks.length) send({ type: "ack", acks: pendingAcks });
+    pendingAcks = [];
+  }
+
+  function ack(seq, flushNow) {
+    if (!acksOn || seq === undefined) return;
+    pendingAcks.push([seq, now()]);
+    if (flushNow) {
+      if (ackTimer !== null) clearTimeout(ackTimer);
+      flushAcks();
+    } else if (ackTimer === null) {
+      ackTimer = setTimeout(flushAcks, ACK_FLUSH_MS);
+    }
+  }
+
   // WebSocket connection (for commands from Python)
   const ws = new WebSocket("ws://localhost:8765");
-  ws.addEventListener('open', () => console.log("content.js: ws open"));
+  ws.addEventListener('open', () => {
+    console.log("content.js: ws open");
+    send({ type: "hello", role: "page", hover_formats: ["json"], topics: ["hover", "command", "scroll"], acks: true });
+  });
+
+  function startIndexing() {
+    if (indexing) return;
+    indexing = true;
+    sendAll();
+    observer.observe(document.documentElement, {
+      childList: true, subtree: true, characterData: true,
+      attributes: true, attributeFilter: ["aria-label", "title", "value"]
+    });
+  }
+
+  window.addEventListener('focus', () => {
+    if (indexing) send({ type: "page_focus" });
+  });
   ws.addEventListener('message', (evt) => {
     try {
       const msg = JSON.parse(evt.data);
-      if (!msg.command) return;
+      if (msg.type === "welcome") {
+        acksOn = msg.acks === true;
+        if (Array.isArray(msg.accepts) && msg.accepts.includes("labels")) startIndexing();
+        return;
+      }
+      if (msg.station !== undefined) {
+        // an extra camera station (python_controller/session.py) is not this
+        // page's user; relays shouldn't send us its traffic, ignore it if they do
+        return;
+      }
+      if (msg.type === "ping") {
+        send({ type: "pong", t0: msg.t0, t1: now() });
+        return;
+      }
+      if (msg.type === "scroll") {
+        showScroll(msg);
+        requestAnimationFrame(() => ack(msg.seq, false));
+        return;
+      }
+      if (!msg.command) {
+        // hover: the OS cursor (and with it the highlight) has moved; ack once painted
+        if (msg.x !== undefined) requestAnimationFrame(() => ack(msg.seq, false));
+        return;
+      }
       const command = msg.command.toLowerCase().trim();
       console.log("content.js command:", command);
-      // The existing click-by-text logic (unchanged)
-      const selectors = ["button", "a", "input[type='submit']", "input[type='button']"];
-      const allEls = selectors.flatMap(sel => Array.from(document.querySelectorAll(sel)));
-      let el = allEls.find(e => (e.innerText || e.value || "").trim().toLowerCase() === command);
-      if (!el) el = allEls.find(e => (e.innerText || e.value || "").toLowerCase().includes(command));
-      if (!el) el = Array.from(document.querySelectorAll("[aria-label], [title]")).find(e => ((e.getAttribute("aria-label")||e.title)||"").toLowerCase().includes(command));
+      let el = msg.target_id ? byId.get(msg.target_id) : null;
+      if (!el || !el.isConnected) el = clickByText(command);
       if (el) {
         el.click();
         console.log("content.js: clicked element", el);
       } else {
         console.warn("content.js: no element found for", command);
       }
+      ack(msg.seq, true);
     } catch (err) {
       console.error("content.js parse error", err, evt.data);
     }
   });
-  ws.addEventListener('close', () => console.log("content.js: ws closed"));
+  ws.addEventListener('close', () => {
+    console.log("content.js: ws closed");
+    observer.disconnect();
+    indexing = false;
+    acksOn = false;
+  });
   ws.addEventListener('error', (e) => console.error("content.js: ws error", e));
 })();
@@ -0,0 +1,318 @@
+# actuation.py
+"""
+Input actuation backends
+------------------------
+Everything that moves the real cursor goes through one of these, so the
+gesture/voice pipelines can run against a recording stub in replay and CI.
+
+  move(x, y)      absolute screen position
+  click()
+  scroll(amount)  + = up, - = down (120 = one wheel notch)
+  size()          (width, height) of the screen
+
+Backends:
+- UinputActuator: virtual absolute pointer via evdev/uinput (Linux, needs
+  write access to /dev/uinput; works under X11 and Wayland)
+- XTestActuator: XTest fake input via python-xlib (X11)
+- PyAutoGuiActuator: portable fallback, with its tweening and pauses off
+- RecordingActuator: records calls, for replay and tests
+- NullActuator: drops everything, for camera stations that only feed the
+  extension (session.py)
+
+ThreadedActuator wraps any of them so the camera loop never waits on the
+display: calls are queued to an actuation thread and moves that pile up
+are merged into the newest position.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+from metrics import NULL_METRICS
+
+WHEEL_DELTA = 120   # scroll units per wheel notch
+
+
+def _notches(amount):
+    """Scroll amount -> whole wheel notches (at least one, keeps the sign)."""
+    n = max(1, round(abs(amount) / WHEEL_DELTA))
+    return n if amount > 0 else -n
+
+
+class UinputActuator:
+    """Absolute virtual pointer; no tweening, no sleeps."""
+
+    scroll_resolution = 1       # hi-res wheel takes any delta
+
+    def __init__(self, screen_size, name="voicekind-pointer"):
+        from evdev import AbsInfo, UInput, ecodes
+        self._e = ecodes
+        self.screen_size = tuple(screen_size)
+        w, h = self.screen_size
+        caps = {
+            ecodes.EV_KEY: [ecodes.BTN_LEFT, ecodes.BTN_RIGHT],
+            ecodes.EV_ABS: [(ecodes.ABS_X, AbsInfo(0, 0, w - 1, 0, 0, 0)),
+                            (ecodes.ABS_Y, AbsInfo(0, 0, h - 1, 0, 0, 0))],
+            ecodes.EV_REL: [ecodes.REL_WHEEL, ecodes.REL_WHEEL_HI_RES],
+        }
+        self._ui = UInput(caps, name=name)
+        self._wheel_rest = 0        # hi-res units not yet sent as a legacy notch
+
+    def size(self):
+        return self.screen_size
+
+    def move(self, x, y):
+        e = self._e
+        self._ui.write(e.EV_ABS, e.ABS_X, int(x))
+        self._ui.write(e.EV_ABS, e.ABS_Y, int(y))
+        self._ui.syn()
+
+    def click(self):
+        e = self._e
+        self._ui.write(e.EV_KEY, e.BTN_LEFT, 1)
+        self._ui.syn()
+        self._ui.write(e.EV_KEY, e.BTN_LEFT, 0)
+        self._ui.syn()
+
+    def scroll(self, amount):
+        e = self._e
+        # hi-res wheel uses the same 120-per-notch units; legacy clients read REL_WHEEL
+        amount = int(amount)
+        self._ui.write(e.EV_REL, e.REL_WHEEL_HI_RES, amount)
+        self._wheel_rest += amount
+        notches = int(self._wheel_rest / WHEEL_DELTA)
+        if notches:
+            self._wheel_rest -= notches * WHEEL_DELTA
+            self._ui.write(e.EV_REL, e.REL_WHEEL, notches)
+        self._ui.syn()
+
+    def close(self):
+        self._ui.close()
+
+
+class XTestActuator:
+    """X11 XTest fake input; each call is one flush, no sleeps."""
+
+    scroll_resolution = WHEEL_DELTA     # core X only knows whole notches
+
+    def __init__(self, display=None):
+        from Xlib import X, display as xdisplay
+        from Xlib.ext import xtest
+        self._X = X
+        self._xtest = xtest
+        self._d = xdisplay.Display(display)
+        screen = self._d.screen()
+        self.screen_size = (screen.width_in_pixels, screen.height_in_pixels)
+
+    def size(self):
+        return self.screen_size
+
+    def move(self, x, y):
+        self._xtest.fake_input(self._d, self._X.MotionNotify, x=int(x), y=int(y))
+        self._d.flush()
+
+    def _button(self, button, times=1):
+        for _ in range(times):
+            self._xtest.fake_input(self._d, self._X.ButtonPress, button)
+            self._xtest.fake_input(self._d, self._X.ButtonRelease, button)
+        self._d.flush()
+
+    def click(self):
+        self._button(1)
+
+    def scroll(self, amount):
+        n = _notches(amount)
+        self._button(4 if n > 0 else 5, abs(n))
+
+    def close(self):
+        self._d.close()
+
+
+class PyAutoGuiActuator:
+    # pyautogui takes wheel deltas on Windows but whole clicks elsewhere
+    scroll_resolution = 1 if sys.platform == "win32" else WHEEL_DELTA
+
+    def __init__(self, move_duration=0.0, pause=0.0):
+        import pyautogui    # needs a display; only imported when actually used
+        self._pg = pyautogui
+        self._pg.PAUSE = pause      # pyautogui sleeps this long after every call by default
+        self.move_duration = move_duration
+
+    def size(self):
+        return tuple(self._pg.size())
+
+    def move(self, x, y):
+        try:
+            self._pg.moveTo(x, y, duration=self.move_duration)
+        except Exception:
+            pass
+
+    def click(self):
+        self._pg.click()
+
+    def scroll(self, amount):
+        self._pg.scroll(amount if sys.platform == "win32" else _notches(amount))
+
+    def close(self):
+        pass
+
+
+class RecordingActuator:
+    """Does nothing but remember what it was asked to do."""
+
+    scroll_resolution = 1
+
+    def __init__(self, screen_size=(1920, 1080), clock=time.time):
+        self.screen_size = tuple(screen_size)
+        self.clock = clock
+        self.events = []
+
+    def size(self):
+        return self.screen_size
+
+    def move(self, x, y):
+        self.events.append((self.clock(), "move", int(x), int(y)))
+
+    def click(self):
+        self.events.append((self.clock(), "click"))
+
+    def scroll(self, amount):
+        self.events.append((self.clock(), "scroll", int(amount)))
+
+    def close(self):
+        pass
+
+
+class NullActuator(RecordingActuator):
+    """Knows the screen size and nothing else; every call is dropped."""
+
+    def move(self, x, y):
+        pass
+
+    def click(self):
+        pass
+
+    def scroll(self, amount):
+        pass
+
+
+class ThreadedActuator:
+    """
+    Runs a backend on its own thread. Calls return immediately; a move that
+    arrives while the previous move is still queued replaces it, so the
+    backend only ever sees the newest position. Clicks and scrolls keep
+    their order relative to moves.
+    """
+
+    def __init__(self, backend, metrics=NULL_METRICS):
+        self.backend = backend
+        self.metrics = metrics
+        self.screen_size = tuple(backend.size())
+        self.scroll_resolution = getattr(backend, "scroll_resolution", 1)
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="actuator", daemon=True)
+        self._thread.start()
+
+        # counters
+        self.moves = 0
+        self.coalesced = 0
+        self.applied = 0
+        self.errors = 0
+
+    def size(self):
+        return self.screen_size
+
+    def move(self, x, y):
+        with self._cond:
+            self.moves += 1
+            if self._queue and self._queue[-1][0] == "move":
+                self._queue[-1] = ("move", (x, y), time.perf_counter())
+                self.coalesced += 1
+            else:
+                self._queue.append(("move", (x, y), time.perf_counter()))
+            self._cond.notify()
+
+    def click(self):
+        self._put("click", ())
+
+    def scroll(self, amount):
+        with self._cond:
+            # merge with a scroll that is still queued
+            if self._queue and self._queue[-1][0] == "scroll":
+                op, (queued_amount,), queued = self._queue[-1]
+                self._queue[-1] = ("scroll", (queued_amount + amount,), queued)
+                self._cond.notify()
+                return
+        self._put("scroll", (amount,))
+
+    def _put(self, op, args):
+        with self._cond:
+            self._queue.append((op, args, time.perf_counter()))
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and not self._queue:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                op, args, queued = self._queue.popleft()
+            try:
+                getattr(self.backend, op)(*args)
+                self.applied += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"[actuate] {op} failed:", e)
+            self.metrics.observe("actuate.apply", time.perf_counter() - queued)
+
+    def stats(self):
+        return {
+            "backend": type(self.backend).__name__,
+            "moves": self.moves,
+            "coalesced": self.coalesced,
+            "applied": self.applied,
+            "errors": self.errors,
+            "queued": len(self._queue),
+        }
+
+    def close(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join(timeout=1.0)
+        self.backend.close()
+
+
+def _screen_size():
+    if os.environ.get("DISPLAY"):
+        try:
+            x = XTestActuator()
+            x.close()
+            return x.size()
+        except Exception:
+            pass
+    return PyAutoGuiActuator().size()
+
+
+def make_actuator(kind="auto"):
+    """Build a backend by name; "auto" tries uinput, then XTest, then pyautogui."""
+    if kind in ("uinput", "auto") and os.access("/dev/uinput", os.W_OK):
+        try:
+            return UinputActuator(_screen_size())
+        except Exception as e:      # old evdev, no way to learn the screen size, ...
+            if kind == "uinput":
+                raise
+            print("[actuate] uinput unavailable:", e)
+    if kind in ("xtest", "auto") and os.environ.get("DISPLAY"):
+        try:
+            return XTestActuator()
+        except Exception as e:
+            if kind == "xtest":
+                raise
+            print("[actuate] XTest unavailable:", e)
+    return PyAutoGuiActuator()
@@ -0,0 +1,476 @@
+# bench.py
+"""
+Microbenchmarks for the controller's hot paths
+----------------------------------------------
+Everything here runs headless: no camera, display, microphone or relay.
+Landmarks come from a synthetic hand model (pointing, open hand, fist,
+scroll zones, with jitter), transcripts from a fixed list of commands.
+
+For each benchmark it reports:
+- ns/op: best of `--repeat` timed runs, in CPU time of the benchmark
+  thread, so time spent waiting for a core held by another process is left out
+- cal: ns/op divided by a fixed calibration loop timed right before it, so
+  a machine that is busier or clocked lower this run scales both alike
+- B/op: peak temporary memory one call needs (tracemalloc)
+- blocks/op: memory blocks still allocated after a call (should be ~0;
+  anything else is a per-frame leak or an ever-growing cache)
+
+  python bench.py                  # run + compare against bench_baseline.json
+  python bench.py --update         # store the median of a few runs as the baseline
+  python bench.py -k pipeline      # only benchmarks whose name contains "pipeline"
+
+Exits 1 when a benchmark regresses past the baseline by more than
+--tolerance. Timings are compared in calibration units, never as absolute
+ns; a suspected regression re-measures every selected benchmark --retries
+times and only counts if the median of all runs still fails.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import protocol
+from gestures import HandFeatures
+from grammar import Grammar
+from outbox import WsOutbox
+from page_index import PageIndex
+from pipeline import CURSOR_FILTER, CursorFilterEngine, GesturePipeline, VoicePipeline
+from scroll import ScrollEngine
+from vad import FrameVad
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(HERE, "bench_baseline.json")
+DEFAULT_GRAMMAR_PATH = os.path.join(HERE, "grammar.json")
+FPS = 30
+SCREEN = (1920, 1080)
+SLACK_NS = 100          # absolute slack so tiny ops don't fail on timer noise
+
+# ---------------- Fixtures ----------------
+# finger directions (rad from vertical) and MCP distance from the wrist, in hand sizes
+_FINGER_ANGLES = np.radians([-50, -15, -3, 8, 20])
+_MCP_REACH = (0.45, 0.9, 0.92, 0.88, 0.8)
+
+POSES = {
+    "point": (0.6, 0.0, 1.0, 1.0, 1.0),
+    "open": (0.0, 0.0, 0.0, 0.0, 0.0),
+    "fist": (0.9, 1.0, 1.0, 1.0, 1.0),
+}
+
+TRANSCRIPTS = (
+    "click", "click login", "press the sign up button", "scroll down", "scroll up",
+    "go to settings page", "scroll faster", "stop", "open the shopping cart",
+    "take me to help center", "uh what was that", "slow down", "tap next page",
+)
+
+
+def synthetic_hand(curls, cx=0.5, cy=0.6, size=0.15, noise=0.0, rng=None):
+    """(21, 3) landmarks of an upright hand; curls per finger (thumb first), 0 = straight."""
+    lm = np.zeros((21, 3))
+    wrist = np.array((cx, cy + size))
+    lm[0, :2] = wrist
+    for f in range(5):
+        d = np.array((np.sin(_FINGER_ANGLES[f]), -np.cos(_FINGER_ANGLES[f])))
+        mcp = wrist + d * _MCP_REACH[f] * size
+        if f == 0:
+            lm[1, :2] = wrist + d * 0.25 * size
+            mcp_i, joints = 2, (3, 4)
+        else:
+            mcp_i, joints = 4 * f + 1, (4 * f + 2, 4 * f + 3, 4 * f + 4)
+        lm[mcp_i, :2] = mcp
+        seg = 0.3 * size
+        for i, j in enumerate(joints):
+            straight = mcp + d * seg * (i + 1)
+            folded = mcp + d * seg * (0.6 - 0.35 * i)
+            lm[j, :2] = (1 - curls[f]) * straight + curls[f] * folded
+    if noise:
+        rng = rng or np.random.default_rng(0)
+        lm[:, :2] += rng.normal(0, noise, (21, 2))
+    return lm
+
+
+def hand_sequence(n=600, seed=0):
+    """
+    n frames at FPS: a pointing hand circling the screen, with a fist every
+    two seconds, an open hand now and then and dips into the scroll zones.
+    """
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i in range(n):
+        t = i / FPS
+        phase = i % (2 * FPS)
+        pose = "fist" if phase < 8 else ("open" if phase < 16 else "point")
+        cx = 0.5 + 0.25 * np.cos(t)
+        cy = 0.55 + 0.35 * np.sin(0.7 * t)      # reaches both scroll zones
+        frames.append((t, synthetic_hand(POSES[pose], cx, cy, noise=0.002, rng=rng)))
+    return frames
+
+
+def synthetic_labels(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    base = ["Login", "Sign up", "Settings", "Help center", "Next page", "Shopping cart", "Reply",
+            "Share", "Subscribe", "Download PDF", "Contact us", "Log out", "Search", "Previous"]
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    labels = list(base)
+    while len(labels) < n:
+        words = ["".join(rng.choice(letters, rng.integers(3, 9))) for _ in range(rng.integers(1, 4))]
+        labels.append(" ".join(words).capitalize())
+    return [{"id": f"vk{i}", "label": label} for i, label in enumerate(labels)]
+
+
+def speech_frames(n=50, sample_rate=16000, seed=0):
+    """20 ms int16 frames alternating voiced tone + harmonics and background noise."""
+    rng = np.random.default_rng(seed)
+    size = sample_rate // 50
+    t = np.arange(size) / sample_rate
+    frames = []
+    for i in range(n):
+        x = rng.normal(0, 60, size)
+        if (i // 10) % 2:
+            x += sum(3000 / k * np.sin(2 * np.pi * 140 * k * t) for k in range(1, 6))
+        frames.append(x.astype(np.int16).tobytes())
+    return frames
+
+
+class _NullActuator:
+    scroll_resolution = 1
+
+    def size(self):
+        return SCREEN
+
+    def move(self, x, y):
+        pass
+
+    def click(self):
+        pass
+
+    def scroll(self, amount):
+        pass
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _drop(payload):
+    return True
+
+
+# ---------------- Benchmarks ----------------
+# name -> (unit, setup); setup() returns fn(i) performing op number i
+BENCHMARKS = {}
+
+
+def benchmark(name, unit="frame"):
+    def register(setup):
+        BENCHMARKS[name] = (unit, setup)
+        return setup
+    return register
+
+
+@benchmark("features")
+def _features():
+    hands = [lm for _, lm in hand_sequence()]
+    return lambda i: HandFeatures(hands[i % len(hands)])
+
+
+@benchmark("cursor.filter")
+def _cursor_filter():
+    engine = CursorFilterEngine(CURSOR_FILTER, screen_size=SCREEN)
+    points = [(t, int(lm[8, 0] * SCREEN[0]), int(lm[8, 1] * SCREEN[1])) for t, lm in hand_sequence()]
+    n = len(points)
+    span = n / FPS
+
+    def op(i):
+        t, x, y = points[i % n]
+        engine.update(t + (i // n) * span, x, y)
+    return op
+
+
+@benchmark("pipeline.frame")
+def _pipeline_frame():
+    clock = _Clock()
+    actuator = _NullActuator()
+    scroll = ScrollEngine(actuator, _drop, clock=clock)
+    pipeline = GesturePipeline(actuator, _drop, SCREEN, clock=clock, scroll=scroll)
+    frames = hand_sequence()
+    n = len(frames)
+    span = n / FPS
+
+    def op(i):
+        t, lm = frames[i % n]
+        t += (i // n) * span
+        clock.now = t + 0.02
+        scroll.run_until(clock.now)
+        pipeline.process(lm, t)
+    return op
+
+
+@benchmark("scroll.tick", unit="tick")
+def _scroll_tick():
+    clock = _Clock()
+    engine = ScrollEngine(_NullActuator(), _drop, clock=clock)
+    engine.hold(1500.0)
+
+    def op(i):
+        if i % 240 == 0:
+            engine.hold(1500.0 if (i // 240) % 2 else -800.0)
+        clock.now += engine.dt
+        engine.run_until(clock.now)
+    return op
+
+
+@benchmark("ws.hover")
+def _ws_hover():
+    outbox = WsOutbox("ws://localhost:8765", deadband_px=2)    # never started: enqueue only
+    points = [(int(lm[8, 0] * SCREEN[0]), int(lm[8, 1] * SCREEN[1])) for _, lm in hand_sequence()]
+
+    def op(i):
+        x, y = points[i % len(points)]
+        outbox.send({"x": x, "y": y})
+    return op
+
+
+@benchmark("protocol.hover_json")
+def _hover_json():
+    return lambda i: protocol.hover_json(i, 1.7e12 + i, 100 + i % 1000, 200)
+
+
+@benchmark("protocol.pack_hover")
+def _pack_hover():
+    return lambda i: protocol.pack_hover(i, 1.7e12 + i, 100 + i % 1000, 200)
+
+
+@benchmark("grammar.match", unit="utterance")
+def _grammar_match():
+    grammar = Grammar.load(DEFAULT_GRAMMAR_PATH)
+    return lambda i: grammar.match(TRANSCRIPTS[i % len(TRANSCRIPTS)])
+
+
+@benchmark("voice.handle", unit="utterance")
+def _voice_handle():
+    clock = _Clock()
+    actuator = _NullActuator()
+    pages = PageIndex()
+    pages.on_labels(1, {"reset": True, "add": synthetic_labels(200)})
+    voice = VoicePipeline(Grammar.load(DEFAULT_GRAMMAR_PATH), actuator, _drop,
+                          scroll=ScrollEngine(actuator, _drop, clock=clock), pages=pages)
+    out = sys.stdout
+
+    def op(i):
+        sys.stdout = _DEVNULL       # handle_text logs every intent
+        try:
+            voice.handle_text(TRANSCRIPTS[i % len(TRANSCRIPTS)])
+        finally:
+            sys.stdout = out
+    return op
+
+
+@benchmark("page_index.resolve", unit="utterance")
+def _page_resolve():
+    pages = PageIndex()
+    pages.on_labels(1, {"reset": True, "add": synthetic_labels()})
+    targets = ("log in", "sign-up", "settings", "help", "next", "cart", "download", "nothing here")
+    return lambda i: pages.resolve(targets[i % len(targets)])
+
+
+@benchmark("vad.frame", unit="audio frame")
+def _vad_frame():
+    vad = FrameVad(16000)
+    frames = speech_frames()
+    return lambda i: vad.is_speech(frames[i % len(frames)])
+
+
+class _Devnull:
+    def write(self, s):
+        return len(s)
+
+    def flush(self):
+        pass
+
+
+_DEVNULL = _Devnull()
+
+
+# ---------------- Measurement ----------------
+def _calibration():
+    """Fixed reference work (float math, a dict, a small numpy op) that the timings are scaled by."""
+    table = {}
+    v = np.zeros(3)
+
+    def op(i):
+        x = (i % 97) * 0.5
+        table[i % 64] = (x, x * x)
+        v[i % 3] = x
+        return float(np.dot(v, v)) + sum(table[i % 64])
+    return op
+
+
+CALIBRATION = _calibration()
+
+
+def time_op(fn, ops=2000, repeat=5, start=0):
+    """Best CPU ns/op over `repeat` runs of `ops` calls, starting at op number `start`."""
+    best = float("inf")
+    i = start
+    for _ in range(repeat):
+        t0 = time.thread_time_ns()
+        for _ in range(ops):
+            fn(i)
+            i += 1
+        best = min(best, (time.thread_time_ns() - t0) / ops)
+    return best
+
+
+def time_normalized(fn, ops=2000, repeat=5, start=0):
+    """{"ns", "cal_ns", "rel"}: fn timed right after the calibration loop, and their ratio."""
+    cal = time_op(CALIBRATION, ops, repeat)
+    ns = time_op(fn, ops, repeat, start)
+    return {"ns": round(ns, 1), "cal_ns": round(cal, 1), "rel": round(ns / cal, 3)}
+
+
+def measure(fn, ops=2000, repeat=5, alloc_ops=200):
+    for i in range(min(ops, 200)):      # warm caches, filters, lazy state
+        fn(i)
+    timing = time_normalized(fn, ops, repeat, start=0)
+    i = ops * repeat
+
+    gc.collect()
+    gc.disable()
+    try:
+        blocks0 = sys.getallocatedblocks()
+        for _ in range(ops):
+            fn(i)
+            i += 1
+        blocks = (sys.getallocatedblocks() - blocks0) / ops
+
+        tracemalloc.start()
+        peak = 0
+        for _ in range(alloc_ops):
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            fn(i)
+            i += 1
+            peak += tracemalloc.get_traced_memory()[1] - base
+        tracemalloc.stop()
+    finally:
+        gc.enable()
+    return {**timing, "bytes": round(peak / alloc_ops), "blocks": round(blocks, 3)}
+
+
+def retime(names, ops=2000, repeat=5):
+    """One more normalized timing of each named benchmark, from a fresh setup."""
+    out = {}
+    for name in names:
+        fn = BENCHMARKS[name][1]()
+        for i in range(min(ops, 200)):
+            fn(i)
+        out[name] = time_normalized(fn, ops, repeat)
+    return out
+
+
+def take_median(results, runs):
+    """Replace each result's timing with the median over `results` and the extra `runs`."""
+    for name, r in results.items():
+        samples = [r] + [run[name] for run in runs]
+        for key in ("ns", "cal_ns", "rel"):
+            r[key] = round(statistics.median(x[key] for x in samples), 3 if key == "rel" else 1)
+
+
+def compare(results, baseline, tolerance):
+    """List of regression descriptions (empty = pass)."""
+    failures = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if "rel" in base:
+            slack = SLACK_NS / r["cal_ns"]
+            if r["rel"] > base["rel"] * (1 + tolerance) + slack:
+                failures.append(f"{name}: {r['rel']:.2f} cal/op vs baseline {base['rel']:.2f} "
+                                f"({r['ns']:.0f} vs {base['ns']:.0f} ns/op)")
+        if r["bytes"] > base["bytes"] * (1 + tolerance) + 256:
+            failures.append(f"{name}: {r['bytes']} B/op vs baseline {base['bytes']}")
+        if r["blocks"] > base["blocks"] + 0.5:
+            failures.append(f"{name}: {r['blocks']} blocks/op retained vs baseline {base['blocks']}")
+    return failures
+
+
+def machine():
+    return f"{platform.machine()} {platform.processor() or platform.system()} / Python {platform.python_version()}"
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark the controller's hot paths headlessly.")
+    ap.add_argument("-k", dest="select", help="only run benchmarks whose name contains this")
+    ap.add_argument("--ops", type=int, default=2000, help="calls per timed run")
+    ap.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark (best is kept)")
+    ap.add_argument("--baseline", default=DEFAULT_BASELINE)
+    ap.add_argument("--tolerance", type=float, default=0.3, help="allowed slowdown, 0.3 = 30%%")
+    ap.add_argument("--retries", type=int, default=4,
+                    help="extra runs of every benchmark whose median decides a regression (and the baseline)")
+    ap.add_argument("--update", action="store_true", help="write this run as the new baseline")
+    args = ap.parse_args(argv)
+
+    results = {}
+    print(f"[bench] {machine()}")
+    for name, (unit, setup) in BENCHMARKS.items():
+        if args.select and args.select not in name:
+            continue
+        r = results[name] = measure(setup(), ops=args.ops, repeat=args.repeat)
+        print(f"  {name:<22} {r['ns']:>10.0f} ns/op  {r['rel']:>8.2f} cal  {r['bytes']:>7} B/op  "
+              f"{r['blocks']:>6.2f} blocks/op  (per {unit})")
+    frame = results.get("pipeline.frame")
+    if frame is not None:
+        print(f"[bench] Per camera frame: {frame['ns'] / 1000:.1f} us, {frame['bytes']} B "
+              f"({1e9 / FPS / max(frame['ns'], 1):.0f}x headroom at {FPS} fps, excluding MediaPipe)")
+
+    if args.update:
+        print(f"[bench] Baseline = median of {1 + args.retries} runs")
+        take_median(results, [retime(results, args.ops, args.repeat) for _ in range(args.retries)])
+        baseline = {"machine": machine(), "results": results}
+        if os.path.exists(args.baseline) and args.select:
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                old = json.load(f)
+            baseline["results"] = {**old.get("results", {}), **results}
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+            f.write("\n")
+        print("[bench] Baseline written to", args.baseline)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("[bench] No baseline; run with --update to store one")
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("machine") != machine():
+        print(f"[bench] NOTE: baseline is from {baseline.get('machine')}; timings may not compare")
+    failures = compare(results, baseline.get("results", {}), args.tolerance)
+    if failures and args.retries:
+        # a regression has to reproduce: re-measure everything, decide on the median
+        print(f"[bench] Re-checking: median of {1 + args.retries} runs")
+        take_median(results, [retime(results, args.ops, args.repeat) for _ in range(args.retries)])
+        failures = compare(results, baseline.get("results", {}), args.tolerance)
+    if failures:
+        print("[bench] REGRESSION:")
+        for line in failures:
+            print("  " + line)
+        return 1
+    print(f"[bench] OK: within {args.tolerance:.0%} of {os.path.basename(args.baseline)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+# camera.py
+"""
+Latest-frame camera grabber
+---------------------------
+- Reads frames on a dedicated thread so the driver queue never backs up
+- Keeps only the newest frame; older unread frames are counted as dropped
+- Negotiates resolution / FPS / pixel format / buffer size at open time
+- Can switch resolution / FPS while running (set_mode), e.g. for standby
+"""
+
+import threading
+import time
+
+import cv2
+
+
+def _fourcc_to_str(value):
+    value = int(value)
+    return "".join(chr((value >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00")
+
+
+class FrameGrabber:
+    """Owns a cv2.VideoCapture and always hands out the most recent frame."""
+
+    def __init__(self, index, width=None, height=None, fps=None,
+                 fourcc=("MJPG", "YUYV"), buffer_size=1):
+        self.index = index
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.fourcc = (fourcc,) if isinstance(fourcc, str) else tuple(fourcc or ())
+        self.buffer_size = buffer_size
+
+        self.cap = None
+        self.negotiated = {}
+        self._cond = threading.Condition()
+        self._frame = None
+        self._frame_ts = 0.0
+        self._seq = 0
+        self._last_read_seq = 0
+        self._thread = None
+        self._running = False
+        self._pending_mode = None
+        self._min_interval = 0.0
+
+        # counters
+        self.grabbed = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.read_failures = 0
+
+    # ---------- open / negotiate ----------
+    def open(self):
+        self.cap = cv2.VideoCapture(self.index)
+        if not self.cap.isOpened():
+            return False
+
+        # FOURCC has to go first: many V4L2 drivers only expose the larger
+        # modes once the compressed format is selected.
+        for code in self.fourcc:
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*code))
+            if _fourcc_to_str(self.cap.get(cv2.CAP_PROP_FOURCC)) == code:
+                break
+        self._apply_mode(self.width, self.height, self.fps)
+        if self.buffer_size:
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, self.buffer_size)
+        self._read_back()
+        return True
+
+    def _apply_mode(self, width, height, fps):
+        if width:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height:
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if fps:
+            self.cap.set(cv2.CAP_PROP_FPS, fps)
+
+    def _read_back(self):
+        self.negotiated = {
+            "width": int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "fps": self.cap.get(cv2.CAP_PROP_FPS),
+            "fourcc": _fourcc_to_str(self.cap.get(cv2.CAP_PROP_FOURCC)),
+            "buffer_size": int(self.cap.get(cv2.CAP_PROP_BUFFERSIZE)),
+        }
+        n = self.negotiated
+        print(f"[camera] Negotiated {n['width']}x{n['height']} @ {n['fps']:.0f}fps "
+              f"{n['fourcc'] or '?'} buffer={n['buffer_size']}")
+
+    def set_mode(self, width, height, fps):
+        """Ask the grabber thread to switch capture mode before its next read."""
+        self._pending_mode = (width, height, fps)
+
+    # ---------- grabber thread ----------
+    def start(self):
+        if self.cap is None and not self.open():
+            return False
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="frame-grabber", daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self):
+        last_read = 0.0
+        while self._running:
+            mode, self._pending_mode = self._pending_mode, None
+            if mode is not None:
+                self._apply_mode(*mode)
+                self._read_back()
+                # drivers often ignore low FPS requests; throttle reads ourselves as well
+                fps = mode[2]
+                self._min_interval = 1.0 / fps if (fps and self.fps and fps < self.fps) else 0.0
+            wait = self._min_interval - (time.time() - last_read)
+            if wait > 0:
+                time.sleep(wait)
+            last_read = time.time()
+            ret, frame = self.cap.read()
+            if not ret:
+                self.read_failures += 1
+                time.sleep(0.005)
+                continue
+            ts = time.time()
+            with self._cond:
+                if self._seq > self._last_read_seq:
+                    # previous frame was never consumed
+                    self.dropped += 1
+                self._frame = frame
+                self._frame_ts = ts
+                self._seq += 1
+                self.grabbed += 1
+                self._cond.notify_all()
+
+    def read(self, timeout=1.0):
+        """
+        Block until a frame newer than the last one returned is available.
+        Returns (ok, frame, capture_ts).
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            while self._running and self._seq <= self._last_read_seq:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False, None, 0.0
+                self._cond.wait(remaining)
+            if self._seq <= self._last_read_seq:
+                return False, None, 0.0
+            self._last_read_seq = self._seq
+            self.delivered += 1
+            return True, self._frame, self._frame_ts
+
+    def stats(self):
+        return {
+            "grabbed": self.grabbed,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "read_failures": self.read_failures,
+        }
+
+    def release(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
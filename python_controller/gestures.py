@@ -0,0 +1,154 @@
+# gestures.py
+"""
+Landmark features + gesture state machine
+-----------------------------------------
+- landmark_array: a frame's 21 landmarks converted once into a (21, 3) array
+- HandFeatures: per-finger curl, pinch distance, palm normal and the index
+  fingertip, computed in one vectorized pass over that array
+- GestureStateMachine: registered gestures, each a score with enter/exit
+  thresholds (hysteresis), a minimum hold time before it fires, a cooldown
+  and an optional repeat interval while held
+
+A gesture only starts after its score has stayed above `enter` for
+`min_hold` seconds and only ends once it drops below `exit`, so a hand
+hovering on a threshold doesn't flicker in and out of it.
+"""
+
+import numpy as np
+
+# landmark indices (MediaPipe hand model)
+WRIST = 0
+THUMB_TIP = 4
+INDEX_FINGER_MCP = 5
+INDEX_FINGER_TIP = 8
+MIDDLE_FINGER_MCP = 9
+PINKY_MCP = 17
+FINGER_NAMES = ("thumb", "index", "middle", "ring", "pinky")
+FINGER_TIPS = (4, 8, 12, 16, 20)
+FINGER_MCPS = (2, 5, 9, 13, 17)
+_TIPS_MCPS = np.array(FINGER_TIPS + FINGER_MCPS)
+_PALM_POINTS = np.array([THUMB_TIP, INDEX_FINGER_TIP, INDEX_FINGER_MCP, PINKY_MCP, MIDDLE_FINGER_MCP])
+
+# reach = |tip - wrist| / |mcp - wrist|: ~1.9 for a straight finger, ~1.0 folded
+REACH_OPEN = 1.8
+REACH_CLOSED = 1.1
+
+
+def landmark_array(hand_landmarks):
+    """(21, 3) float64 array from a MediaPipe landmark list or anything array-like."""
+    if isinstance(hand_landmarks, np.ndarray):
+        return hand_landmarks.astype(np.float64, copy=False)
+    return np.array([(p.x, p.y, p.z) for p in hand_landmarks.landmark], dtype=np.float64)
+
+
+class HandFeatures:
+    """Everything the gestures look at, derived from one landmark array."""
+
+    __slots__ = ("landmarks", "curl", "pinch", "palm_normal", "index_tip")
+
+    def __init__(self, landmarks):
+        self.landmarks = landmarks
+        rel = landmarks - landmarks[WRIST]
+        dist = np.hypot(rel[:, 0], rel[:, 1])[_TIPS_MCPS]   # tip and MCP distances from the wrist
+        reach = dist[:5] / np.maximum(dist[5:], 1e-6)
+        # 0 = straight, 1 = fully curled; index 0 is the thumb
+        self.curl = ((REACH_OPEN - reach) * (1.0 / (REACH_OPEN - REACH_CLOSED))).clip(0.0, 1.0).tolist()
+
+        (tx, ty, _), (ix, iy, _), (ax, ay, az), (bx, by, bz), (mx, my, _) = rel[_PALM_POINTS].tolist()
+        px, py = tx - ix, ty - iy
+        scale = max((mx * mx + my * my) ** 0.5, 1e-6)   # palm length
+        self.pinch = (px * px + py * py) ** 0.5 / scale
+        nx, ny, nz = ay * bz - az * by, az * bx - ax * bz, ax * by - ay * bx
+        norm = max((nx * nx + ny * ny + nz * nz) ** 0.5, 1e-9)
+        self.palm_normal = (nx / norm, ny / norm, nz / norm)
+        self.index_tip = landmarks[INDEX_FINGER_TIP]
+
+    def fingers_curl(self):
+        """Mean curl of index..pinky (1.0 = all folded)."""
+        c = self.curl
+        return (c[1] + c[2] + c[3] + c[4]) * 0.25
+
+    def fist(self):
+        """Closed-fist score: the fingers are folded *and* the index isn't pointing."""
+        return min(self.curl[1], self.fingers_curl())
+
+    def single_finger(self, finger):
+        """How clearly `finger` is the only one of index..pinky extended (0..1)."""
+        i = FINGER_NAMES.index(finger)
+        c = self.curl
+        return min(1.0 - c[i], *(c[j] for j in range(1, 5) if j != i))
+
+
+class Gesture:
+    """
+    A registered gesture. `score(features)` returns a number that is >= enter
+    while the gesture is being made; callbacks get (gesture, features, now) and
+    may return a label for the overlay/log.
+    """
+
+    def __init__(self, name, score, enter, exit, min_hold=0.0, cooldown=0.0, repeat=None,
+                 on_start=None, on_repeat=None, on_end=None):
+        self.name = name
+        self.score = score
+        self.enter = enter
+        self.exit = exit
+        self.min_hold = min_hold
+        self.cooldown = cooldown
+        self.repeat = repeat            # seconds between on_repeat calls while active
+        self.on_start = on_start
+        self.on_repeat = on_repeat
+        self.on_end = on_end
+
+        self.value = 0.0                # last score
+        self.active = False
+        self.pending_since = None
+        self.last_start = float("-inf")
+        self.last_repeat = 0.0
+
+
+class GestureStateMachine:
+    def __init__(self):
+        self.gestures = []
+
+    def register(self, gesture):
+        self.gestures.append(gesture)
+        return gesture
+
+    def active(self):
+        return [g.name for g in self.gestures if g.active]
+
+    def update(self, features, now):
+        """Advance every gesture by one frame; returns the last label a callback produced."""
+        label = None
+        for g in self.gestures:
+            s = g.value = g.score(features)
+            if g.active:
+                if s < g.exit:
+                    g.active = False
+                    g.pending_since = None
+                    label = _fire(g.on_end, g, features, now) or label
+                elif g.repeat is not None and now - g.last_repeat >= g.repeat:
+                    g.last_repeat = now
+                    label = _fire(g.on_repeat, g, features, now) or label
+            elif s >= g.enter:
+                if g.pending_since is None:
+                    g.pending_since = now
+                if now - g.pending_since >= g.min_hold and now - g.last_start >= g.cooldown:
+                    g.active = True
+                    g.last_start = g.last_repeat = now
+                    label = _fire(g.on_start, g, features, now) or label
+            else:
+                g.pending_since = None
+        return label
+
+    def reset(self, now):
+        """Hand lost: end whatever was active."""
+        for g in self.gestures:
+            if g.active:
+                g.active = False
+                _fire(g.on_end, g, None, now)
+            g.pending_since = None
+
+
+def _fire(callback, gesture, features, now):
+    return callback(gesture, features, now) if callback is not None else None
@@ -0,0 +1,122 @@
+# grammar.py
+"""
+Voice command grammar
+---------------------
+- Intents, trigger phrases, synonyms and slot rules live in grammar.json
+- Phrases are compiled once into a token trie; matching is a single
+  left-to-right pass that takes the leftmost, longest phrase
+- Phrases only match on whole tokens, so "up" never fires inside "pickup"
+- Returns a typed Intent, e.g. click(target="login")
+"""
+
+import json
+import re
+from dataclasses import dataclass, field
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+_END = object()     # trie key marking "a phrase ends here"
+
+
+@dataclass(frozen=True)
+class Intent:
+    name: str
+    slots: dict = field(default_factory=dict)
+    command: str = ""       # text forwarded to the extension
+    phrase: str = ""        # trigger phrase that matched
+
+    def __str__(self):
+        args = ", ".join(f'{k}="{v}"' for k, v in self.slots.items())
+        return f"{self.name}({args})"
+
+
+class Grammar:
+    def __init__(self, spec):
+        self.synonyms = {k: v.split() for k, v in spec.get("synonyms", {}).items()}
+        self.fillers = set(spec.get("slot_fillers", []))
+        self.suffixes = set(spec.get("slot_suffixes", []))
+        self.here_words = set(spec.get("here_words", []))
+        self.intents = spec["intents"]
+        self._trie = {}
+        self._exact = {}
+        for rule in self.intents:
+            for phrase in rule["phrases"]:
+                self._add(phrase, rule, exact=False)
+            for phrase in rule.get("exact_phrases", []):
+                self._add(phrase, rule, exact=True)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _add(self, phrase, rule, exact):
+        tokens = tuple(self.tokenize(phrase))
+        if exact:
+            self._exact[tokens] = rule
+            return
+        node = self._trie
+        for tok in tokens:
+            node = node.setdefault(tok, {})
+        node[_END] = rule
+
+    def tokenize(self, text):
+        out = []
+        for tok in _TOKEN_RE.findall(text.lower()):
+            out.extend(self.synonyms.get(tok, (tok,)))
+        return out
+
+    # ---------- matching ----------
+    def match(self, text):
+        """Return the Intent for `text`, or None if no phrase matches."""
+        tokens = self.tokenize(text)
+        rule = self._exact.get(tuple(tokens))
+        if rule is not None:
+            return self._build(rule, tokens, len(tokens))
+        for start in range(len(tokens)):
+            node = self._trie
+            best = None
+            for pos in range(start, len(tokens)):
+                node = node.get(tokens[pos])
+                if node is None:
+                    break
+                if _END in node:
+                    best = (node[_END], pos + 1)
+            if best is not None:
+                rule, end = best
+                return self._build(rule, tokens[start:], end - start)
+        return None
+
+    def _build(self, rule, tokens, phrase_len):
+        slots = dict(rule.get("slots", {}))
+        slot_name = rule.get("slot")
+        if slot_name:
+            rest = tokens[phrase_len:]
+            while rest and rest[0] in self.fillers:
+                rest = rest[1:]
+            while rest and rest[-1] in self.suffixes:
+                rest = rest[:-1]
+            value = " ".join(rest)
+            if value and value not in self.here_words:
+                slots[slot_name] = value
+        template = rule.get("command_with_slot" if slot_name in slots else "command", rule["name"])
+        return Intent(rule["name"], slots, template.format(**slots), " ".join(tokens[:phrase_len]))
+
+    # ---------- streaming support ----------
+    def partial_phrases(self):
+        """
+        Split phrases for streaming recognizers: (terminal, open). Terminal
+        phrases are complete commands; open ones may still be followed by a slot.
+        A slot rule's phrases are only open if listed in its "bare_phrases"
+        (complete without a slot, e.g. "click" = click at the cursor); the rest
+        ("go", "open", "show", ...) need their slot and wait for the final text.
+        """
+        terminal, open_ = [], []
+        for rule in self.intents:
+            phrases = rule["phrases"] + rule.get("exact_phrases", [])
+            if rule.get("slot"):
+                open_.extend(rule.get("bare_phrases", []))
+                terminal.extend(f"{p} {h}" for p in phrases for h in sorted(self.here_words))
+            else:
+                terminal.extend(p for p in phrases if p in rule["phrases"])
+                open_.extend(rule.get("exact_phrases", []))
+        return terminal, open_
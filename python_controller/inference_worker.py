@@ -0,0 +1,396 @@
+# inference_worker.py
+"""
+Hand inference, in-process or in a supervised worker process
+------------------------------------------------------------
+- HandTracker: per-frame capture-side work (standby gating, ROI crop,
+  hands.process, landmark mapping), held to a frame budget by an optional
+  quality.QualityController
+- LocalHandSource: FrameGrabber + HandTracker on the gesture thread
+- InferenceWorker: the same work in a child process, so capture and
+  MediaPipe don't compete for the GIL with voice, STT and the outbox.
+  Frames are written once into a multiprocessing.shared_memory ring and
+  read in place by the main process (no pickling); only a compact
+  (hands, 21, 3) float32 landmark array and a few scalars cross the pipe.
+  A worker that exits or stalls is restarted with exponential backoff.
+
+Both sources return HandFrame tuples from read(), so the gesture loop
+doesn't care where inference ran. `hands` holds every tracked hand as
+(handedness, landmarks) from one MediaPipe pass; `hand` is the first of them.
+"""
+
+import multiprocessing
+import os
+import time
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from gestures import landmark_array
+from metrics import NULL_METRICS
+
+HandFrame = namedtuple("HandFrame", "frame capture_ts hand inferred state hands", defaults=((),))
+
+NUM_LANDMARKS = 21
+HANDS_PARAMS = ("model_complexity", "min_detection_confidence", "min_tracking_confidence")
+
+
+class HandTracker:
+    """Decides whether to infer a frame, runs MediaPipe and maps ROI landmarks back."""
+
+    def __init__(self, hands, roi=None, standby=None, metrics=NULL_METRICS, quality=None,
+                 make_hands=None, hands_params=None):
+        import cv2
+        self._cv2 = cv2
+        self.hands = hands
+        self.roi = roi
+        self.standby = standby
+        self.metrics = metrics
+        self.quality = quality
+        self.make_hands = make_hands        # fn(params) -> Hands, to rebuild on a tier change
+        self.hands_params = hands_params    # params `hands` was built with
+        self.scale = 1.0                    # of the image MediaPipe sees
+        self._last_hands = ()
+        if quality is not None:
+            quality.on_change = self.apply_quality
+            self.apply_quality(quality.settings)
+
+    def apply_quality(self, settings):
+        self.scale = settings["scale"]
+        params = {k: settings[k] for k in HANDS_PARAMS}
+        if self.make_hands is not None and params != self.hands_params:
+            self.hands.close()
+            self.hands = self.make_hands(params)
+            self.hands_params = params
+
+    @property
+    def state(self):
+        return self.standby.state if self.standby is not None else "active"
+
+    def step(self, frame, capture_ts):
+        """
+        Returns (hands, inferred); hands is a tuple of (handedness, landmarks),
+        empty when no hand was found. `frame` is the raw, unmirrored BGR frame.
+        """
+        metrics = self.metrics
+        if self.standby is not None:
+            with metrics.timer("motion"):
+                infer = self.standby.should_infer(frame, capture_ts)
+            if not infer:
+                return (), False
+        if self.quality is not None and not self.quality.should_infer():
+            # skipped to stay within budget: the hands are where they were last frame
+            return self._last_hands, False
+
+        t0 = time.perf_counter()
+        with metrics.timer("preprocess"):
+            if self.roi is not None:
+                rgb, box = self.roi.prepare(frame)   # mirrors + converts only the crop
+            else:
+                rgb = self._cv2.cvtColor(self._cv2.flip(frame, 1), self._cv2.COLOR_BGR2RGB)
+            if self.scale < 1.0:
+                h, w = rgb.shape[:2]
+                rgb = self._cv2.resize(rgb, (max(1, int(w * self.scale)), max(1, int(h * self.scale))),
+                                       interpolation=self._cv2.INTER_AREA)
+        with metrics.timer("hands.process"):
+            results = self.hands.process(rgb)
+
+        hands = ()
+        if results.multi_hand_landmarks:
+            labels = [h.classification[0].label for h in (results.multi_handedness or ())]
+            hands = tuple((labels[i] if i < len(labels) else "Unknown", lm)
+                          for i, lm in enumerate(results.multi_hand_landmarks))
+        if self.roi is not None:    # single-hand only, see build_tracker
+            hand = hands[0][1] if hands else None
+            if hand is not None:
+                self.roi.to_full_frame(hand, box, frame.shape)
+            self.roi.update(hand, frame.shape)
+        if self.standby is not None:
+            self.standby.observe(bool(hands), capture_ts)
+        if self.quality is not None:
+            self.quality.observe(time.perf_counter() - t0)
+        self._last_hands = hands
+        return hands, True
+
+    def stats(self):
+        out = {}
+        if self.roi is not None:
+            out["roi"] = self.roi.stats()
+        if self.standby is not None:
+            out["power"] = self.standby.stats()
+        if self.quality is not None:
+            out["quality"] = self.quality.stats()
+        return out
+
+
+def open_grabber(config):
+    from camera import FrameGrabber
+    grabber = FrameGrabber(config["cam_index"], width=config["width"], height=config["height"],
+                           fps=config["fps"], fourcc=config["fourcc"],
+                           buffer_size=config["buffer_size"])
+    return grabber if grabber.start() else None
+
+
+def hands_params(config):
+    return {"model_complexity": 1,
+            "min_detection_confidence": config["min_detection_confidence"],
+            "min_tracking_confidence": config["min_tracking_confidence"]}
+
+
+def load_hands(config, params=None):
+    import mediapipe as mp
+    return mp.solutions.hands.Hands(max_num_hands=config.get("max_hands", 1),
+                                    **(params or hands_params(config)))
+
+
+def build_tracker(config, grabber, hands, metrics=NULL_METRICS):
+    roi = None
+    if config["roi"] and config.get("max_hands", 1) == 1:     # a crop around one hand loses the other
+        from roi import HandRoiTracker
+        roi = HandRoiTracker(*config["roi"])
+    standby = None
+    if config["standby"]:
+        from standby import StandbyController
+        idle_after, mode, probe = config["standby"]
+        standby = StandbyController(grabber, idle_after=idle_after, standby_mode=mode,
+                                    probe_interval=probe,
+                                    on_change=lambda state: roi is not None and roi.reset())
+    quality = None
+    if config.get("quality"):
+        from quality import QualityController
+        (budget,) = config["quality"]
+        quality = QualityController(budget, metrics=metrics)
+    return HandTracker(hands, roi, standby, metrics, quality=quality,
+                       make_hands=lambda params: load_hands(config, params),
+                       hands_params=hands_params(config))
+
+
+# ---------------- In-process ----------------
+class LocalHandSource:
+    def __init__(self, grabber, tracker, metrics=NULL_METRICS):
+        self.grabber = grabber
+        self.tracker = tracker
+        self.metrics = metrics
+
+    def read(self, timeout=1.0):
+        with self.metrics.timer("camera.read"):
+            ok, frame, capture_ts = self.grabber.read(timeout)
+        if not ok:
+            return None
+        self.metrics.observe("camera.frame_age", time.time() - capture_ts)
+        hands, inferred = self.tracker.step(frame, capture_ts)
+        return HandFrame(frame, capture_ts, hands[0][1] if hands else None, inferred,
+                         self.tracker.state, hands)
+
+    def stats(self):
+        return {"camera": self.grabber.stats(), **self.tracker.stats()}
+
+    def close(self):
+        self.tracker.hands.close()
+        self.grabber.release()
+        return self.grabber.stats()
+
+
+# ---------------- Worker process ----------------
+def _worker_main(config, shm_name, slots, slot_size, conn, stop):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    ring = np.ndarray((slots, slot_size), dtype=np.uint8, buffer=shm.buf)
+    grabber = hands = tracker = None
+    if config.get("cpu") is not None and hasattr(os, "sched_setaffinity"):
+        # one core per camera session, so several stations don't fight over one
+        os.sched_setaffinity(0, {config["cpu"] % os.cpu_count()})
+    try:
+        grabber = open_grabber(config)
+        if grabber is None:
+            conn.send(("error", f"cannot open camera index {config['cam_index']}"))
+            return
+        hands = load_hands(config)
+        tracker = build_tracker(config, grabber, hands)
+        conn.send(("ready", grabber.negotiated))
+
+        seq = 0
+        last_stats = 0.0
+        while not stop.is_set():
+            ok, frame, capture_ts = grabber.read()
+            if not ok:
+                continue
+            t0 = time.perf_counter()
+            found, inferred = tracker.step(frame, capture_ts)
+            infer_s = time.perf_counter() - t0
+
+            slot = seq % slots
+            if frame.nbytes <= slot_size:
+                ring[slot, :frame.nbytes] = frame.reshape(-1)
+                shape = frame.shape
+            else:
+                shape = None    # larger than the configured mode; landmarks only
+            lm = None
+            if found:
+                lm = np.stack([landmark_array(h) for _, h in found]).astype(np.float32).tobytes()
+            labels = tuple(label for label, _ in found)
+            conn.send(("frame", seq, slot, shape, capture_ts, lm, labels, inferred, tracker.state,
+                       infer_s))
+            seq += 1
+
+            if capture_ts - last_stats >= 1.0:
+                last_stats = capture_ts
+                conn.send(("stats", {"camera": grabber.stats(), **tracker.stats()}))
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
+    finally:
+        if tracker is not None:
+            tracker.hands.close()   # may have been rebuilt by a quality change
+        elif hands is not None:
+            hands.close()
+        if grabber is not None:
+            grabber.release()
+        del ring
+        shm.close()
+
+
+class InferenceWorker:
+    """Runs capture + hands.process in a child process and restarts it when it dies."""
+
+    def __init__(self, config, slots=4, stall_timeout=5.0, backoff=(0.5, 10.0),
+                 metrics=NULL_METRICS):
+        self.config = config
+        self.slots = slots
+        self.slot_size = config["width"] * config["height"] * 3
+        self.stall_timeout = stall_timeout
+        self.backoff = backoff
+        self.metrics = metrics
+        self._ctx = multiprocessing.get_context("spawn")
+        self._shm = None
+        self._proc = None
+        self._conn = None
+        self._stop = None
+        self._last_msg = 0.0
+        self._next_start = 0.0
+        self._failures = 0
+        self._worker_stats = {}
+
+        # counters
+        self.starts = 0
+        self.restarts = 0
+        self.frames = 0
+        self.dropped = 0
+        self.last_error = None
+
+    def start(self):
+        self._shm = shared_memory.SharedMemory(create=True, size=self.slots * self.slot_size)
+        self._spawn()
+        return True
+
+    def _spawn(self):
+        parent, child = self._ctx.Pipe(duplex=False)
+        self._stop = self._ctx.Event()
+        self._proc = self._ctx.Process(target=_worker_main, name="inference-worker", daemon=True,
+                                       args=(self.config, self._shm.name, self.slots,
+                                             self.slot_size, child, self._stop))
+        self._proc.start()
+        child.close()
+        self._conn = parent
+        self._last_msg = time.time()
+        self.starts += 1
+        print(f"[worker] Inference worker started (pid {self._proc.pid})")
+
+    def _shutdown_proc(self, timeout=2.0):
+        if self._proc is None:
+            return
+        self._stop.set()
+        self._proc.join(timeout)
+        if self._proc.is_alive():
+            self._proc.terminate()
+            self._proc.join(1.0)
+        self._conn.close()
+        self._proc = self._conn = None
+
+    def _fail(self, reason):
+        self.last_error = reason
+        self._failures += 1
+        delay = min(self.backoff[0] * 2 ** (self._failures - 1), self.backoff[1])
+        print(f"[worker] {reason}; restarting in {delay:.1f}s")
+        self._shutdown_proc(timeout=0.5)
+        self._next_start = time.time() + delay
+        self.metrics.count("worker.restarts")
+
+    def read(self, timeout=1.0):
+        """Newest HandFrame from the worker, or None (timeout / worker restarting)."""
+        if self._proc is None:
+            wait = self._next_start - time.time()
+            if wait > 0:
+                time.sleep(min(wait, timeout))
+                return None
+            self.restarts += 1
+            self._spawn()
+
+        try:
+            if not self._conn.poll(timeout):
+                if not self._proc.is_alive():
+                    self._fail(f"worker exited with code {self._proc.exitcode}")
+                elif time.time() - self._last_msg > self.stall_timeout:
+                    self._fail(f"worker stalled for {self.stall_timeout:.0f}s")
+                return None
+            # latest frame wins; control messages are handled as they come
+            msg = None
+            while self._conn.poll():
+                newer = self._conn.recv()
+                if newer[0] != "frame":
+                    self._handle_control(newer)
+                    continue
+                if msg is not None:
+                    self.dropped += 1
+                msg = newer
+        except (EOFError, OSError):
+            self._proc.join(0.5)
+            self._fail(f"worker exited with code {self._proc.exitcode}")
+            return None
+
+        self._last_msg = time.time()
+        if msg is None:
+            return None
+
+        _, seq, slot, shape, capture_ts, lm, labels, inferred, state, infer_s = msg
+        self._failures = 0
+        self.frames += 1
+        if inferred:
+            self.metrics.observe("hands.process", infer_s)
+        self.metrics.observe("camera.frame_age", time.time() - capture_ts)
+        frame = None
+        if shape is not None:
+            # view into the ring; valid until the worker wraps around to this slot again
+            frame = np.ndarray(shape, dtype=np.uint8, buffer=self._shm.buf,
+                               offset=slot * self.slot_size)
+        hands = ()
+        if lm is not None:
+            hands = tuple(zip(labels, np.frombuffer(lm, dtype=np.float32).reshape(-1, NUM_LANDMARKS, 3)))
+        return HandFrame(frame, capture_ts, hands[0][1] if hands else None, inferred, state, hands)
+
+    def _handle_control(self, msg):
+        kind = msg[0]
+        if kind == "stats":
+            self._worker_stats = msg[1]
+        elif kind == "ready":
+            print("[worker] Camera + MediaPipe ready in worker:", msg[1])
+        elif kind == "error":
+            self.last_error = msg[1]
+            print("[worker] ERROR:", msg[1])
+
+    def stats(self):
+        return {
+            "pid": self._proc.pid if self._proc is not None else None,
+            "starts": self.starts,
+            "restarts": self.restarts,
+            "frames": self.frames,
+            "dropped": self.dropped,
+            "last_error": self.last_error,
+            **self._worker_stats,
+        }
+
+    def close(self):
+        self._shutdown_proc()
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+        return self._worker_stats.get("camera", {})
@@ -1,594 +1,490 @@
 # main.py
 """
-Gesture + Voice + Cursor controller (smooth version)
-----------------------------------------------------
-- Cursor: smoothed & lerped index fingertip
-- Scroll: index finger vertical zones (up/down)
-- Click: toggle fingers (index <-> middle)
-- Voice: click/open/scroll synonyms
-- WebSocket: sends hover coords and commands to ws://localhost:8765
+Gesture + voice controller
+- Cursor: filtered index fingertip (pipeline.py)
+- Scroll: index finger vertical zones (up/down) -> inertial scroll engine (scroll.py)
+- Click: closed fist + voice click
+- Hands/cameras: one or two hands per camera, each with a role, and optional
+  extra camera stations, scheduled by the session engine (session.py)
+- Voice: grammar-driven commands (grammar.json)
+- WebSocket: sends hover coords and commands to ws://localhost:8765, either
+  through the Node relay (outbox.py) or by serving it in-process (relay.py)
+
+Startup: heavy modules (cv2, mediapipe, pyautogui, speech_recognition) are
+only imported by the subsystem that needs them, and the camera, MediaPipe
+model, microphone and WebSocket come up concurrently.
 
 Requirements:
-  pip install opencv-python mediapipe pyautogui speechrecognition websocket-client
-(Windows: pyaudio may be needed for microphone)
+ pip install opencv-python mediapipe pyautogui speechrecognition websocket-client numpy
+ (RELAY_EMBEDDED: pip install websockets)
+(Windows: pyaudio may be needed for microphone; optional offline voice: vosk)
 """
-'''
+
 import time
-import threading
+
+START_TIME = time.perf_counter()    # for time-to-first-cursor-move
+
 import json
-import re
-from collections import deque
+import os
+from concurrent.futures import ThreadPoolExecutor
 
-import cv2
-import mediapipe as mp
-import pyautogui
-import speech_recognition as sr
-import websocket  # websocket-client
+from grammar import Grammar
+from metrics import Metrics
+from outbox import WsOutbox
+from page_index import PageIndex
+from pipeline import VoicePipeline
+from relay import LocalRelay
+from session import CameraSession, Engine
 
 # ---------------- CONFIG ----------------
+GESTURE_ENABLED = True
+VOICE_ENABLED = True
+WS_ENABLED = True
+
 WS_URL = "ws://localhost:8765"
+OUTBOX_MAX_COMMANDS = 256   # queued commands held while the relay is slow/down
+WS_HOVER_FORMATS = ("bin1", "json")   # offered to the relay in preference order
+HOVER_DEADBAND_PX = 2       # don't send hover updates that moved <= this many pixels
+HOVER_KEEPALIVE = 1.0       # ...but resend the position at least this often (s)
+RELAY_EMBEDDED = False      # serve ws://RELAY_HOST:RELAY_PORT here instead of using the Node relay
+RELAY_HOST = "localhost"
+RELAY_PORT = 8765
 CAM_INDEX = 0
-SMOOTHING_WINDOW = 7        # moving average window (larger = smoother)
-LERP_FACTOR = 0.3           # linear interpolation smoothing between frames
+CAM_WIDTH = 640
+CAM_HEIGHT = 480
+CAM_FPS = 30
+CAM_FOURCC = ("MJPG", "YUYV")   # tried in order, first one the driver accepts wins
+CAM_BUFFER_SIZE = 1             # driver-side queue; grabber thread keeps the newest anyway
 MIN_DETECTION_CONFIDENCE = 0.6
 MIN_TRACKING_CONFIDENCE = 0.6
 
-# Scroll zones
-SCROLL_ZONE_TOP = 0.36
-SCROLL_ZONE_BOTTOM = 0.64
-SCROLL_INTERVAL = 0.12
-SCROLL_SENSITIVITY = 1200
-
-# Toggle-click settings
-TOGGLE_WINDOW = 0.6
-TOGGLE_COOLDOWN = 0.6
-
-# Voice command patterns
-CLICK_VERBS_RE = r"(?:click|press|tap|select|activate|open|go to|goto|go|take me to|navigate to|show)"
-HERE_WORDS = {"here", "that", "this", ""}
-
-# Finger enums
-FINGER_TIPS_ENUMS = [
-    mp.solutions.hands.HandLandmark.INDEX_FINGER_TIP,
-    mp.solutions.hands.HandLandmark.MIDDLE_FINGER_TIP,
-    mp.solutions.hands.HandLandmark.RING_FINGER_TIP,
-    mp.solutions.hands.HandLandmark.PINKY_TIP
-]
+# Hands: handedness ("Left"/"Right" as MediaPipe reports it, or "any") -> role:
+# "all" (cursor, click, scroll), "cursor" (cursor + click) or "scroll". Two entries
+# track two hands from the same landmark pass, e.g. {"Right": "cursor", "Left": "scroll"}
+# (ROI tracking only applies to a single hand)
+HAND_ROLES = {"any": "all"}
+
+# Extra camera stations, e.g. ({"name": "desk", "cam_index": 1},). Each one runs
+# inference in its own worker process pinned to its own core (1, 2, ...); the main
+# camera's worker gets core 0 with INFERENCE_PROCESS, otherwise it runs unpinned in
+# this process. Stations don't move the system cursor; their hover/commands carry
+# "station" and only reach clients that subscribe to it in their hello
+# ("stations": [name]), so the extension's pages follow the main camera only
+CAMERA_STATIONS = ()
+
+# Adaptive quality (quality.py): step model complexity, input scale, confidences and frame
+# skipping to keep hand tracking within this per-frame budget (replaces MIN_*_CONFIDENCE)
+QUALITY_ENABLED = True
+FRAME_BUDGET_MS = 33
+
+# ROI tracking: while a hand is tracked, run MediaPipe on a downscaled crop around it
+ROI_TRACKING = True
+ROI_PADDING = 0.5           # padding per side, as a fraction of the hand's bounding box
+ROI_MIN_FRAC = 0.25         # smallest crop side, as a fraction of the frame height
+ROI_INPUT_SIZE = 256        # crops are downscaled to at most this many pixels per side
+
+# Standby: after STANDBY_AFTER s without a hand, capture at a low rate/resolution and
+# only run MediaPipe when cheap frame differencing sees motion (or a probe is due)
+STANDBY_ENABLED = True
+STANDBY_AFTER = 10.0
+STANDBY_MODE = (320, 240, 5)    # width, height, fps while idle
+STANDBY_PROBE_INTERVAL = 2.0    # run inference anyway this often while idle
+
+# Cursor/click/scroll backend: "auto" (uinput, then XTest, then pyautogui),
+# "uinput", "xtest" or "pyautogui"
+ACTUATOR_BACKEND = "auto"
+ACTUATOR_THREADED = True    # actuate on a separate thread, merging queued moves
+
+# Inference process: run capture + MediaPipe in a supervised child process (frames
+# come back through a shared-memory ring) so they don't share the GIL with voice/STT
+INFERENCE_PROCESS = False
+INFERENCE_RING_SLOTS = 4        # frames in the ring; a frame view stays valid for ~slots-1 frames
+INFERENCE_STALL_TIMEOUT = 5.0   # restart the worker if it sends nothing for this long (s)
+
+# Voice recognition backend: "google" (online, per phrase) or "vosk" (offline, streaming)
+VOICE_BACKEND = "google"
+VOSK_MODEL_PATH = "model"   # unpacked Vosk model directory
+VOSK_SAMPLE_RATE = 16000
+VOSK_CHUNK = 1600           # 100 ms of audio per read; smaller = earlier partials
+VOSK_PARTIAL_STABLE = 0.3   # seconds an open-ended partial ("click") must hold before firing
+
+# Google STT runs on a small worker pool; utterances older than STT_MAX_AGE s
+# (queued behind slow recognitions) are dropped instead of acted on late
+STT_WORKERS = 2
+STT_MAX_QUEUE = 4
+STT_MAX_AGE = 3.0
+STT_HEAD_TIMEOUT = 1.0      # s a slow recognition may hold back newer results before it's skipped
+
+# Endpointing for Google STT: a local VAD (vad.py) ends each utterance ~VAD_HANGOVER_MS
+# after speech stops, keeps VAD_PRE_ROLL_MS of audio before the onset and tracks the
+# noise floor continuously. False = speech_recognition's energy threshold + pauses
+VAD_ENABLED = True
+VAD_SAMPLE_RATE = 16000
+VAD_HANGOVER_MS = 200
+VAD_PRE_ROLL_MS = 300
+VAD_MAX_UTTERANCE = 6.0     # s; longer speech is cut and sent as is
+
+# Noise calibration (VAD noise floor, or the recognizer's energy threshold) is cached
+# here and reused on the next start; both keep adapting while listening
+VOICE_CALIBRATION_PATH = os.path.join(os.path.expanduser("~"), ".voicekind_calibration.json")
+
+# voice grammar (intents, phrases, synonyms); edit the JSON to add commands
+VOICE_GRAMMAR_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "grammar.json")
+
+# Latency metrics: rolling per-stage histograms, served as JSON on
+# http://127.0.0.1:METRICS_PORT/metrics and optionally traced to a JSONL file
+METRICS_ENABLED = False
+METRICS_PORT = 8766
+METRICS_TRACE_PATH = None
+
+# Record/replay (see replay.py): set to a .jsonl path to record this session
+RECORD_PATH = None
+RECORD_FRAMES = False       # also save mirrored camera frames as JPEGs next to it
 
 # ---------------- GLOBAL STATE ----------------
-prev_positions = deque(maxlen=SMOOTHING_WINDOW)
-last_toggle_time = 0.0
-last_extended_single = None
-last_click_time = 0.0
-SCREEN_W, SCREEN_H = pyautogui.size()
-ws = None
-ws_lock = threading.Lock()
+metrics = Metrics(enabled=METRICS_ENABLED, trace_path=METRICS_TRACE_PATH)
+if RELAY_EMBEDDED:
+    outbox = LocalRelay(RELAY_HOST, RELAY_PORT, max_queue=OUTBOX_MAX_COMMANDS,
+                        hover_formats=WS_HOVER_FORMATS, deadband_px=HOVER_DEADBAND_PX,
+                        deadband_keepalive=HOVER_KEEPALIVE, metrics=metrics)
+    # pages push their clickable labels straight to us; voice targets resolve here
+    page_index = PageIndex(metrics=metrics)
+    outbox.handlers["labels"] = page_index.on_labels
+    outbox.handlers["page_focus"] = page_index.on_focus
+    outbox.on_close.append(page_index.drop)
+else:
+    page_index = None   # the Node relay doesn't pass page labels back to us
+    outbox = WsOutbox(WS_URL, max_commands=OUTBOX_MAX_COMMANDS, hover_formats=WS_HOVER_FORMATS,
+                      deadband_px=HOVER_DEADBAND_PX, deadband_keepalive=HOVER_KEEPALIVE,
+                      metrics=metrics)
 stop_threads = False
-last_smoothed = (SCREEN_W // 2, SCREEN_H // 2)
-
-# ---------------- WebSocket client ----------------
-def ws_connect_background():
-    global ws
-    while not stop_threads:
-        with ws_lock:
-            try:
-                if ws is None:
-                    ws = websocket.create_connection(WS_URL, timeout=3)
-                    print("[ws] Connected to", WS_URL)
-            except Exception:
-                ws = None
-        time.sleep(2)
-
+engine = None
+voice_grammar = Grammar.load(VOICE_GRAMMAR_PATH)
+# set up by init_actuation() (pyautogui needs a display)
+actuator = None
+SCREEN_W, SCREEN_H = 0, 0
+scroll_engine = None
+voice_pipeline = None
+voice_recognizer = None
+voice_vad = None
+recorder = None
+
+# ---------------- Startup helpers ----------------
+def timed_init(name, fn, *args):
+    """Run one init step and report how long it took."""
+    t0 = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - t0
+    print(f"[startup] {name} ready in {elapsed:.2f}s")
+    metrics.gauge(f"startup.{name}_s", round(elapsed, 3))
+    return result
+
+def init_actuation():
+    global actuator, SCREEN_W, SCREEN_H, scroll_engine, voice_pipeline, recorder
+    from actuation import ThreadedActuator, make_actuator
+    actuator = make_actuator(ACTUATOR_BACKEND)
+    print("[actuate] Backend:", type(actuator).__name__)
+    if ACTUATOR_THREADED:
+        actuator = ThreadedActuator(actuator, metrics=metrics)
+        metrics.add_source("actuator", actuator.stats)
+    SCREEN_W, SCREEN_H = actuator.size()
+    # gestures and voice drive one scroll engine; it ticks on its own thread
+    from scroll import ScrollEngine
+    scroll_engine = ScrollEngine(actuator, ws_send_safe, metrics=metrics).start()
+    metrics.add_source("scroll", scroll_engine.stats)
+    voice_pipeline = VoicePipeline(voice_grammar, actuator, ws_send_safe, scroll=scroll_engine,
+                                   pages=page_index)
+    if RECORD_PATH:
+        from replay import SessionRecorder
+        recorder = SessionRecorder(RECORD_PATH, (SCREEN_W, SCREEN_H), save_frames=RECORD_FRAMES)
+
+# ---------------- WebSocket outbox ----------------
 def ws_send_safe(payload: dict):
-    global ws
-    try:
-        with ws_lock:
-            if ws:
-                ws.send(json.dumps(payload))
-                return True
-    except Exception:
-        try:
-            ws.close()
-        except:
-            pass
-        with ws_lock:
-            ws = None
-    return False
-
-# ---------------- Mediapipe helpers ----------------
-mp_hands = mp.solutions.hands
-mp_draw = mp.solutions.drawing_utils
-
-def finger_extended(hand_landmarks, tip_enum):
-    tip = hand_landmarks.landmark[tip_enum.value]
-    pip = hand_landmarks.landmark[tip_enum.value - 2]
-    return tip.y < pip.y
-
-def single_extended_finger(hand_landmarks):
-    idx_ext = finger_extended(hand_landmarks, mp_hands.HandLandmark.INDEX_FINGER_TIP)
-    mid_ext = finger_extended(hand_landmarks, mp_hands.HandLandmark.MIDDLE_FINGER_TIP)
-    ring_ext = finger_extended(hand_landmarks, mp_hands.HandLandmark.RING_FINGER_TIP)
-    pinky_ext = finger_extended(hand_landmarks, mp_hands.HandLandmark.PINKY_TIP)
-    extended_count = sum([idx_ext, mid_ext, ring_ext, pinky_ext])
-    if extended_count == 1:
-        if idx_ext:
-            return "index"
-        if mid_ext:
-            return "middle"
-    return None
-
-# ---------------- Smooth cursor helpers ----------------
-def lerp(a, b, t):
-    return a + (b - a) * t
-
-def smooth_cursor(new_pos):
-    """Combine rolling average + lerp smoothing."""
-    global prev_positions, last_smoothed
-    prev_positions.append(new_pos)
-    avg_x = sum(p[0] for p in prev_positions) / len(prev_positions)
-    avg_y = sum(p[1] for p in prev_positions) / len(prev_positions)
-    smoothed_x = int(lerp(last_smoothed[0], avg_x, LERP_FACTOR))
-    smoothed_y = int(lerp(last_smoothed[1], avg_y, LERP_FACTOR))
-    last_smoothed = (smoothed_x, smoothed_y)
-    return smoothed_x, smoothed_y
-
-# ---------------- Gesture loop ----------------
-def gesture_loop():
-    global last_toggle_time, last_extended_single, last_click_time, stop_threads
-
-    cap = cv2.VideoCapture(CAM_INDEX)
-    if not cap.isOpened():
+    """Queue a payload for the background sender; never blocks on the network."""
+    if not WS_ENABLED:
+        return False
+    return outbox.send(payload)
+
+# ---------------- Camera + MediaPipe ----------------
+def hand_config():
+    """Everything the capture side needs; plain data so it can go to the worker process."""
+    return {
+        "cam_index": CAM_INDEX, "width": CAM_WIDTH, "height": CAM_HEIGHT, "fps": CAM_FPS,
+        "fourcc": CAM_FOURCC, "buffer_size": CAM_BUFFER_SIZE,
+        "min_detection_confidence": MIN_DETECTION_CONFIDENCE,
+        "min_tracking_confidence": MIN_TRACKING_CONFIDENCE,
+        "roi": (ROI_PADDING, ROI_MIN_FRAC, ROI_INPUT_SIZE) if ROI_TRACKING else None,
+        "standby": (STANDBY_AFTER, STANDBY_MODE, STANDBY_PROBE_INTERVAL) if STANDBY_ENABLED else None,
+        "quality": (FRAME_BUDGET_MS / 1000.0,) if QUALITY_ENABLED else None,
+        "max_hands": len(HAND_ROLES),
+        "cpu": 0 if CAMERA_STATIONS else None,     # only the worker process pins itself
+    }
+
+def station_config(station, cpu):
+    return {**hand_config(), "cam_index": station["cam_index"], "cpu": cpu}
+
+def open_camera():
+    from inference_worker import open_grabber
+    grabber = open_grabber(hand_config())
+    if grabber is None:
         print("[camera] ERROR: cannot open camera index", CAM_INDEX)
+    return grabber
+
+def load_hands():
+    from inference_worker import load_hands as _load_hands
+    return _load_hands(hand_config())
+
+def open_local_source(grabber, hands):
+    from inference_worker import LocalHandSource, build_tracker
+    if grabber is None:
+        hands.close()
+        return None
+    tracker = build_tracker(hand_config(), grabber, hands, metrics)
+    return LocalHandSource(grabber, tracker, metrics)
+
+def start_inference_worker(config=None):
+    from inference_worker import InferenceWorker
+    worker = InferenceWorker(config or hand_config(), slots=INFERENCE_RING_SLOTS,
+                             stall_timeout=INFERENCE_STALL_TIMEOUT, metrics=metrics)
+    worker.start()
+    return worker
+
+# ---------------- Gesture engine (cursor, scroll, fist-click) ----------------
+def station_sender(name):
+    def send(payload):
+        return ws_send_safe({**payload, "station": name})
+    return send
+
+def run_gestures(source, stations=()):
+    """Run the main camera (and any extra stations) until ESC or shutdown."""
+    global stop_threads, engine
+    import cv2
+    from actuation import NullActuator
+
+    if source is None:
         return
-
-    hands = mp_hands.Hands(max_num_hands=1,
-                           min_detection_confidence=MIN_DETECTION_CONFIDENCE,
-                           min_tracking_confidence=MIN_TRACKING_CONFIDENCE)
-    print("[camera] Camera started. Press ESC to stop.")
-
-    last_scroll_time = 0.0
-
-    while not stop_threads:
-        ret, frame = cap.read()
-        if not ret:
-            time.sleep(0.01)
-            continue
-
-        frame = cv2.flip(frame, 1)
-        h, w, _ = frame.shape
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = hands.process(rgb)
-        gesture_text = "No hand"
-
-        if results.multi_hand_landmarks:
-            hand_landmarks = results.multi_hand_landmarks[0]
-            index_tip = hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP.value]
-            nx = max(0.0, min(1.0, index_tip.x))
-            ny = max(0.0, min(1.0, index_tip.y))
-
-            # Map to screen + smooth
-            sx = int(nx * SCREEN_W)
-            sy = int(ny * SCREEN_H)
-            smx, smy = smooth_cursor((sx, sy))
-
-            try:
-                pyautogui.moveTo(smx, smy, duration=0.01)
-            except Exception:
-                pass
-
-            ws_send_safe({"x": smx, "y": smy})
-
-            # Scroll control
-            now = time.time()
-            if ny < SCROLL_ZONE_TOP and (now - last_scroll_time) >= SCROLL_INTERVAL:
-                dist = (SCROLL_ZONE_TOP - ny) / SCROLL_ZONE_TOP
-                scroll_amount = int(max(20, dist * SCROLL_SENSITIVITY))
-                pyautogui.scroll(scroll_amount)
-                last_scroll_time = now
-                gesture_text = f"Scroll Up ({scroll_amount})"
-                ws_send_safe({"command": "scroll up"})
-            elif ny > SCROLL_ZONE_BOTTOM and (now - last_scroll_time) >= SCROLL_INTERVAL:
-                dist = (ny - SCROLL_ZONE_BOTTOM) / (1.0 - SCROLL_ZONE_BOTTOM)
-                scroll_amount = int(max(20, dist * SCROLL_SENSITIVITY))
-                pyautogui.scroll(-scroll_amount)
-                last_scroll_time = now
-                gesture_text = f"Scroll Down ({scroll_amount})"
-                ws_send_safe({"command": "scroll down"})
-
-            # Toggle-finger click
-            current_single = single_extended_finger(hand_landmarks)
-            if current_single is not None:
-                if last_extended_single and last_extended_single != current_single:
-                    if (now - last_toggle_time) <= TOGGLE_WINDOW and (now - last_click_time) > TOGGLE_COOLDOWN:
-                        pyautogui.click()
-                        last_click_time = now
-                        gesture_text = f"Click ({last_extended_single}->{current_single})"
-                        ws_send_safe({"command": "click"})
-                        last_extended_single = None
-                    else:
-                        last_toggle_time = now
-                        last_extended_single = current_single
-                else:
-                    last_toggle_time = now
-                    last_extended_single = current_single
-
-            mp_draw.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
-            frame_x = int(smx * (w / SCREEN_W))
-            frame_y = int(smy * (h / SCREEN_H))
-            cv2.circle(frame, (frame_x, frame_y), 8, (0, 0, 255), -1)
-
-        cv2.putText(frame, gesture_text, (10, 30),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 200, 255), 2)
-        cv2.imshow("Gesture Mouse (ESC to quit)", frame)
-
-        if cv2.waitKey(1) & 0xFF == 27:
+    screen = (SCREEN_W, SCREEN_H)
+    engine = Engine(metrics)
+    engine.add(CameraSession("main", source, actuator, ws_send_safe, screen, HAND_ROLES,
+                             scroll=scroll_engine, metrics=metrics, recorder=recorder))
+    for station, worker in stations:
+        engine.add(CameraSession(station["name"], worker, NullActuator(screen),
+                                 station_sender(station["name"]), screen, HAND_ROLES,
+                                 metrics=metrics, recorder=recorder, primary=False))
+    print(f"[camera] {len(engine.sessions)} camera session(s) started. Running in background. "
+          "Press ESC to stop.")
+    first_move = None
+
+    def on_frame(cursor):
+        nonlocal first_move
+        global stop_threads
+        if first_move is None and cursor is not None:
+            first_move = time.perf_counter() - START_TIME
+            print(f"[startup] First cursor move {first_move:.2f}s after launch")
+            metrics.gauge("startup.first_cursor_move_s", round(first_move, 3))
+        # background mode: no window
+        if stop_threads or cv2.waitKey(1) & 0xFF == 27:
             stop_threads = True
-            break
+        return stop_threads
 
-    hands.close()
-    cap.release()
+    engine.run(on_frame)
+    closed = engine.close()
     cv2.destroyAllWindows()
-    print("[camera] Stopped.")
+    for name, st in closed.items():
+        print(f"[camera] {name} stopped. frames grabbed={st.get('grabbed')} "
+              f"processed={st.get('delivered')} dropped={st.get('dropped')}")
 
-# ---------------- Voice ----------------
-def start_voice_listener():
-    recognizer = sr.Recognizer()
-    mic = sr.Microphone()
-    with mic as source:
-        print("[voice] Calibrating ambient noise...")
-        recognizer.adjust_for_ambient_noise(source, duration=1)
-        print("[voice] Ready for commands!")
-
-    def voice_callback(recognizer_obj, audio):
-        try:
-            raw = recognizer_obj.recognize_google(audio)
-            text = raw.strip().lower()
-            print("[voice] Heard:", repr(raw))
-
-            # click-like phrases
-            m = re.search(rf'\b{CLICK_VERBS_RE}\b\s*(?:the\s)?(.+)?', text)
-            if m:
-                target = (m.group(1) or "").strip()
-                target = re.sub(r'\b(button|link|page|menu)\b$', '', target).strip()
-                if target in HERE_WORDS:
-                    pyautogui.click()
-                    ws_send_safe({"command": "click"})
-                    return
-                if target:
-                    target = re.sub(r'^(on|to|the)\s+', '', target).strip()
-                    cmd_text = "click " + target
-                    ws_send_safe({"command": cmd_text})
-                    return
-
-            # scrolls
-            if any(p in text for p in ["scroll up", "go up", "move up", "page up", "up"]):
-                pyautogui.scroll(300)
-                ws_send_safe({"command": "scroll up"})
-                return
-            if any(p in text for p in ["scroll down", "go down", "move down", "page down", "down", "go to bottom"]):
-                pyautogui.scroll(-300)
-                ws_send_safe({"command": "scroll down"})
-                return
-
-            # fallback
-            ws_send_safe({"command": text})
-
-        except sr.UnknownValueError:
-            print("[voice] Unrecognized speech")
-        except sr.RequestError as e:
-            print("[voice] STT request error:", e)
-        except Exception as e:
-            print("[voice] Unexpected voice error:", e)
-
-    stop_fn = recognizer.listen_in_background(mic, voice_callback, phrase_time_limit=4)
-    return stop_fn
-
-# ---------------- MAIN ----------------
-if __name__ == "__main__":
+# ---------------- Voice (non-blocking) ----------------
+def handle_voice_text(text, audio=None):
+    """Act on one recognized utterance."""
+    if recorder is not None:
+        recorder.voice(time.time(), text, audio)
+    with metrics.timer("voice.handle"):
+        voice_pipeline.handle_text(text)
+
+def load_calibration(key):
     try:
-        t_ws = threading.Thread(target=ws_connect_background, daemon=True)
-        t_ws.start()
-        stop_listen = start_voice_listener()
-        gesture_loop()
-    except KeyboardInterrupt:
-        print("Interrupted by user.")
-    finally:
-        stop_threads = True
-        try:
-            stop_listen(wait_for_stop=False)
-        except Exception:
-            pass
-        with ws_lock:
-            try:
-                if ws:
-                    ws.close()
-            except:
-                pass
-        print("Shutting down.")
-        '''
-
+        with open(VOICE_CALIBRATION_PATH, "r", encoding="utf-8") as f:
+            return float(json.load(f)[key])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
 
-"""
-Updated controller WITH closed-fist click and voice click.
-- Cursor: smoothed index fingertip
-- Scroll: index finger vertical zones (up/down)
-- Click: closed fist + voice click
-- Voice: flexible commands (click/open/scroll synonyms)
-- WebSocket: sends hover coords and commands to ws://localhost:8765
-Requirements:
- pip install opencv-python mediapipe pyautogui speechrecognition websocket-client numpy
-(Windows: pyaudio may be needed for microphone)
-"""
-
-import time
-import threading
-import json
-import re
-from collections import deque
-
-import cv2
-import mediapipe as mp
-import pyautogui
-import numpy as np
-import speech_recognition as sr
-import websocket  # websocket-client
-
-# ---------------- CONFIG ----------------
-WS_URL = "ws://localhost:8765"
-CAM_INDEX = 0
-SMOOTHING_WINDOW = 5        # moving average window
-MIN_DETECTION_CONFIDENCE = 0.6
-MIN_TRACKING_CONFIDENCE = 0.6
-
-# Scrolling control (normalized coords)
-SCROLL_ZONE_TOP = 0.36
-SCROLL_ZONE_BOTTOM = 0.64
-SCROLL_INTERVAL = 0.12
-SCROLL_SENSITIVITY = 1200
-
-# Click settings
-CLICK_COOLDOWN = 0.8        # seconds between consecutive clicks
-
-# voice grammar helpers
-CLICK_VERBS_RE = r"(?:click|press|tap|select|activate|open|go to|goto|go|take me to|navigate to|show)"
-HERE_WORDS = {"here", "that", "this", ""}
-
-# fingertip enums
-FINGER_TIPS_ENUMS = [
-    mp.solutions.hands.HandLandmark.INDEX_FINGER_TIP,
-    mp.solutions.hands.HandLandmark.MIDDLE_FINGER_TIP,
-    mp.solutions.hands.HandLandmark.RING_FINGER_TIP,
-    mp.solutions.hands.HandLandmark.PINKY_TIP
-]
-
-# ---------------- GLOBAL STATE ----------------
-prev_positions = deque(maxlen=SMOOTHING_WINDOW)
-last_click_time = 0.0
-SCREEN_W, SCREEN_H = pyautogui.size()
-ws = None
-ws_lock = threading.Lock()
-stop_threads = False
-
-# ---------------- WebSocket client w/ reconnect ----------------
-def ws_connect_background():
-    global ws
-    while not stop_threads:
-        with ws_lock:
-            try:
-                if ws is None:
-                    ws = websocket.create_connection(WS_URL, timeout=3)
-                    print("[ws] Connected to", WS_URL)
-            except Exception:
-                ws = None
-        time.sleep(2)
-
-def ws_send_safe(payload: dict):
-    global ws
+def save_calibration(**values):
     try:
-        with ws_lock:
-            if ws:
-                ws.send(json.dumps(payload))
-                return True
-    except Exception:
-        try:
-            ws.close()
-        except:
-            pass
-        with ws_lock:
-            ws = None
-    return False
-
-# ---------------- Mediapipe helpers ----------------
-mp_hands = mp.solutions.hands
-mp_draw = mp.solutions.drawing_utils
-
-def finger_extended(hand_landmarks, tip_enum):
-    """Return True if a finger tip is above (smaller y) its PIP joint (i.e., extended)."""
-    tip = hand_landmarks.landmark[tip_enum.value]
-    pip = hand_landmarks.landmark[tip_enum.value - 2]
-    return tip.y < pip.y
-
-def is_fist(hand_landmarks):
-    """
-    Detects a closed fist: all four fingers folded near MCP joints.
-    Returns True if 3 or more fingers folded.
-    """
-    folded_count = 0
-    tips = [8, 12, 16, 20]  # Index, middle, ring, pinky tips
-    mcps = [5, 9, 13, 17]   # respective MCP joints
-    for tip_idx, mcp_idx in zip(tips, mcps):
-        tip_y = hand_landmarks.landmark[tip_idx].y
-        mcp_y = hand_landmarks.landmark[mcp_idx].y
-        if tip_y > mcp_y:
-            folded_count += 1
-    return folded_count >= 3
-
-# ---------------- Gesture loop (cursor, scroll, fist-click) ----------------
-def gesture_loop():
-    global prev_positions, last_click_time, stop_threads
-
-    cap = cv2.VideoCapture(CAM_INDEX)
-    if not cap.isOpened():
-        print("[camera] ERROR: cannot open camera index", CAM_INDEX)
-        return
-
-    hands = mp_hands.Hands(max_num_hands=1,
-                           min_detection_confidence=MIN_DETECTION_CONFIDENCE,
-                           min_tracking_confidence=MIN_TRACKING_CONFIDENCE)
-    print("[camera] Camera started. Running in background. Press ESC to stop.")
-
-    last_scroll_time = 0.0
-
-    while not stop_threads:
-        ret, frame = cap.read()
-        if not ret:
-            time.sleep(0.01)
-            continue
-
-        frame = cv2.flip(frame, 1)  # mirror
-        h, w, _ = frame.shape
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = hands.process(rgb)
-
-        if results.multi_hand_landmarks:
-            hand_landmarks = results.multi_hand_landmarks[0]
-
-            # index fingertip normalized coords
-            index_tip = hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP.value]
-            nx = max(0.0, min(1.0, index_tip.x))
-            ny = max(0.0, min(1.0, index_tip.y))
+        with open(VOICE_CALIBRATION_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = {}
+    data.update(values, saved=time.time())
+    try:
+        with open(VOICE_CALIBRATION_PATH, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+    except OSError as e:
+        print("[voice] Could not save calibration:", e)
 
-            # map to screen coords
-            sx = int(nx * SCREEN_W)
-            sy = int(ny * SCREEN_H)
+def save_voice_calibration():
+    if voice_vad is not None:
+        save_calibration(vad_floor_db=round(voice_vad.vad.noise_floor_db, 2))
+    elif voice_recognizer is not None:
+        save_calibration(energy_threshold=voice_recognizer.energy_threshold)
 
-            # smoothing
-            prev_positions.append((sx, sy))
-            avg_x = int(sum(p[0] for p in prev_positions) / len(prev_positions))
-            avg_y = int(sum(p[1] for p in prev_positions) / len(prev_positions))
+def start_google_listener():
+    global voice_recognizer, voice_vad
+    import speech_recognition as sr
 
-            # move system cursor
-            try:
-                pyautogui.moveTo(avg_x, avg_y, duration=0.02)
-            except Exception:
-                pass
+    recognizer = sr.Recognizer()
 
-            # send hover coords to extension
-            ws_send_safe({"x": avg_x, "y": avg_y})
-
-            # ---------- SCROLL CONTROL ----------
-            now = time.time()
-            if ny < SCROLL_ZONE_TOP and (now - last_scroll_time) >= SCROLL_INTERVAL:
-                dist = (SCROLL_ZONE_TOP - ny) / SCROLL_ZONE_TOP
-                scroll_amount = int(max(20, dist * SCROLL_SENSITIVITY))
-                pyautogui.scroll(scroll_amount)
-                last_scroll_time = now
-                ws_send_safe({"command": "scroll up"})
-            elif ny > SCROLL_ZONE_BOTTOM and (now - last_scroll_time) >= SCROLL_INTERVAL:
-                dist = (ny - SCROLL_ZONE_BOTTOM) / (1.0 - SCROLL_ZONE_BOTTOM)
-                scroll_amount = int(max(20, dist * SCROLL_SENSITIVITY))
-                pyautogui.scroll(-scroll_amount)
-                last_scroll_time = now
-                ws_send_safe({"command": "scroll down"})
-
-            # ---------- FIST CLICK ----------
-            if is_fist(hand_landmarks) and (now - last_click_time) > CLICK_COOLDOWN:
-                pyautogui.click()
-                last_click_time = now
-                ws_send_safe({"command": "click"})
+    def on_result(raw, audio, info):
+        print(f"[voice] Heard: {raw!r} (waited {info['queue_wait_ms']:.0f}ms, "
+              f"stt {info['recognize_ms']:.0f}ms)")
+        try:
+            handle_voice_text(raw, audio)
+        except Exception as e:
+            print("[voice] Unexpected voice error:", e)
 
-        # background mode: no window
-        if cv2.waitKey(1) & 0xFF == 27:
-            stop_threads = True
-            break
+    def on_error(e, info):
+        if isinstance(e, sr.UnknownValueError):
+            print("[voice] Could not understand audio")
+        elif isinstance(e, sr.RequestError):
+            print("[voice] STT request error:", e)
+        else:
+            print("[voice] Unexpected voice error:", e)
 
-    hands.close()
-    cap.release()
-    cv2.destroyAllWindows()
-    print("[camera] Stopped.")
+    # the listener thread only hands audio over; recognition runs on the pool
+    from stt_pool import RecognizerPool
+    pool = RecognizerPool(recognizer.recognize_google, on_result, on_error,
+                          workers=STT_WORKERS, max_queue=STT_MAX_QUEUE, max_age=STT_MAX_AGE,
+                          head_timeout=STT_HEAD_TIMEOUT, metrics=metrics)
+    metrics.add_source("stt", pool.stats)
+
+    if VAD_ENABLED:
+        from vad import VadListener
+
+        def on_audio(pcm, sample_rate, sample_width, ended_at):
+            pool.submit(sr.AudioData(pcm, sample_rate, sample_width), captured=ended_at)
+
+        listener = VadListener(on_audio, sample_rate=VAD_SAMPLE_RATE,
+                               noise_floor_db=load_calibration("vad_floor_db"),
+                               hangover_ms=VAD_HANGOVER_MS, pre_roll_ms=VAD_PRE_ROLL_MS,
+                               max_utterance_s=VAD_MAX_UTTERANCE, metrics=metrics)
+        metrics.add_source("vad", listener.stats)
+        mic = sr.Microphone(sample_rate=VAD_SAMPLE_RATE, chunk_size=listener.chunk_size)
+        voice_vad = listener
+        stop_listening = listener.listen_in_background(mic)
+        print("[voice] VAD endpointing active; listening in background.")
+    else:
+        mic = sr.Microphone()
+        cached = load_calibration("energy_threshold")
+        if cached is not None:
+            # the dynamic threshold refines this in the background while we listen
+            recognizer.energy_threshold = cached
+            print(f"[voice] Using cached noise calibration (threshold {cached:.0f}); listening in background.")
+        else:
+            with mic as source:
+                print("[voice] Calibrating ambient noise... please be quiet")
+                recognizer.adjust_for_ambient_noise(source, duration=1)
+            save_calibration(energy_threshold=recognizer.energy_threshold)
+            print("[voice] Calibration complete; listening in background.")
+        voice_recognizer = recognizer
+        stop_listening = recognizer.listen_in_background(mic, lambda _, audio: pool.submit(audio),
+                                                         phrase_time_limit=4)
+
+    def stop_fn(wait_for_stop=True):
+        stop_listening(wait_for_stop=wait_for_stop)
+        pool.close()
+    return stop_fn
 
-# ---------------- Voice (non-blocking) ----------------
-def start_voice_listener():
-    recognizer = sr.Recognizer()
-    mic = sr.Microphone()
-    with mic as source:
-        print("[voice] Calibrating ambient noise... please be quiet")
-        recognizer.adjust_for_ambient_noise(source, duration=1)
-        print("[voice] Calibration complete; listening in background.")
+def start_vosk_listener():
+    import speech_recognition as sr
+    from vosk_listener import VoskStreamListener
 
-    def voice_callback(recognizer_obj, audio):
+    def on_text(text, partial):
+        print("[voice] Heard (partial):" if partial else "[voice] Heard:", repr(text))
         try:
-            raw = recognizer_obj.recognize_google(audio)
-            text = raw.strip().lower()
-            print("[voice] Heard:", repr(raw))
-
-            # ---------- Voice click ----------
-            if any(word in text for word in ["click", "tap", "press", "select"]):
-                pyautogui.click()
-                ws_send_safe({"command": "click"})
-                print("[voice] Click executed")
-                return
-
-            # click-like phrases (open/go to/etc.)
-            m = re.search(rf'\b{CLICK_VERBS_RE}\b\s*(?:the\s)?(.+)?', text)
-            if m:
-                target = (m.group(1) or "").strip()
-                target = re.sub(r'\b(button|link|page|menu)\b$', '', target).strip()
-                if target in HERE_WORDS:
-                    pyautogui.click()
-                    ws_send_safe({"command": "click"})
-                    return
-                if target:
-                    target = re.sub(r'^(on|to|the)\s+', '', target).strip()
-                    cmd_text = "click " + target
-                    ws_send_safe({"command": cmd_text})
-                    return
-
-            # scroll commands
-            if any(p in text for p in ["scroll up", "go up", "move up", "page up", "up"]):
-                pyautogui.scroll(300)
-                ws_send_safe({"command": "scroll up"})
-                return
-            if any(p in text for p in ["scroll down", "go down", "move down", "page down", "down", "go to bottom"]):
-                pyautogui.scroll(-300)
-                ws_send_safe({"command": "scroll down"})
-                return
-
-            # fallback
-            ws_send_safe({"command": text})
-
-        except sr.UnknownValueError:
-            print("[voice] Could not understand audio")
-        except sr.RequestError as e:
-            print("[voice] STT request error:", e)
+            handle_voice_text(text)
         except Exception as e:
             print("[voice] Unexpected voice error:", e)
 
-    stop_fn = recognizer.listen_in_background(mic, voice_callback, phrase_time_limit=4)
-    return stop_fn
+    terminal, open_ = voice_grammar.partial_phrases()
+    listener = VoskStreamListener(VOSK_MODEL_PATH, on_text,
+                                  terminal_phrases=terminal,
+                                  open_phrases=open_,
+                                  sample_rate=VOSK_SAMPLE_RATE,
+                                  stable_after=VOSK_PARTIAL_STABLE)
+    mic = sr.Microphone(sample_rate=VOSK_SAMPLE_RATE, chunk_size=VOSK_CHUNK)
+    print("[voice] Vosk streaming recognizer listening (offline).")
+    return listener.listen_in_background(mic)
+
+def start_voice_listener(actuation_ready):
+    """Open the microphone; only start acting on speech once actuation is up."""
+    actuation_ready.result()
+    if VOICE_BACKEND == "vosk":
+        try:
+            return start_vosk_listener()
+        except (ImportError, OSError) as e:
+            print("[voice] Vosk unavailable, falling back to Google STT:", e)
+    return start_google_listener()
 
 # ---------------- MAIN ----------------
 if __name__ == "__main__":
+    init_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="init")
+    voice_future = None
     try:
-        t_ws = threading.Thread(target=ws_connect_background, daemon=True)
-        t_ws.start()
-
-        stop_listen = start_voice_listener()
-
-        gesture_loop()
+        metrics.add_source("ws", outbox.stats)
+        if page_index is not None:
+            metrics.add_source("pages", page_index.stats)
+        if METRICS_ENABLED:
+            metrics.serve(METRICS_PORT)
+        if WS_ENABLED:
+            outbox.start()      # connects (or starts serving) in the background
+
+        # camera, MediaPipe model and microphone come up in parallel
+        actuation_future = init_pool.submit(timed_init, "actuation", init_actuation)
+        if GESTURE_ENABLED and INFERENCE_PROCESS:
+            source_future = init_pool.submit(timed_init, "inference_worker", start_inference_worker)
+        elif GESTURE_ENABLED:
+            camera_future = init_pool.submit(timed_init, "camera", open_camera)
+            hands_future = init_pool.submit(timed_init, "mediapipe", load_hands)
+        if VOICE_ENABLED:
+            voice_future = init_pool.submit(timed_init, "voice", start_voice_listener, actuation_future)
+        station_futures = []
+        if GESTURE_ENABLED:
+            station_futures = [(station, init_pool.submit(timed_init, f"station.{station['name']}",
+                                                          start_inference_worker,
+                                                          station_config(station, cpu)))
+                               for cpu, station in enumerate(CAMERA_STATIONS, 1)]
+
+        actuation_future.result()
+        if GESTURE_ENABLED:
+            if INFERENCE_PROCESS:
+                source = source_future.result()
+            else:
+                source = open_local_source(camera_future.result(), hands_future.result())
+            run_gestures(source, [(station, f.result()) for station, f in station_futures])
+        else:
+            while not stop_threads:
+                time.sleep(0.5)
 
     except KeyboardInterrupt:
         print("Interrupted by user.")
     finally:
         stop_threads = True
-        try:
-            stop_listen(wait_for_stop=False)
-        except Exception:
-            pass
-        with ws_lock:
+        if engine is not None:
+            engine.close()
+        if voice_future is not None:
             try:
-                if ws:
-                    ws.close()
-            except:
+                voice_future.result()(wait_for_stop=False)
+            except Exception:
                 pass
-        print("Shutting down.")
\ No newline at end of file
+        save_voice_calibration()
+        init_pool.shutdown(wait=False)
+        if scroll_engine is not None:
+            scroll_engine.close()
+        if actuator is not None:
+            actuator.close()
+        outbox.stop()
+        print("[ws] Outbox stats:", outbox.stats())
+        if recorder is not None:
+            recorder.close()
+        metrics.close()
+        print("Shutting down.")
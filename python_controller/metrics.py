@@ -0,0 +1,208 @@
+# metrics.py
+"""
+Low-overhead latency metrics
+----------------------------
+- Per-stage timers feeding rolling histograms (p50/p95/p99/max)
+- Counters, gauges and FPS
+- Optional JSONL trace (one line per frame with its stage timings)
+- Optional local HTTP endpoint: GET http://127.0.0.1:<port>/metrics -> JSON
+
+A disabled Metrics hands out a shared no-op timer, so instrumented code
+costs one attribute lookup and an empty `with` block per stage.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+
+class RollingHistogram:
+    """Keeps the last `size` samples (seconds) in a NumPy ring."""
+
+    def __init__(self, size=1024):
+        self.buf = np.zeros(size, dtype=np.float64)
+        self.size = size
+        self.head = 0
+        self.count = 0
+        self.total = 0
+
+    def observe(self, value):
+        self.buf[self.head] = value
+        self.head = (self.head + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+        self.total += 1
+
+    def summary(self):
+        if self.count == 0:
+            return {"count": 0}
+        data = self.buf[:self.count] * 1000.0
+        p50, p95, p99 = np.percentile(data, (50, 95, 99))
+        return {
+            "count": self.total,
+            "mean_ms": round(float(data.mean()), 3),
+            "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3),
+            "p99_ms": round(float(p99), 3),
+            "max_ms": round(float(data.max()), 3),
+        }
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _StageTimer:
+    __slots__ = ("metrics", "name", "t0")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.t0)
+        return False
+
+
+class Metrics:
+    def __init__(self, enabled=False, window=1024, trace_path=None):
+        self.enabled = enabled
+        self.window = window
+        self.started = time.time()
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.sources = {}           # name -> callable returning a dict (e.g. outbox.stats)
+        self._lock = threading.Lock()
+        self._last_frame = None
+        self._frame_thread = None
+        self._frame_spans = {}
+        self._trace_lock = threading.Lock()
+        self._trace = open(trace_path, "a", encoding="utf-8") if (enabled and trace_path) else None
+        self._server = None
+
+    # ---------- recording ----------
+    def timer(self, name):
+        """`with metrics.timer("hands.process"): ...`"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self, name)
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        hist = self.histograms.get(name)
+        if hist is None:
+            with self._lock:
+                hist = self.histograms.setdefault(name, RollingHistogram(self.window))
+        hist.observe(seconds)
+        if self._trace is not None:
+            if threading.get_ident() == self._frame_thread:
+                self._frame_spans[name] = seconds
+            else:
+                # voice / sender threads: one line per observation
+                self._write_trace({"t": time.time(), "stage": name, "ms": round(seconds * 1000.0, 3)})
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        if self.enabled:
+            self.gauges[name] = value
+
+    def add_source(self, name, fn):
+        self.sources[name] = fn
+
+    def end_frame(self, **fields):
+        """Mark the end of a camera frame: feeds FPS and writes the trace line."""
+        if not self.enabled:
+            return
+        self._frame_thread = threading.get_ident()
+        now = time.perf_counter()
+        if self._last_frame is not None:
+            self.observe("frame.interval", now - self._last_frame)
+        self._last_frame = now
+        if self._trace is not None:
+            spans = {k: round(v * 1000.0, 3) for k, v in self._frame_spans.items()}
+            self._frame_spans = {}
+            self._write_trace({"t": time.time(), "ms": spans, **fields})
+
+    def _write_trace(self, record):
+        with self._trace_lock:
+            if self._trace is not None:
+                self._trace.write(json.dumps(record) + "\n")
+
+    # ---------- reading ----------
+    def snapshot(self):
+        with self._lock:
+            hists = dict(self.histograms)
+        stages = {name: h.summary() for name, h in hists.items()}
+        interval = stages.get("frame.interval", {})
+        fps = round(1000.0 / interval["p50_ms"], 1) if interval.get("p50_ms") else 0.0
+        sources = {}
+        for name, fn in list(self.sources.items()):
+            try:
+                sources[name] = fn()
+            except Exception as e:
+                sources[name] = {"error": str(e)}
+        return {
+            "enabled": self.enabled,
+            "uptime_s": round(time.time() - self.started, 1),
+            "fps": fps,
+            "stages": stages,
+            "counters": dict(self.counters),
+            "gauges": dict(self.gauges),
+            "sources": sources,
+        }
+
+    # ---------- HTTP endpoint ----------
+    def serve(self, port, host="127.0.0.1"):
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = json.dumps(metrics.snapshot(), default=str).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        print(f"[metrics] Serving http://{host}:{port}/metrics")
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+        with self._trace_lock:
+            if self._trace is not None:
+                self._trace.close()
+                self._trace = None
+
+
+NULL_METRICS = Metrics(enabled=False)
@@ -0,0 +1,280 @@
+# outbox.py
+"""
+Non-blocking WebSocket outbox
+-----------------------------
+- One background thread owns the connection: connecting, serializing, sending
+- Hover {"x","y"} updates share a single latest-wins slot; hover from an
+  extra camera station ({"station": name}) gets a slot and dead-band of its
+  own and always goes out as JSON with the station in it (protocol.py)
+- Discrete commands (click, scroll, ...) go through a bounded FIFO and are
+  never coalesced; they are held across reconnects and flushed in order
+- Queue depth, coalesced hovers, overflows and send latency are counted
+- Hover wire format (JSON or binary "bin1") and the dead-band are negotiated
+  with the relay on every connect (see protocol.py)
+- Nothing the relay broadcasts to us is used; it is read and discarded as it
+  arrives so it can't back up into the relay's socket buffers
+"""
+
+import json
+import select
+import threading
+import time
+from collections import deque
+
+import websocket  # websocket-client
+
+import protocol
+from metrics import NULL_METRICS
+
+
+class WsOutbox:
+    def __init__(self, url, max_commands=256, connect_timeout=3, retry_interval=2,
+                 hover_formats=protocol.HOVER_FORMATS, deadband_px=0, deadband_keepalive=1.0,
+                 hello_timeout=1.0, metrics=NULL_METRICS):
+        self.url = url
+        self.metrics = metrics
+        self.max_commands = max_commands
+        self.connect_timeout = connect_timeout
+        self.retry_interval = retry_interval
+        self.hover_formats = tuple(hover_formats)
+        self.deadband_px = deadband_px
+        self.hello_timeout = hello_timeout
+
+        self.hover_format = "json"      # set per connection by the handshake
+        self.deadband_keepalive = deadband_keepalive
+        self.deadband = protocol.DeadBand(deadband_px, deadband_keepalive)
+        self.station_deadband = {}      # station -> DeadBand
+        self.seq = 0                    # shared by hover and commands
+
+        self.ws = None
+        self._cond = threading.Condition()
+        self._commands = deque()
+        self._hover = None          # (payload, enqueue_ts) or None
+        self._station_hover = {}    # station -> (payload, enqueue_ts)
+        self._running = False
+        self._stopped = threading.Event()
+        self._thread = None
+
+        # counters
+        self.hover_enqueued = 0
+        self.hover_coalesced = 0
+        self.hover_suppressed = 0
+        self.hover_sent = 0
+        self.commands_sent = 0
+        self.command_overflow = 0
+        self.send_errors = 0
+        self.connects = 0
+        self.inbound_discarded = 0
+        self.send_latency_ema = 0.0     # enqueue -> sent, seconds
+        self.send_latency_max = 0.0
+
+    # ---------- producer side (called from hot loops) ----------
+    def send_hover(self, payload):
+        now = time.time()
+        station = payload.get("station")
+        with self._cond:
+            if station is None:
+                deadband = self.deadband
+            else:
+                deadband = self.station_deadband.get(station)
+                if deadband is None:
+                    deadband = self.station_deadband[station] = protocol.DeadBand(
+                        self.deadband.px, self.deadband_keepalive)
+            if not deadband.allow(payload["x"], payload["y"], now):
+                self.hover_suppressed += 1
+                return False
+            if station is None:
+                if self._hover is not None:
+                    self.hover_coalesced += 1
+                self._hover = (payload, now)
+            else:
+                if station in self._station_hover:
+                    self.hover_coalesced += 1
+                self._station_hover[station] = (payload, now)
+            self.hover_enqueued += 1
+            self._cond.notify()
+        return True
+
+    def send_command(self, payload):
+        with self._cond:
+            if len(self._commands) >= self.max_commands:
+                self.command_overflow += 1
+                return False
+            self._commands.append((payload, time.time()))
+            self._cond.notify()
+        return True
+
+    def send(self, payload):
+        """Route a payload: bare coordinates are hover, everything else is a command."""
+        if "command" not in payload and "x" in payload and "y" in payload:
+            return self.send_hover(payload)
+        return self.send_command(payload)
+
+    @property
+    def connected(self):
+        return self.ws is not None
+
+    # ---------- sender thread ----------
+    def start(self):
+        self._running = True
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="ws-outbox", daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        try:
+            self.ws = websocket.create_connection(self.url, timeout=self.connect_timeout)
+            self.connects += 1
+            self._handshake()
+            print(f"[ws] Connected to {self.url} (hover={self.hover_format}, "
+                  f"deadband={self.deadband.px}px)")
+        except Exception:
+            self.ws = None
+
+    def _handshake(self):
+        """Offer our hover formats; fall back to JSON if the relay doesn't answer."""
+        self.hover_format = "json"
+        self.ws.send(protocol.make_hello("controller", self.hover_formats, self.deadband_px))
+        self.ws.settimeout(self.hello_timeout)
+        deadline = time.time() + self.hello_timeout
+        try:
+            while time.time() < deadline:
+                welcome = protocol.parse_welcome(self.ws.recv())
+                if welcome is None:
+                    continue    # old relays echo our hello back; skip it
+                if welcome.get("hover_format") in self.hover_formats:
+                    self.hover_format = welcome["hover_format"]
+                with self._cond:
+                    self.deadband.px = int(welcome.get("deadband_px", self.deadband_px))
+                    for deadband in self.station_deadband.values():
+                        deadband.px = self.deadband.px
+                break
+        except websocket.WebSocketTimeoutException:
+            pass
+        finally:
+            self.ws.settimeout(self.connect_timeout)
+        with self._cond:
+            self.deadband.reset()
+            for deadband in self.station_deadband.values():
+                deadband.reset()
+
+    def _next_item(self):
+        """Commands first (in order), then the latest hover, then stations'. Caller holds the lock."""
+        if self._commands:
+            return self._commands[0], True
+        if self._hover is not None:
+            item, self._hover = self._hover, None
+            return item, False
+        if self._station_hover:
+            return self._station_hover.pop(next(iter(self._station_hover))), False
+        return None, False
+
+    def _run(self):
+        while self._running:
+            if self.ws is None:
+                self._connect()
+                if self.ws is None:
+                    # not the condition: producers notify it every frame
+                    self._stopped.wait(self.retry_interval)
+                    continue
+
+            try:
+                self._drain()
+            except Exception:
+                self._drop_connection()
+                continue
+
+            with self._cond:
+                item, is_command = self._next_item()
+                if item is None:
+                    self._cond.wait(0.5)
+                    continue
+
+            payload, enqueued = item
+            t0 = time.perf_counter()
+            try:
+                if is_command:
+                    self._send_command_frame(payload, enqueued)
+                else:
+                    self._send_hover_frame(payload, enqueued)
+            except Exception:
+                self.send_errors += 1
+                self._drop_connection()
+                continue    # commands stay queued; the hover is superseded soon enough
+
+            if is_command:
+                with self._cond:
+                    self._commands.popleft()
+                self.commands_sent += 1
+            else:
+                self.hover_sent += 1
+            latency = time.time() - enqueued
+            self.metrics.observe("ws.send", time.perf_counter() - t0)
+            self.metrics.observe("ws.queue_wait", latency)
+            self.send_latency_ema += 0.1 * (latency - self.send_latency_ema)
+            self.send_latency_max = max(self.send_latency_max, latency)
+
+    def _drop_connection(self):
+        try:
+            self.ws.close()
+        except Exception:
+            pass
+        self.ws = None
+
+    def _drain(self):
+        """Read and discard whatever has arrived (other clients' broadcasts)."""
+        sock = self.ws.sock
+        while sock is not None and select.select([sock], [], [], 0)[0]:
+            self.ws.recv()
+            self.inbound_discarded += 1
+
+    def _send_command_frame(self, payload, enqueued):
+        self.seq += 1
+        message = {k: v for k, v in payload.items() if k != "capture_ts"}
+        message["seq"] = self.seq
+        message["ts"] = round(protocol.monotonic_ms(payload.get("capture_ts", enqueued)), 3)
+        self.ws.send(json.dumps(message))
+
+    def _send_hover_frame(self, payload, enqueued):
+        self.seq += 1
+        ts_ms = protocol.monotonic_ms(payload.get("capture_ts", enqueued))
+        station = payload.get("station")
+        if self.hover_format == "bin1" and station is None:
+            self.ws.send_binary(protocol.pack_hover(self.seq, ts_ms, payload["x"], payload["y"]))
+        else:
+            self.ws.send(protocol.hover_json(self.seq, ts_ms, payload["x"], payload["y"], station))
+
+    def stats(self):
+        with self._cond:
+            depth = len(self._commands) + (1 if self._hover is not None else 0) + len(self._station_hover)
+        return {
+            "connected": self.connected,
+            "hover_format": self.hover_format,
+            "queue_depth": depth,
+            "hover_enqueued": self.hover_enqueued,
+            "hover_coalesced": self.hover_coalesced,
+            "hover_suppressed": self.hover_suppressed,
+            "hover_sent": self.hover_sent,
+            "commands_sent": self.commands_sent,
+            "command_overflow": self.command_overflow,
+            "send_errors": self.send_errors,
+            "connects": self.connects,
+            "inbound_discarded": self.inbound_discarded,
+            "send_latency_ms": round(self.send_latency_ema * 1000, 2),
+            "send_latency_max_ms": round(self.send_latency_max * 1000, 2),
+        }
+
+    def stop(self):
+        self._running = False
+        self._stopped.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=self.connect_timeout + 1)
+            self._thread = None
+        if self.ws is not None:
+            try:
+                self.ws.close()
+            except Exception:
+                pass
+            self.ws = None
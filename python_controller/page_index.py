@@ -0,0 +1,198 @@
+# page_index.py
+"""
+Clickable-element index for voice targets
+-----------------------------------------
+- Each page (content.js) gives its clickable elements stable ids and pushes
+  their labels once, then only diffs as the DOM changes:
+  {"type": "labels", "reset": true|false, "add": [{"id", "label"}], "remove": [ids]}
+- Labels are indexed by character trigrams of the label with spaces and
+  punctuation removed, so "log in", "Login" and "log-in" all look alike
+- resolve() ranks labels by trigram overlap (Dice) plus word matches and
+  returns the best element id; nothing on the page is scanned at command time
+- Several pages can be connected; the one that last reported focus wins
+- Malformed items (no id, an id that isn't a string/number, a non-string
+  label) are skipped and counted, the rest of the update still applies
+"""
+
+import re
+import threading
+import time
+from collections import namedtuple
+
+from metrics import NULL_METRICS
+
+MIN_SCORE = 0.45        # below this the target is left to the extension's text search
+MAX_CANDIDATES = 20     # best trigram matches re-ranked with word matches
+MAX_LABEL = 80          # characters kept per label
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+Match = namedtuple("Match", "page id label score")
+
+
+def _items(value):
+    return value if isinstance(value, list) else ()
+
+
+def _valid_id(eid):
+    return isinstance(eid, (str, int, float)) and not isinstance(eid, bool)
+
+
+def _valid_item(item):
+    return (isinstance(item, dict) and _valid_id(item.get("id"))
+            and isinstance(item.get("label") or "", str))
+
+
+def words(text):
+    return _WORD_RE.findall(text.lower())
+
+
+def trigrams(compact):
+    padded = f"^{compact}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _Entry:
+    __slots__ = ("label", "words", "compact", "grams")
+
+    def __init__(self, label):
+        self.label = label[:MAX_LABEL]
+        self.words = words(self.label)
+        self.compact = "".join(self.words)
+        self.grams = trigrams(self.compact)
+
+
+class _Page:
+    def __init__(self):
+        self.entries = {}       # element id -> _Entry
+        self.postings = {}      # trigram -> set of element ids
+
+    def add(self, eid, label):
+        self.remove(eid)
+        entry = _Entry(label)
+        if not entry.compact:
+            return
+        self.entries[eid] = entry
+        for g in entry.grams:
+            self.postings.setdefault(g, set()).add(eid)
+
+    def remove(self, eid):
+        entry = self.entries.pop(eid, None)
+        if entry is None:
+            return
+        for g in entry.grams:
+            ids = self.postings[g]
+            ids.discard(eid)
+            if not ids:
+                del self.postings[g]
+
+
+class PageIndex:
+    def __init__(self, min_score=MIN_SCORE, metrics=NULL_METRICS):
+        self.min_score = min_score
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self._pages = {}
+        self.active = None      # page id that last reported focus (or pushed labels)
+
+        # counters
+        self.updates = 0
+        self.resolved = 0
+        self.unresolved = 0
+        self.rejected = 0       # malformed label items skipped
+
+    # ---------- updates from the pages ----------
+    def on_labels(self, page, msg):
+        with self._lock:
+            if msg.get("reset") or page not in self._pages:
+                self._pages[page] = _Page()
+            p = self._pages[page]
+            for eid in _items(msg.get("remove")):
+                if _valid_id(eid):
+                    p.remove(eid)
+                else:
+                    self.rejected += 1
+            for item in _items(msg.get("add")):
+                if _valid_item(item):
+                    p.add(item["id"], item.get("label") or "")
+                else:
+                    self.rejected += 1
+            if msg.get("focused") or self.active is None:
+                self.active = page
+            self.updates += 1
+
+    def on_focus(self, page, msg=None):
+        with self._lock:
+            if page in self._pages:
+                self.active = page
+
+    def drop(self, page):
+        with self._lock:
+            self._pages.pop(page, None)
+            if self.active == page:
+                self.active = next(iter(self._pages), None)
+
+    # ---------- lookup ----------
+    def resolve(self, target, page=None):
+        """Best Match for a spoken target on `page` (default: the active one), or None."""
+        t0 = time.perf_counter()
+        with self._lock:
+            page = self.active if page is None else page
+            p = self._pages.get(page)
+            match = _rank(p, target, self.min_score)[:1] if p is not None else []
+        self.metrics.observe("voice.resolve", time.perf_counter() - t0)
+        if not match:
+            self.unresolved += 1
+            return None
+        self.resolved += 1
+        eid, label, score = match[0]
+        return Match(page, eid, label, score)
+
+    def candidates(self, target, page=None, limit=5):
+        """Ranked (id, label, score) list, for logging/debugging."""
+        with self._lock:
+            p = self._pages.get(self.active if page is None else page)
+            return _rank(p, target, 0.0)[:limit] if p is not None else []
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pages": {page: len(p.entries) for page, p in self._pages.items()},
+                "active": self.active,
+                "updates": self.updates,
+                "resolved": self.resolved,
+                "unresolved": self.unresolved,
+                "rejected": self.rejected,
+            }
+
+
+def _rank(p, target, min_score):
+    q_words = words(target)
+    q_compact = "".join(q_words)
+    if not q_compact:
+        return []
+    q_grams = trigrams(q_compact)
+
+    shared = {}
+    for g in q_grams:
+        for eid in p.postings.get(g, ()):
+            shared[eid] = shared.get(eid, 0) + 1
+    n = len(q_grams)
+    dice = sorted(((2.0 * c / (n + len(p.entries[eid].grams)), eid) for eid, c in shared.items()),
+                  reverse=True)[:MAX_CANDIDATES]
+
+    ranked = []
+    for d, eid in dice:
+        e = p.entries[eid]
+        if e.compact == q_compact:
+            score = 1.0
+        else:
+            hits = sum(1 for w in q_words if any(ew.startswith(w) for ew in e.words))
+            score = 0.7 * d + 0.3 * hits / len(q_words)
+            if q_compact in e.compact:
+                # the whole target inside a longer label ("cart" -> "view cart")
+                score = max(score, 0.5 + 0.4 * len(q_compact) / len(e.compact))
+        if score >= min_score:
+            ranked.append((score, len(e.compact), eid, e.label))
+    ranked.sort(key=lambda r: (-r[0], r[1]))    # equal scores: the shorter label
+    return [(eid, label, round(score, 3)) for score, _, eid, label in ranked]
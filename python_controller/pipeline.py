@@ -0,0 +1,424 @@
+# pipeline.py
+"""
+Gesture + voice decision logic
+------------------------------
+- GesturePipeline: one call per camera frame with the hand's landmarks
+  (cursor filtering; scroll zones, fist click and toggle click are
+  gestures registered with a GestureStateMachine, see gestures.py). With
+  two hands each gets its own pipeline limited to some of its roles
+  ("cursor", "click", "scroll"), see session.py
+- VoicePipeline: one call per recognized utterance (grammar -> action)
+
+Nothing here touches the camera, MediaPipe, the display or the network:
+actuation and the WebSocket outbox are passed in, so the same code runs
+live, in replay (replay.py) and headless in CI.
+"""
+
+import time
+
+import numpy as np
+
+from gestures import Gesture, GestureStateMachine, HandFeatures, landmark_array
+from metrics import NULL_METRICS
+from scroll import ScrollEngine
+
+# ---------------- CONFIG ----------------
+SMOOTHING_WINDOW = 5        # moving average window
+
+# Scrolling control (normalized coords)
+SCROLL_ZONE_TOP = 0.36
+SCROLL_ZONE_BOTTOM = 0.64
+SCROLL_MIN_SPEED = 200.0    # units/s (120 = one wheel notch) just inside a zone
+SCROLL_MAX_SPEED = 6000.0   # ...and at the edge of the frame
+SCROLL_ZONE_HYSTERESIS = 0.03   # leave a zone only this far past its edge
+
+# Click settings
+CLICK_COOLDOWN = 0.8        # seconds between consecutive clicks
+FIST_ENTER = 0.7            # finger curl (0 open .. 1 closed) that starts a fist
+FIST_EXIT = 0.45            # ...and the curl it has to open past before the next one
+GESTURE_MIN_HOLD = 0.05     # seconds a pose must be held before it fires
+TOGGLE_CLICK = False        # also click on index-only <-> middle-only finger toggles
+TOGGLE_WINDOW = 0.6         # max seconds between the two poses of a toggle
+SINGLE_FINGER_ENTER = 0.6
+SINGLE_FINGER_EXIT = 0.4
+GESTURE_ROLES = ("cursor", "click", "scroll")   # what a single tracked hand does
+
+# Cursor filter ("one_euro" | "kalman" | "moving_average")
+CURSOR_FILTER = "one_euro"
+CURSOR_HISTORY = 32         # ring buffer size (raw samples kept for the filters)
+CURSOR_RESET_AFTER = 0.5    # seconds without a hand before the filter forgets its state
+ONE_EURO_MIN_CUTOFF = 1.0   # Hz; lower = steadier when the hand is still
+ONE_EURO_BETA = 0.007       # speed coefficient; higher = less lag when moving fast
+ONE_EURO_D_CUTOFF = 1.0     # Hz; cutoff for the velocity estimate
+KALMAN_ACCEL_NOISE = 3000.0     # px/s^2, how quickly the hand may change speed
+KALMAN_MEASUREMENT_NOISE = 6.0  # px, landmark jitter std-dev
+PREDICT_LATENCY = True      # extrapolate ahead by the measured capture->actuation latency
+PREDICT_MAX_MS = 50         # never look further ahead than this
+PREDICT_MIN_SPEED = 60.0    # px/s; below this the hand is "still" and we don't extrapolate
+
+VOICE_SCROLL_AMOUNT = 300  # distance a voice "scroll up/down" coasts
+
+# ---------------- Cursor filters ----------------
+class PositionRing:
+    """Fixed-size ring of (t, x, y) samples backed by one NumPy array."""
+
+    def __init__(self, size):
+        self.buf = np.zeros((size, 3), dtype=np.float64)
+        self.size = size
+        self.head = 0
+        self.count = 0
+
+    def push(self, t, x, y):
+        self.buf[self.head] = (t, x, y)
+        self.head = (self.head + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def last(self, n):
+        """Return the newest n samples, oldest first."""
+        n = min(n, self.count)
+        idx = (self.head - n + np.arange(n)) % self.size
+        return self.buf[idx]
+
+    def clear(self):
+        self.head = 0
+        self.count = 0
+
+
+class MovingAverageFilter:
+    """The original behaviour: plain mean over the last SMOOTHING_WINDOW samples."""
+
+    def __init__(self, window=SMOOTHING_WINDOW):
+        self.window = window
+        self.vel = np.zeros(2)
+
+    def reset(self):
+        self.vel[:] = 0.0
+
+    def update(self, ring, t, pos):
+        samples = ring.last(self.window)
+        span = samples[-1, 0] - samples[0, 0]
+        if span > 0:
+            self.vel = (samples[-1, 1:] - samples[0, 1:]) / span
+        return samples[:, 1:].mean(axis=0)
+
+
+class OneEuroFilter:
+    """
+    1-Euro filter (Casiez et al. 2012): a low-pass whose cutoff rises with speed,
+    so jitter is removed at rest and lag stays small during fast moves.
+    """
+
+    def __init__(self, min_cutoff=ONE_EURO_MIN_CUTOFF, beta=ONE_EURO_BETA, d_cutoff=ONE_EURO_D_CUTOFF):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self.pos = None
+        self.vel = np.zeros(2)
+        self.t = 0.0
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2.0 * np.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def update(self, ring, t, pos):
+        if self.pos is None:
+            self.pos = pos.copy()
+            self.t = t
+            return self.pos
+        dt = max(t - self.t, 1e-3)
+        self.t = t
+        raw_vel = (pos - self.pos) / dt
+        self.vel += self._alpha(self.d_cutoff, dt) * (raw_vel - self.vel)
+        cutoff = self.min_cutoff + self.beta * float(np.hypot(*self.vel))
+        self.pos += self._alpha(cutoff, dt) * (pos - self.pos)
+        return self.pos
+
+
+class KalmanFilter:
+    """
+    Constant-velocity Kalman filter. Both axes share the same noise model and
+    are measured together, so they share one 2x2 covariance.
+    """
+
+    def __init__(self, accel_noise=KALMAN_ACCEL_NOISE, measurement_noise=KALMAN_MEASUREMENT_NOISE):
+        self.q = accel_noise ** 2
+        self.r = measurement_noise ** 2
+        self.reset()
+
+    def reset(self):
+        self.pos = None
+        self.vel = np.zeros(2)
+        self.P = np.diag([self.r, 1e6])
+        self.t = 0.0
+
+    def update(self, ring, t, pos):
+        if self.pos is None:
+            self.pos = pos.copy()
+            self.t = t
+            return self.pos
+        dt = max(t - self.t, 1e-3)
+        self.t = t
+        # predict
+        self.pos += self.vel * dt
+        F = np.array([[1.0, dt], [0.0, 1.0]])
+        Q = self.q * np.array([[dt ** 4 / 4, dt ** 3 / 2], [dt ** 3 / 2, dt ** 2]])
+        self.P = F @ self.P @ F.T + Q
+        # correct (H = [1, 0])
+        s = self.P[0, 0] + self.r
+        k = self.P[:, 0] / s
+        innovation = pos - self.pos
+        self.pos += k[0] * innovation
+        self.vel += k[1] * innovation
+        self.P -= np.outer(k, self.P[0])
+        return self.pos
+
+
+CURSOR_FILTERS = {
+    "moving_average": MovingAverageFilter,
+    "one_euro": OneEuroFilter,
+    "kalman": KalmanFilter,
+}
+
+
+class CursorFilterEngine:
+    """
+    Feeds raw fingertip positions through the selected filter and, optionally,
+    extrapolates along the filter's velocity estimate to cancel the measured
+    capture -> actuation latency.
+    """
+
+    def __init__(self, kind=CURSOR_FILTER, screen_size=(1920, 1080), history=CURSOR_HISTORY):
+        if kind not in CURSOR_FILTERS:
+            raise ValueError(f"unknown cursor filter {kind!r}; choose from {sorted(CURSOR_FILTERS)}")
+        self.kind = kind
+        self.screen_w, self.screen_h = screen_size
+        self.filter = CURSOR_FILTERS[kind]()
+        self.ring = PositionRing(history)
+        self.latency = 0.0          # EMA of capture -> actuation, seconds
+        self.last_t = None
+
+    def reset(self):
+        self.ring.clear()
+        self.filter.reset()
+        self.last_t = None
+
+    def observe_latency(self, seconds):
+        self.latency += 0.1 * (seconds - self.latency)
+
+    def update(self, t, x, y):
+        """t is the frame capture time; returns the filtered (and predicted) screen position."""
+        if self.last_t is not None and t - self.last_t > CURSOR_RESET_AFTER:
+            self.reset()
+        self.last_t = t
+        self.ring.push(t, x, y)
+        out = self.filter.update(self.ring, t, np.array((x, y), dtype=np.float64))
+        if PREDICT_LATENCY and self.latency > 0:
+            vel = self.filter.vel
+            if np.hypot(*vel) >= PREDICT_MIN_SPEED:
+                out = out + vel * min(self.latency, PREDICT_MAX_MS / 1000.0)
+        return (int(min(max(out[0], 0), self.screen_w - 1)),
+                int(min(max(out[1], 0), self.screen_h - 1)))
+
+
+# ---------------- Gesture pipeline ----------------
+class GesturePipeline:
+    """
+    Per-frame gesture decisions for one hand. `send` takes a WebSocket payload
+    dict (WsOutbox.send or a stub); `clock` is injectable so replays are
+    deterministic.
+    """
+
+    def __init__(self, actuator, send, screen_size=None, cursor_filter=CURSOR_FILTER, clock=time.time,
+                 metrics=NULL_METRICS, scroll=None, roles=GESTURE_ROLES):
+        self.actuator = actuator
+        self.send = send
+        self.clock = clock
+        self.metrics = metrics
+        self.roles = frozenset(roles)   # subset of GESTURE_ROLES this hand acts on
+        self.screen_w, self.screen_h = screen_size or actuator.size()
+        self.cursor = CursorFilterEngine(cursor_filter, screen_size=(self.screen_w, self.screen_h))
+        # shared with VoicePipeline; replay passes one it ticks from the simulated clock
+        self.scroll = scroll or ScrollEngine(actuator, send, clock=clock, metrics=metrics).start()
+        self.last_click_time = float("-inf")
+        self.last_single = None         # (finger, time) of the last single-finger pose
+        self._ny = 0.0
+        self._capture_ts = None         # of the frame being processed
+
+        self.gestures = GestureStateMachine()
+        if "scroll" in self.roles:
+            self._register_scroll()
+        if "click" in self.roles:
+            self._register_click()
+
+    def _register_scroll(self):
+        self.gestures.register(Gesture("scroll_up", lambda f: SCROLL_ZONE_TOP - self._ny,
+                                       enter=0.0, exit=-SCROLL_ZONE_HYSTERESIS,
+                                       min_hold=GESTURE_MIN_HOLD, repeat=0.0,
+                                       on_start=self._scroll, on_repeat=self._scroll,
+                                       on_end=self._scroll_end))
+        self.gestures.register(Gesture("scroll_down", lambda f: self._ny - SCROLL_ZONE_BOTTOM,
+                                       enter=0.0, exit=-SCROLL_ZONE_HYSTERESIS,
+                                       min_hold=GESTURE_MIN_HOLD, repeat=0.0,
+                                       on_start=self._scroll, on_repeat=self._scroll,
+                                       on_end=self._scroll_end))
+
+    def _register_click(self):
+        self.gestures.register(Gesture("fist", HandFeatures.fist,
+                                       enter=FIST_ENTER, exit=FIST_EXIT, min_hold=GESTURE_MIN_HOLD,
+                                       on_start=self._fist_click))
+        if TOGGLE_CLICK:
+            for finger in ("index", "middle"):
+                self.gestures.register(Gesture(f"{finger}_only",
+                                               lambda f, finger=finger: f.single_finger(finger),
+                                               enter=SINGLE_FINGER_ENTER, exit=SINGLE_FINGER_EXIT,
+                                               min_hold=GESTURE_MIN_HOLD, on_start=self._toggle))
+
+    # ---------- gesture actions ----------
+    def _scroll(self, gesture, features, now):
+        # zone depth -> target velocity; the scroll engine does the actual scrolling
+        if gesture.name == "scroll_up":
+            depth = (SCROLL_ZONE_TOP - self._ny) / SCROLL_ZONE_TOP
+            direction, sign = "Up", 1
+        else:
+            depth = (self._ny - SCROLL_ZONE_BOTTOM) / (1.0 - SCROLL_ZONE_BOTTOM)
+            direction, sign = "Down", -1
+        speed = SCROLL_MIN_SPEED + max(0.0, depth) * (SCROLL_MAX_SPEED - SCROLL_MIN_SPEED)
+        self.scroll.hold(sign * speed)
+        return f"Scroll {direction} ({speed:.0f}/s)"
+
+    def _scroll_end(self, gesture, features, now):
+        self.scroll.release()
+        return None
+
+    def _click(self, now, label):
+        if now - self.last_click_time <= CLICK_COOLDOWN:
+            return None
+        with self.metrics.timer("actuate.click"):
+            self.actuator.click()
+        self.last_click_time = now
+        self.send({"command": "click", "capture_ts": self._capture_ts})
+        return label
+
+    def _fist_click(self, gesture, features, now):
+        return self._click(now, "Click")
+
+    def _toggle(self, gesture, features, now):
+        finger = gesture.name[:-len("_only")]
+        last, self.last_single = self.last_single, (finger, now)
+        if last is not None and last[0] != finger and now - last[1] <= TOGGLE_WINDOW:
+            self.last_single = None
+            return self._click(now, f"Click ({last[0]}->{finger})")
+        return None
+
+    def process(self, hand_landmarks, capture_ts):
+        """
+        Handle one frame. hand_landmarks (a MediaPipe landmark list or a (21, 3)
+        array) is None when no hand was detected.
+        Returns (cursor_xy or None, gesture_text).
+        """
+        if hand_landmarks is None:
+            self.gestures.reset(self.clock())
+            return None, "No hand"
+
+        metrics = self.metrics
+        self._capture_ts = capture_ts
+        with metrics.timer("features"):
+            features = HandFeatures(landmark_array(hand_landmarks))
+
+        # index fingertip normalized coords
+        tip_x, tip_y = features.index_tip[:2].tolist()
+        nx = max(0.0, min(1.0, tip_x))
+        ny = self._ny = max(0.0, min(1.0, tip_y))
+
+        # map to screen coords
+        sx = int(nx * self.screen_w)
+        sy = int(ny * self.screen_h)
+
+        cursor = None
+        if "cursor" in self.roles:
+            # filtering + latency-compensating prediction
+            with metrics.timer("cursor.filter"):
+                cursor = avg_x, avg_y = self.cursor.update(capture_ts, sx, sy)
+
+            # move system cursor
+            with metrics.timer("actuate.move"):
+                self.actuator.move(avg_x, avg_y)
+            now = self.clock()
+            self.cursor.observe_latency(now - capture_ts)
+            metrics.observe("capture_to_move", now - capture_ts)
+
+            # send hover coords to extension
+            with metrics.timer("ws.enqueue"):
+                self.send({"x": avg_x, "y": avg_y, "capture_ts": capture_ts})
+        else:
+            now = self.clock()
+
+        # scroll zones, fist click, toggle click
+        with metrics.timer("gestures"):
+            label = self.gestures.update(features, now)
+        return cursor, label or "Hand"
+
+# ---------------- Voice pipeline ----------------
+class VoicePipeline:
+    """Turns recognized text into actions through the grammar."""
+
+    def __init__(self, grammar, actuator, send, scroll_amount=VOICE_SCROLL_AMOUNT, scroll=None,
+                 pages=None):
+        self.grammar = grammar
+        self.actuator = actuator
+        self.send = send
+        self.scroll_amount = scroll_amount
+        self.scroll = scroll or ScrollEngine(actuator, send).start()
+        # page_index.PageIndex: resolves "click <target>" to an element id
+        self.pages = pages
+        # intents that act locally; anything else in the grammar is just forwarded
+        self.handlers = {
+            "click": self._click,
+            "scroll": self._scroll,
+            "scroll_speed": self._scroll_speed,
+            "scroll_stop": self._scroll_stop,
+        }
+
+    def _click(self, intent):
+        target = intent.slots.get("target")
+        if target is None:
+            self.actuator.click()
+            print("[voice] Click executed")
+        elif self.pages is not None:
+            match = self.pages.resolve(target)
+            if match is not None:
+                print(f'[voice] Target "{target}" -> {match.id} "{match.label}" ({match.score:.2f})')
+                self.send({"command": intent.command, "target_id": match.id, "page": match.page})
+                return
+        self.send({"command": intent.command})
+
+    def _scroll(self, intent):
+        # the scroll engine reports the resulting velocity to the extension
+        amount = self.scroll_amount if intent.slots["direction"] == "up" else -self.scroll_amount
+        self.scroll.impulse(amount)
+
+    def _scroll_speed(self, intent):
+        speed = self.scroll.faster() if intent.slots["change"] == "faster" else self.scroll.slower()
+        print(f"[voice] Scroll speed x{speed:.2f}")
+
+    def _scroll_stop(self, intent):
+        self.scroll.stop_scrolling()
+
+    def handle_text(self, text):
+        """Act on one recognized utterance; returns the Intent (or None)."""
+        intent = self.grammar.match(text)
+        if intent is None:
+            # fallback: let the extension try the raw text
+            self.send({"command": text.strip().lower()})
+            return None
+        print("[voice] Intent:", intent)
+        handler = self.handlers.get(intent.name)
+        if handler is not None:
+            handler(intent)
+        else:
+            self.send({"command": intent.command})
+        return intent
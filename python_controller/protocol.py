@@ -0,0 +1,108 @@
+# protocol.py
+"""
+Controller <-> relay wire protocol
+----------------------------------
+- Commands are always JSON text: {"command": "...", "seq", "ts"}
+- seq is shared by hover and commands; ts is the capture time (camera
+  frame, or when the message was produced) on the sender's monotonic clock
+  in ms, so receivers can measure capture -> applied latency
+- Hover updates are either JSON text {"x", "y", "seq", "ts"} or, when the
+  relay accepts it, a fixed 20-byte little-endian binary frame ("bin1"):
+
+      u8  type      (0x01 = hover)
+      u8  version   (1)
+      u16 reserved
+      u32 seq
+      f64 ts        (capture time, sender monotonic clock, ms)
+      i16 x, i16 y  (screen pixels)
+
+- Format and dead-band are negotiated with a hello/welcome exchange right
+  after connecting. A relay that never answers gets plain JSON.
+- Messages from an extra camera station (session.py) carry "station", its
+  name. Its hover is always JSON {"x", "y", "seq", "ts", "station"}, with
+  its own dead-band and latest-wins slot; relays only deliver station
+  messages to clients whose hello lists the station ("stations": [...]).
+"""
+
+import json
+import struct
+import time
+
+PROTOCOL_VERSION = 1
+MSG_HOVER = 0x01
+HOVER_FORMATS = ("bin1", "json")
+HOVER_BIN1 = struct.Struct("<BBHIdhh")
+
+
+def make_hello(role, hover_formats, deadband_px):
+    return json.dumps({
+        "type": "hello",
+        "role": role,
+        "version": PROTOCOL_VERSION,
+        "hover_formats": list(hover_formats),
+        "deadband_px": deadband_px,
+    })
+
+
+def parse_welcome(message):
+    """Return the welcome dict, or None for anything else (e.g. our own echoed hello)."""
+    if not isinstance(message, str):
+        return None
+    try:
+        msg = json.loads(message)
+    except ValueError:
+        return None
+    if isinstance(msg, dict) and msg.get("type") == "welcome":
+        return msg
+    return None
+
+
+def monotonic_ms(wall_ts=None):
+    """Monotonic clock in ms; `wall_ts` (a time.time() capture stamp) is converted onto it."""
+    now = time.monotonic()
+    if wall_ts is not None:
+        now -= time.time() - wall_ts
+    return now * 1000.0
+
+
+def pack_hover(seq, ts_ms, x, y):
+    return HOVER_BIN1.pack(MSG_HOVER, PROTOCOL_VERSION, 0, seq & 0xFFFFFFFF, ts_ms, x, y)
+
+
+def unpack_hover(buf):
+    kind, version, _, seq, ts_ms, x, y = HOVER_BIN1.unpack(buf)
+    if kind != MSG_HOVER or version != PROTOCOL_VERSION:
+        raise ValueError("not a bin1 hover frame")
+    return seq, ts_ms, x, y
+
+
+def hover_json(seq, ts_ms, x, y, station=None):
+    if station is not None:
+        return json.dumps({"x": x, "y": y, "seq": seq, "ts": ts_ms, "station": station})
+    return json.dumps({"x": x, "y": y, "seq": seq, "ts": ts_ms})
+
+
+class DeadBand:
+    """
+    Suppresses hover updates that moved no more than `px` pixels on either axis
+    since the last one let through. A refresh still goes out every `keepalive`
+    seconds so clients that join late learn where the cursor is.
+    """
+
+    def __init__(self, px=0, keepalive=1.0):
+        self.px = px
+        self.keepalive = keepalive
+        self.last = None
+        self.last_ts = 0.0
+
+    def allow(self, x, y, now):
+        if (self.last is not None and self.px > 0
+                and abs(x - self.last[0]) <= self.px and abs(y - self.last[1]) <= self.px
+                and now - self.last_ts < self.keepalive):
+            return False
+        self.last = (x, y)
+        self.last_ts = now
+        return True
+
+    def reset(self):
+        self.last = None
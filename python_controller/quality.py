@@ -0,0 +1,126 @@
+# quality.py
+"""
+Adaptive inference quality
+--------------------------
+- Watches the per-frame hand-tracking cost (preprocess + hands.process,
+  amortized over skipped frames) against a frame budget, e.g. 33 ms at 30 fps
+- Quality comes in tiers, best first: model_complexity, the scale of the
+  image MediaPipe sees, detection/tracking confidence and frame skipping
+- Over budget for a full window -> one tier down. Well under budget for
+  `restore_hold` seconds -> one tier up. After every change the window
+  restarts, and a restore that has to be undone right away doubles the
+  restore hold, so a machine on the edge settles instead of flapping
+- Every decision is printed with the measured cost and the new settings,
+  so the log shows which tier a machine ends up on
+"""
+
+import time
+from collections import deque
+
+from metrics import NULL_METRICS
+
+QUALITY_TIERS = (
+    {"model_complexity": 1, "scale": 1.0, "min_detection_confidence": 0.6, "min_tracking_confidence": 0.6, "skip": 0},
+    {"model_complexity": 0, "scale": 1.0, "min_detection_confidence": 0.6, "min_tracking_confidence": 0.6, "skip": 0},
+    {"model_complexity": 0, "scale": 0.75, "min_detection_confidence": 0.6, "min_tracking_confidence": 0.5, "skip": 0},
+    {"model_complexity": 0, "scale": 0.5, "min_detection_confidence": 0.5, "min_tracking_confidence": 0.5, "skip": 0},
+    {"model_complexity": 0, "scale": 0.5, "min_detection_confidence": 0.5, "min_tracking_confidence": 0.5, "skip": 1},
+    {"model_complexity": 0, "scale": 0.5, "min_detection_confidence": 0.5, "min_tracking_confidence": 0.5, "skip": 2},
+)
+QUALITY_WINDOW = 30             # frames averaged per decision
+QUALITY_RESTORE_RATIO = 0.6     # restore only below this fraction of the budget
+QUALITY_RESTORE_HOLD = 3.0      # s of headroom before stepping back up
+QUALITY_MAX_RESTORE_HOLD = 60.0
+QUALITY_FLAP_WINDOW = 10.0      # s; a restore undone within this doubles the hold
+
+
+class QualityController:
+    def __init__(self, budget=0.033, tiers=QUALITY_TIERS, start_tier=0, window=QUALITY_WINDOW,
+                 restore_ratio=QUALITY_RESTORE_RATIO, restore_hold=QUALITY_RESTORE_HOLD,
+                 on_change=None, clock=time.monotonic, metrics=NULL_METRICS):
+        self.budget = budget
+        self.tiers = tiers
+        self.tier = start_tier
+        self.restore_ratio = restore_ratio
+        self.restore_hold = restore_hold
+        self.on_change = on_change      # fn(settings) applies a new tier
+        self.clock = clock
+        self.metrics = metrics
+
+        self._samples = deque(maxlen=window)
+        self._headroom_since = None
+        self._last_restore = float("-inf")
+        self._frame = 0
+        self.decisions = deque(maxlen=20)
+
+        # counters
+        self.degrades = 0
+        self.restores = 0
+        self.skipped = 0
+
+    @property
+    def settings(self):
+        return self.tiers[self.tier]
+
+    def should_infer(self):
+        """Frame skipping for the current tier; call once per frame that would be inferred."""
+        self._frame += 1
+        skip = self.settings["skip"]
+        if skip and self._frame % (skip + 1):
+            self.skipped += 1
+            self.observe(0.0)
+            return False
+        return True
+
+    def observe(self, frame_s):
+        """Feed one frame's cost (0 for a skipped frame); may change tier."""
+        samples = self._samples
+        samples.append(frame_s)
+        if len(samples) < samples.maxlen:
+            return
+        cost = sum(samples) / len(samples)
+        now = self.clock()
+        if cost > self.budget:
+            self._headroom_since = None
+            if self.tier + 1 < len(self.tiers):
+                if now - self._last_restore < QUALITY_FLAP_WINDOW:
+                    self.restore_hold = min(self.restore_hold * 2, QUALITY_MAX_RESTORE_HOLD)
+                self.degrades += 1
+                self._change(self.tier + 1, cost, now)
+        elif cost < self.budget * self.restore_ratio and self.tier > 0:
+            if self._headroom_since is None:
+                self._headroom_since = now
+            elif now - self._headroom_since >= self.restore_hold:
+                self.restores += 1
+                self._last_restore = now
+                self._change(self.tier - 1, cost, now)
+        else:
+            self._headroom_since = None
+
+    def _change(self, tier, cost, now):
+        old, self.tier = self.tier, tier
+        self._samples.clear()
+        self._headroom_since = None
+        s = self.settings
+        decision = {"t": round(now, 2), "from": old, "to": tier, "cost_ms": round(cost * 1000.0, 1),
+                    "budget_ms": round(self.budget * 1000.0, 1), **s}
+        self.decisions.append(decision)
+        self.metrics.gauge("quality.tier", tier)
+        print(f"[quality] tier {old} -> {tier} ({'over' if tier > old else 'under'} budget: "
+              f"{decision['cost_ms']} ms vs {decision['budget_ms']} ms): "
+              f"model_complexity={s['model_complexity']} scale={s['scale']} "
+              f"confidence={s['min_detection_confidence']}/{s['min_tracking_confidence']} "
+              f"skip={s['skip']}")
+        if self.on_change is not None:
+            self.on_change(s)
+
+    def stats(self):
+        return {
+            "tier": self.tier,
+            "settings": self.settings,
+            "degrades": self.degrades,
+            "restores": self.restores,
+            "skipped": self.skipped,
+            "restore_hold": self.restore_hold,
+            "decisions": list(self.decisions),
+        }
@@ -0,0 +1,465 @@
+# relay.py
+"""
+Embedded relay server
+---------------------
+Optional stand-in for websocket_server/server.js: the controller serves
+ws://localhost:8765 itself and the extensions connect to it directly, which
+takes a process and a network hop out of the hover path.
+
+- Clients subscribe to topics ("hover", "command", "scroll"). A client that
+  never says hello gets every topic as JSON, like with the Node relay
+- hello/welcome negotiate the hover format exactly as the Node relay does
+  (see protocol.py); the hello may also carry "topics", and
+  {"type": "subscribe" | "unsubscribe", "topics": [...]} changes them later.
+  The welcome lists the inbound message types the controller handles
+  ("accepts", e.g. "labels" with a PageIndex); pages only send those. A
+  handler that raises is logged and the message dropped; the client stays
+- Every client has its own sender task: queued commands/scroll updates go
+  out first, then that client's newest hover. Hover is latest-wins per
+  client and the socket write buffer is kept small, so a slow client
+  skips positions instead of building a backlog
+- A payload carrying "page" (a client id, e.g. from page_index.PageIndex)
+  goes to that client only
+- A payload carrying "station" (an extra camera, see session.py) goes only
+  to clients that listed that station in their hello ("stations"); each
+  station has its own dead-band and its own latest-wins hover slot per
+  client, and its hover is always JSON with the station in it
+- The asyncio loop runs on a background thread; send() is thread-safe and
+  never blocks, so LocalRelay is a drop-in for WsOutbox
+
+Acknowledgements (clients that say {"acks": true} in their hello; the
+welcome confirms with "acks": true, and pages only ack when it does):
+- Every message from the controller carries "seq" and "ts", the capture
+  time on the controller's monotonic clock in ms (bin1 hover: its seq/ts)
+- The client answers {"type": "ack", "acks": [[seq, applied_ms], ...]} with
+  its own clock, and {"type": "pong", "t0", "t1"} to our periodic pings; the
+  ping with the lowest round trip gives the clock offset, so capture -> DOM
+  latency is applied_ms - offset - ts
+- Messages not acked within ACK_TIMEOUT count as lost, except hover that
+  was followed by any ack or pong: background tabs don't paint, so they
+  can't ack hover, but their pongs show it arrived (hover_unpainted)
+- A client that hasn't acked or ponged for HOVER_ACK_TIMEOUT (longer than
+  the ping interval) gets no hover until it does again
+
+Needs `pip install websockets`.
+"""
+
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+
+import protocol
+from metrics import NULL_METRICS
+
+TOPICS = ("hover", "command", "scroll")
+
+ACK_TIMEOUT = 2.0           # s; unacknowledged after this = lost
+PING_INTERVAL = 2.0         # s between clock-offset pings
+HOVER_ACK_TIMEOUT = 2.5 * PING_INTERVAL  # s without any ack/pong before hover to a client is paused
+PING_SAMPLES = 8            # offset = the lowest-RTT of this many recent pings
+MAX_OUTSTANDING = 512       # unacknowledged messages tracked per client
+LATENCY_WINDOW = 256        # recent latency samples kept per client and topic
+
+
+def topic_of(payload):
+    if "command" not in payload and "x" in payload and "y" in payload:
+        return "hover"
+    if payload.get("type") == "scroll":
+        return "scroll"
+    return "command"
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class _Client:
+    def __init__(self, cid, ws, max_queue):
+        self.id = cid
+        self.ws = ws
+        self.role = "client"
+        self.topics = set(TOPICS)
+        self.hover_format = "json"
+        self.queue = deque(maxlen=max_queue)    # (text, seq, topic, capture_ms)
+        self.hover = None                       # newest (seq, ts_ms, x, y, None) not yet sent
+        self.stations = set()                   # extra camera stations subscribed to
+        self.station_hover = {}                 # station -> newest hover not yet sent
+        self.wake = asyncio.Event()
+
+        # acknowledgements
+        self.acks = False
+        self.outstanding = OrderedDict()        # seq -> (topic, capture_ms, sent_ms)
+        self.last_ack = 0.0                     # monotonic ms of the last ack/pong
+        self.pings = deque(maxlen=PING_SAMPLES)  # (rtt_ms, offset_ms)
+        self.offset_ms = None                   # client clock - controller clock
+        self.latency = {topic: deque(maxlen=LATENCY_WINDOW) for topic in TOPICS}
+
+        # counters
+        self.sent = 0
+        self.hover_sent = 0
+        self.hover_dropped = 0
+        self.hover_paused = 0
+        self.queue_dropped = 0
+        self.acked = 0
+        self.lost = 0
+        self.hover_unpainted = 0    # delivered (ack/pong came after) but never acked
+
+    def push(self, text, seq=None, topic=None, capture_ms=None):
+        if len(self.queue) == self.queue.maxlen:
+            self.queue_dropped += 1
+        self.queue.append((text, seq, topic, capture_ms))
+        self.wake.set()
+
+    def push_hover(self, hover):
+        station = hover[4]
+        if station is None:
+            if self.hover is not None:
+                self.hover_dropped += 1
+            self.hover = hover
+        else:
+            if station in self.station_hover:
+                self.hover_dropped += 1
+            self.station_hover[station] = hover
+        self.wake.set()
+
+    def wants(self, station):
+        return station is None or station in self.stations
+
+    def hover_live(self, now_ms):
+        return not self.acks or now_ms - self.last_ack < HOVER_ACK_TIMEOUT * 1000.0
+
+    def track(self, seq, topic, capture_ms):
+        if not self.acks or seq is None:
+            return
+        self.outstanding[seq] = (topic, capture_ms, protocol.monotonic_ms())
+        if len(self.outstanding) > MAX_OUTSTANDING:
+            self.outstanding.popitem(last=False)
+            self.lost += 1
+
+    def expire(self, now_ms):
+        """Count messages that were never acknowledged as lost."""
+        limit = now_ms - ACK_TIMEOUT * 1000.0
+        while self.outstanding:
+            seq, (topic, _, sent_ms) = next(iter(self.outstanding.items()))
+            if sent_ms > limit:
+                break
+            del self.outstanding[seq]
+            if topic == "hover" and self.last_ack > sent_ms:
+                self.hover_unpainted += 1
+            else:
+                self.lost += 1
+
+    def stats(self):
+        out = {
+            "role": self.role,
+            "topics": sorted(self.topics),
+            "hover_format": self.hover_format,
+            "sent": self.sent,
+            "hover_sent": self.hover_sent,
+            "hover_dropped": self.hover_dropped,
+            "queue_dropped": self.queue_dropped,
+            "queued": len(self.queue),
+        }
+        if self.acks:
+            out["acked"] = self.acked
+            out["lost"] = self.lost
+            out["hover_unpainted"] = self.hover_unpainted
+            out["outstanding"] = len(self.outstanding)
+            out["hover_paused"] = self.hover_paused
+            out["offset_ms"] = round(self.offset_ms, 2) if self.offset_ms is not None else None
+            out["rtt_ms"] = round(min(p[0] for p in self.pings), 2) if self.pings else None
+            out["latency_ms"] = {
+                topic: {"p50": round(_percentile(v, 0.5), 1), "p95": round(_percentile(v, 0.95), 1),
+                        "n": len(v)}
+                for topic, v in self.latency.items() if v
+            }
+        return out
+
+
+class LocalRelay:
+    def __init__(self, host="localhost", port=8765, hover_formats=protocol.HOVER_FORMATS,
+                 deadband_px=0, deadband_keepalive=1.0, max_queue=256, write_limit=4096,
+                 metrics=NULL_METRICS):
+        self.host = host
+        self.port = port
+        self.hover_formats = tuple(hover_formats)
+        self.deadband_px = deadband_px
+        self.max_queue = max_queue
+        self.write_limit = write_limit     # bytes buffered per socket before send() waits
+        self.metrics = metrics
+        self.deadband_keepalive = deadband_keepalive
+        self.deadband = protocol.DeadBand(deadband_px, deadband_keepalive)
+        self.station_deadband = {}          # station -> DeadBand
+        self.seq = 0                        # shared by hover and commands
+        # inbound message types handled by the controller: type -> fn(client_id, msg)
+        self.handlers = {}
+        self.on_close = []      # fn(client_id) when a client disconnects
+
+        self._lock = threading.Lock()
+        self._loop = None
+        self._stop = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._clients = {}
+        self._ids = itertools.count(1)
+
+        # counters
+        self.hover_published = 0
+        self.hover_suppressed = 0
+        self.commands_published = 0
+        self.connects = 0
+        self.handler_errors = 0     # inbound messages a handler raised on
+
+    # ---------- producer side (any thread) ----------
+    def send(self, payload):
+        """`payload` may carry "capture_ts" (time.time() of the camera frame / utterance)."""
+        loop = self._loop
+        if loop is None:
+            return False
+        topic = topic_of(payload)
+        capture_ms = protocol.monotonic_ms(payload.get("capture_ts"))
+        if topic == "hover":
+            station = payload.get("station")
+            with self._lock:
+                if station is None:
+                    deadband = self.deadband
+                else:
+                    deadband = self.station_deadband.get(station)
+                    if deadband is None:
+                        deadband = self.station_deadband[station] = protocol.DeadBand(
+                            self.deadband_px, self.deadband_keepalive)
+                if not deadband.allow(payload["x"], payload["y"], time.time()):
+                    self.hover_suppressed += 1
+                    return False
+                self.seq += 1
+                hover = (self.seq, capture_ms, int(payload["x"]), int(payload["y"]), station)
+            loop.call_soon_threadsafe(self._publish_hover, hover)
+            return True
+        with self._lock:
+            self.seq += 1
+            seq = self.seq
+        message = {k: v for k, v in payload.items() if k != "capture_ts"}
+        message["seq"] = seq
+        message["ts"] = round(capture_ms, 3)
+        if "page" in message:
+            loop.call_soon_threadsafe(self._send_to, message)
+        else:
+            loop.call_soon_threadsafe(self._publish, topic, json.dumps(message), None, seq, capture_ms,
+                                      message.get("station"))
+        return True
+
+    @property
+    def connected(self):
+        return bool(self._clients)
+
+    # ---------- loop side ----------
+    def _publish_hover(self, hover, exclude=None):
+        self.hover_published += 1
+        now = protocol.monotonic_ms()
+        for c in self._clients.values():
+            if c is exclude or "hover" not in c.topics or not c.wants(hover[4]):
+                continue
+            if c.hover_live(now):
+                c.push_hover(hover)
+            else:
+                c.hover_paused += 1
+
+    def _publish(self, topic, text, exclude=None, seq=None, capture_ms=None, station=None):
+        self.commands_published += 1
+        for c in self._clients.values():
+            if c is not exclude and topic in c.topics and c.wants(station):
+                c.push(text, seq, topic, capture_ms)
+
+    def _send_to(self, message):
+        c = self._clients.get(message["page"])
+        if c is not None:
+            self.commands_published += 1
+            c.push(json.dumps(message), message["seq"], "command", message["ts"])
+        else:
+            # page went away: let whoever is left try it by text
+            message = {k: v for k, v in message.items() if k not in ("page", "target_id")}
+            self._publish(topic_of(message), json.dumps(message), None, message["seq"], message["ts"],
+                          message.get("station"))
+
+    async def _sender(self, c):
+        while True:
+            await c.wake.wait()
+            c.wake.clear()
+            while c.queue:
+                text, seq, topic, capture_ms = c.queue.popleft()
+                await c.ws.send(text)
+                c.track(seq, topic, capture_ms)
+                c.sent += 1
+            if c.hover is not None:
+                (seq, ts_ms, x, y, _), c.hover = c.hover, None
+                t0 = time.perf_counter()
+                if c.hover_format == "bin1":
+                    await c.ws.send(protocol.pack_hover(seq, ts_ms, x, y))
+                else:
+                    await c.ws.send(protocol.hover_json(seq, ts_ms, x, y))
+                self.metrics.observe("relay.send", time.perf_counter() - t0)
+                c.track(seq, "hover", ts_ms)
+                c.sent += 1
+                c.hover_sent += 1
+            while c.station_hover:
+                station = next(iter(c.station_hover))
+                seq, ts_ms, x, y, _ = c.station_hover.pop(station)
+                await c.ws.send(protocol.hover_json(seq, ts_ms, x, y, station))
+                c.track(seq, "hover", ts_ms)
+                c.sent += 1
+                c.hover_sent += 1
+
+    async def _pinger(self, c):
+        while True:
+            await asyncio.sleep(PING_INTERVAL)
+            if c.acks:
+                c.expire(protocol.monotonic_ms())
+                c.push(json.dumps({"type": "ping", "t0": round(protocol.monotonic_ms(), 3)}))
+
+    def _on_pong(self, c, msg):
+        t2 = protocol.monotonic_ms()
+        try:
+            t0, t1 = float(msg["t0"]), float(msg["t1"])
+        except (KeyError, TypeError, ValueError):
+            return
+        c.last_ack = t2
+        c.pings.append((t2 - t0, t1 - (t0 + t2) / 2.0))
+        c.offset_ms = min(c.pings)[1]
+
+    def _on_ack(self, c, msg):
+        c.last_ack = protocol.monotonic_ms()
+        for item in msg.get("acks") or ():
+            try:
+                seq, applied_ms = int(item[0]), float(item[1])
+            except (TypeError, ValueError, IndexError):
+                continue
+            entry = c.outstanding.pop(seq, None)
+            if entry is None:
+                continue    # already counted lost, or never tracked
+            c.acked += 1
+            if c.offset_ms is None:
+                continue
+            topic, capture_ms, _ = entry
+            latency_ms = applied_ms - c.offset_ms - capture_ms
+            c.latency[topic].append(latency_ms)
+            self.metrics.observe(f"e2e.{topic}", latency_ms / 1000.0)
+
+    def _on_message(self, c, message):
+        if isinstance(message, bytes):
+            try:
+                seq, ts_ms, x, y = protocol.unpack_hover(message)
+            except Exception:
+                return
+            self._publish_hover((seq, ts_ms, x, y, None), exclude=c)
+            return
+        try:
+            msg = json.loads(message)
+        except ValueError:
+            return
+        if not isinstance(msg, dict):
+            return
+        kind = msg.get("type")
+        if kind == "ack":
+            self._on_ack(c, msg)
+        elif kind == "pong":
+            self._on_pong(c, msg)
+        elif kind == "hello":
+            offered = msg.get("hover_formats") or []
+            c.role = msg.get("role", "client")
+            c.hover_format = next((f for f in offered if f in self.hover_formats), "json")
+            if msg.get("topics") is not None:
+                c.topics = set(msg["topics"]) & set(TOPICS)
+            c.stations = set(msg.get("stations") or ())
+            if msg.get("acks") and not c.acks:
+                c.acks = True
+                c.last_ack = protocol.monotonic_ms()
+                c.push(json.dumps({"type": "ping", "t0": round(protocol.monotonic_ms(), 3)}))
+            c.queue.appendleft((json.dumps({"type": "welcome", "hover_format": c.hover_format,
+                                            "deadband_px": self.deadband_px,
+                                            "topics": sorted(c.topics), "acks": c.acks,
+                                            "accepts": sorted(self.handlers)}), None, None, None))
+            c.wake.set()
+            print(f"[relay] {c.role} #{c.id} subscribed to {sorted(c.topics)} (hover={c.hover_format}"
+                  f"{', acks' if c.acks else ''})")
+        elif kind in ("subscribe", "unsubscribe"):
+            topics = set(msg.get("topics") or ()) & set(TOPICS)
+            c.topics = c.topics | topics if kind == "subscribe" else c.topics - topics
+        elif kind in self.handlers:
+            try:
+                self.handlers[kind](c.id, msg)
+            except Exception as e:
+                # one bad message must not end the client's connection
+                self.handler_errors += 1
+                print(f"[relay] {kind} from {c.role} #{c.id} failed: {e!r}")
+        else:
+            # same as the Node relay: pass anything else on to the other clients
+            self._publish(topic_of(msg), message, exclude=c, station=msg.get("station"))
+
+    async def _handler(self, ws, *_):
+        c = _Client(next(self._ids), ws, self.max_queue)
+        self._clients[c.id] = c
+        self.connects += 1
+        tasks = [asyncio.ensure_future(self._sender(c)), asyncio.ensure_future(self._pinger(c))]
+        try:
+            async for message in ws:
+                self._on_message(c, message)
+        except Exception:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            del self._clients[c.id]
+            for fn in self.on_close:
+                fn(c.id)
+            print(f"[relay] {c.role} #{c.id} disconnected")
+
+    async def _main(self):
+        import websockets
+        self._loop = asyncio.get_running_loop()
+        self._stop = self._loop.create_future()
+        async with websockets.serve(self._handler, self.host, self.port,
+                                    write_limit=self.write_limit, compression=None):
+            self._ready.set()
+            print(f"[relay] Serving ws://{self.host}:{self.port}")
+            await self._stop
+
+    def _run(self):
+        try:
+            asyncio.run(self._main())
+        except Exception as e:
+            print("[relay] ERROR:", e)
+        finally:
+            self._loop = None
+            self._ready.set()
+
+    # ---------- lifecycle ----------
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="relay", daemon=True)
+        self._thread.start()
+        self._ready.wait(5.0)
+
+    def stats(self):
+        clients = list(self._clients.values())
+        return {
+            "connected": self.connected,
+            "clients": {c.id: c.stats() for c in clients},
+            "hover_published": self.hover_published,
+            "hover_suppressed": self.hover_suppressed,
+            "commands_published": self.commands_published,
+            "acked": sum(c.acked for c in clients),
+            "lost": sum(c.lost for c in clients),
+            "connects": self.connects,
+            "handler_errors": self.handler_errors,
+        }
+
+    def stop(self):
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(lambda: self._stop.done() or self._stop.set_result(None))
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
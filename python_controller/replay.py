@@ -0,0 +1,306 @@
+# replay.py
+"""
+Headless record & replay
+------------------------
+Recording (set RECORD_PATH in main.py) writes a JSONL session:
+
+  {"kind": "header", "version": 2, "screen": [w, h], "started": ts}
+  {"kind": "hand",  "t": capture_ts, "lat": s, "station": null | "desk",
+   "hands": [{"hand": "Right" | "Left" | "any", "role": "cursor", "lm": [[x, y, z] * 21] | null}],
+   "frame": "frames/000001.jpg"}
+  {"kind": "voice", "t": ts, "text": "click login", "audio": "audio/0001.wav"}
+
+Every hand session of every camera is recorded with its role, and the
+landmarks it was given; "station" is null for the main camera. Version 1
+sessions (one "lm" per event) load as a single "any" hand doing "all".
+
+Replay drives GesturePipeline / VoicePipeline from a session with a simulated
+clock, a RecordingActuator and a recording WebSocket stub, so it needs no
+camera, microphone, display or relay:
+
+  python replay.py session.jsonl                       # run + timing summary
+  python replay.py session.jsonl --out actions.jsonl   # write the action log
+  python replay.py session.jsonl --expect golden.jsonl # exit 1 if actions differ
+  python replay.py session.jsonl --from-frames         # re-run MediaPipe on saved frames
+
+Each (station, hand) gets its own GesturePipeline with the recorded role;
+extra stations get a null actuator, their own scroll engine and
+"station"-tagged payloads, as in main.py.
+
+replay_data/ holds a short synthetic session and its golden action log, the
+regression check to run after touching the pipelines:
+
+  python replay.py replay_data/session.jsonl --expect replay_data/golden.jsonl
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+from actuation import NullActuator, RecordingActuator
+from gestures import landmark_array
+from grammar import Grammar
+from pipeline import CURSOR_FILTER, GesturePipeline, VoicePipeline
+from scroll import ScrollEngine
+from session import ANY_HAND, HAND_ROLES
+
+SESSION_VERSION = 2
+DEFAULT_GRAMMAR_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "grammar.json")
+
+# ---------------- Recorder ----------------
+class SessionRecorder:
+    def __init__(self, path, screen_size, save_frames=False):
+        self.path = path
+        self.base_dir = os.path.dirname(os.path.abspath(path))
+        self.save_frames = save_frames
+        self._lock = threading.Lock()
+        self._frames = 0
+        self._clips = 0
+        self._f = open(path, "w", encoding="utf-8")
+        self._write({"kind": "header", "version": SESSION_VERSION,
+                     "screen": list(screen_size), "started": time.time()})
+        print("[record] Recording session to", path)
+
+    def _write(self, event):
+        with self._lock:
+            self._f.write(json.dumps(event) + "\n")
+
+    def hand(self, capture_ts, hands, frame=None, station=None):
+        """hands: (handedness, role, landmarks or None) per hand session of this camera."""
+        event = {"kind": "hand", "t": capture_ts, "lat": time.time() - capture_ts, "station": station,
+                 "hands": [{"hand": handedness, "role": role,
+                            "lm": landmark_array(lm).round(5).tolist() if lm is not None else None}
+                           for handedness, role, lm in hands]}
+        if self.save_frames and frame is not None:
+            import cv2
+            with self._lock:
+                self._frames += 1
+                n = self._frames
+            rel = os.path.join("frames", f"{n:06d}.jpg")
+            os.makedirs(os.path.join(self.base_dir, "frames"), exist_ok=True)
+            cv2.imwrite(os.path.join(self.base_dir, rel), frame)
+            event["frame"] = rel
+        self._write(event)
+
+    def voice(self, ts, text, audio=None):
+        event = {"kind": "voice", "t": ts, "text": text}
+        if audio is not None and hasattr(audio, "get_wav_data"):
+            with self._lock:
+                self._clips += 1
+                clip = self._clips
+            rel = os.path.join("audio", f"{clip:04d}.wav")
+            os.makedirs(os.path.join(self.base_dir, "audio"), exist_ok=True)
+            with open(os.path.join(self.base_dir, rel), "wb") as f:
+                f.write(audio.get_wav_data())
+            event["audio"] = rel
+        self._write(event)
+
+    def close(self):
+        with self._lock:
+            self._f.close()
+
+
+# ---------------- Replay ----------------
+class SimClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class RecordingSender:
+    """WebSocket stub: keeps every payload with the simulated time it was sent."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.sent = []
+
+    def __call__(self, payload):
+        self.sent.append((self.clock(), payload))
+        return True
+
+
+def load_session(path):
+    with open(path, "r", encoding="utf-8") as f:
+        events = [json.loads(line) for line in f if line.strip()]
+    if not events or events[0].get("kind") != "header":
+        raise ValueError(f"{path}: missing session header")
+    version = events[0].get("version")
+    if version not in (1, SESSION_VERSION):
+        raise ValueError(f"{path}: unsupported session version {version}")
+    if version == 1:
+        for ev in events[1:]:
+            if ev["kind"] == "hand":
+                ev["station"] = None
+                ev["hands"] = [{"hand": ANY_HAND, "role": "all", "lm": ev.pop("lm")}]
+    return events[0], events[1:]
+
+
+def route_hands(results, wanted):
+    """Landmarks per wanted handedness from a MediaPipe result, the way CameraSession routes them."""
+    free = []
+    if results.multi_hand_landmarks:
+        labels = [h.classification[0].label for h in (results.multi_handedness or ())]
+        for i, lm in enumerate(results.multi_hand_landmarks):
+            free.append((labels[i] if i < len(labels) else "Unknown",
+                         [[p.x, p.y, p.z] for p in lm.landmark]))
+    routed = {}
+    for handedness in sorted(wanted, key=lambda h: h == ANY_HAND):
+        routed[handedness] = None
+        for i, (label, lm) in enumerate(free):
+            if handedness in (ANY_HAND, label):
+                routed[handedness] = lm
+                del free[i]
+                break
+    return routed
+
+
+def landmarks_from_frames(events, base_dir):
+    """Re-run MediaPipe over recorded frames, replacing the stored landmarks."""
+    import cv2
+    import mediapipe as mp
+
+    max_hands = max((len(ev["hands"]) for ev in events if ev["kind"] == "hand"), default=1)
+    hands = mp.solutions.hands.Hands(max_num_hands=max_hands)
+    try:
+        for ev in events:
+            if ev["kind"] != "hand" or not ev.get("frame"):
+                continue
+            frame = cv2.imread(os.path.join(base_dir, ev["frame"]))
+            results = hands.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            routed = route_hands(results, [h["hand"] for h in ev["hands"]])
+            for h in ev["hands"]:
+                h["lm"] = routed[h["hand"]]
+    finally:
+        hands.close()
+
+
+def replay(header, events, cursor_filter=CURSOR_FILTER, grammar_path=DEFAULT_GRAMMAR_PATH):
+    """
+    Run a session through the pipelines. Returns (actions, frame_times) where
+    actions is the merged, time-ordered actuation + WebSocket log.
+    """
+    clock = SimClock()
+    actuator = RecordingActuator(header["screen"], clock=clock)
+    sender = RecordingSender(clock)
+    scroll = ScrollEngine(actuator, sender, clock=clock)     # ticked below, no thread
+    scrolls = [scroll]
+    voice = VoicePipeline(Grammar.load(grammar_path), actuator, sender, scroll=scroll)
+    stations = {None: (actuator, sender, scroll)}
+    pipelines = {}      # (station, handedness) -> GesturePipeline
+
+    def pipeline_for(station, hand):
+        key = (station, hand["hand"])
+        if key not in pipelines:
+            if station not in stations:
+                station_actuator = NullActuator(header["screen"])
+                station_send = (lambda payload, station=station:
+                                sender({**payload, "station": station}))
+                station_scroll = ScrollEngine(station_actuator, station_send, clock=clock)
+                scrolls.append(station_scroll)
+                stations[station] = (station_actuator, station_send, station_scroll)
+            act, send, sc = stations[station]
+            pipelines[key] = GesturePipeline(act, send, cursor_filter=cursor_filter, clock=clock,
+                                             scroll=sc, roles=HAND_ROLES[hand["role"]])
+        return pipelines[key]
+
+    def run_scrolls(now):
+        for sc in scrolls:
+            sc.run_until(now)
+
+    frame_times = []
+    for ev in events:
+        if ev["kind"] == "hand":
+            # the pipeline sees "now" as capture time + the latency measured live
+            clock.now = ev["t"] + ev.get("lat", 0.0)
+            run_scrolls(clock.now)
+            hands = [(pipeline_for(ev.get("station"), hand),
+                      np.array(hand["lm"], dtype=np.float64) if hand["lm"] is not None else None)
+                     for hand in ev["hands"]]
+            t0 = time.perf_counter()
+            for gestures, lm in hands:
+                gestures.process(lm, ev["t"])
+            frame_times.append(time.perf_counter() - t0)
+        elif ev["kind"] == "voice":
+            clock.now = ev["t"]
+            run_scrolls(clock.now)
+            voice.handle_text(ev["text"])
+    # let any scroll still in flight coast out
+    for _ in range(100):
+        if all(sc.idle() for sc in scrolls):
+            break
+        clock.now += 0.1
+        run_scrolls(clock.now)
+
+    actions = [{"t": round(e[0], 6), "kind": e[1], "args": list(e[2:])} for e in actuator.events]
+    actions += [{"t": round(t, 6), "kind": "ws", "args": [payload]} for t, payload in sender.sent]
+    actions.sort(key=lambda a: a["t"])     # stable: actuation before its ws message
+    return actions, frame_times
+
+
+def diff_actions(actual, expected):
+    """Return a description of the first difference, or None."""
+    for i, (a, e) in enumerate(zip(actual, expected)):
+        if a != e:
+            return f"action #{i}: got {a}, expected {e}"
+    if len(actual) != len(expected):
+        return f"got {len(actual)} actions, expected {len(expected)}"
+    return None
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Replay a recorded VoiceKind session headlessly.")
+    ap.add_argument("session")
+    ap.add_argument("--filter", default=CURSOR_FILTER, help="cursor filter to replay with")
+    ap.add_argument("--grammar", default=DEFAULT_GRAMMAR_PATH)
+    ap.add_argument("--from-frames", action="store_true", help="recompute landmarks from saved frames")
+    ap.add_argument("--out", help="write the action log (JSONL) here")
+    ap.add_argument("--expect", help="golden action log; exit 1 on any difference")
+    ap.add_argument("--repeat", type=int, default=1, help="repeat the run N times for timing")
+    args = ap.parse_args(argv)
+
+    header, events = load_session(args.session)
+    if args.from_frames:
+        landmarks_from_frames(events, os.path.dirname(os.path.abspath(args.session)))
+
+    frame_times = []
+    for _ in range(max(1, args.repeat)):
+        actions, times = replay(header, events, args.filter, args.grammar)
+        frame_times.extend(times)
+
+    if frame_times:
+        mean = sum(frame_times) / len(frame_times)
+        print(f"[replay] {len(frame_times)} frames, {len(actions)} actions | per frame: "
+              f"mean={mean * 1e6:.1f}us p95={_percentile(frame_times, 0.95) * 1e6:.1f}us "
+              f"max={max(frame_times) * 1e6:.1f}us")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            for a in actions:
+                f.write(json.dumps(a) + "\n")
+        print("[replay] Action log written to", args.out)
+
+    if args.expect:
+        with open(args.expect, "r", encoding="utf-8") as f:
+            expected = [json.loads(line) for line in f if line.strip()]
+        problem = diff_actions(actions, expected)
+        if problem:
+            print("[replay] REGRESSION:", problem)
+            return 1
+        print(f"[replay] OK: {len(actions)} actions match {args.expect}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
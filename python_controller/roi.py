@@ -0,0 +1,88 @@
+# roi.py
+"""
+Region-of-interest tracking for hand inference
+----------------------------------------------
+While a hand is tracked, only a padded square around last frame's landmarks
+is mirrored, colour-converted, downscaled and sent to MediaPipe. Landmarks
+come back in crop coordinates and are mapped to full-frame normalized
+(mirrored) coordinates, so everything downstream sees exactly what a
+full-frame pass would give. Losing the hand drops back to a full frame.
+"""
+
+import cv2
+
+
+class HandRoiTracker:
+    def __init__(self, padding=0.5, min_frac=0.25, input_size=256):
+        self.padding = padding          # added on each side, as a fraction of the hand's box
+        self.min_frac = min_frac        # smallest ROI side, as a fraction of frame height
+        self.input_size = input_size    # crops are downscaled so their side is at most this
+        self.box = None                 # (x0, y0, x1, y1) in mirrored full-frame pixels
+        self.crops = 0
+        self.full_frames = 0
+
+    @property
+    def tracking(self):
+        return self.box is not None
+
+    def reset(self):
+        self.box = None
+
+    def prepare(self, frame):
+        """
+        Turn a raw (unmirrored BGR) camera frame into the RGB image to run
+        MediaPipe on. Returns (rgb, box); box is None for a full-frame pass.
+        """
+        if self.box is None:
+            self.full_frames += 1
+            return cv2.cvtColor(cv2.flip(frame, 1), cv2.COLOR_BGR2RGB), None
+
+        h, w = frame.shape[:2]
+        x0, y0, x1, y1 = self.box
+        # the box is in mirrored coordinates; crop the same pixels from the raw frame
+        crop = frame[y0:y1, w - x1:w - x0]
+        crop = cv2.flip(crop, 1)
+        side = max(x1 - x0, y1 - y0)
+        if side > self.input_size:
+            scale = self.input_size / side
+            crop = cv2.resize(crop, (max(1, int((x1 - x0) * scale)), max(1, int((y1 - y0) * scale))),
+                              interpolation=cv2.INTER_AREA)
+        self.crops += 1
+        return cv2.cvtColor(crop, cv2.COLOR_BGR2RGB), self.box
+
+    def to_full_frame(self, hand_landmarks, box, frame_shape):
+        """Map crop-normalized landmarks (in place) back to full-frame normalized coords."""
+        if box is None:
+            return hand_landmarks
+        h, w = frame_shape[:2]
+        x0, y0, x1, y1 = box
+        sx, sy = (x1 - x0) / w, (y1 - y0) / h
+        ox, oy = x0 / w, y0 / h
+        for p in hand_landmarks.landmark:
+            p.x = ox + p.x * sx
+            p.y = oy + p.y * sy
+            p.z = p.z * sx      # MediaPipe z uses roughly the same scale as x
+        return hand_landmarks
+
+    def update(self, hand_landmarks, frame_shape):
+        """Set next frame's ROI from full-frame landmarks (or drop it if the hand is gone)."""
+        if hand_landmarks is None:
+            self.box = None
+            return
+        h, w = frame_shape[:2]
+        xs = [p.x for p in hand_landmarks.landmark]
+        ys = [p.y for p in hand_landmarks.landmark]
+        bx0, bx1 = min(xs) * w, max(xs) * w
+        by0, by1 = min(ys) * h, max(ys) * h
+        side = max(bx1 - bx0, by1 - by0)
+        side = max(side * (1.0 + 2.0 * self.padding), self.min_frac * h)
+        if side >= min(w, h):
+            self.box = None     # the hand fills the frame; a crop would not save anything
+            return
+        cx, cy = (bx0 + bx1) / 2.0, (by0 + by1) / 2.0
+        x0 = int(min(max(cx - side / 2.0, 0), w - side))
+        y0 = int(min(max(cy - side / 2.0, 0), h - side))
+        self.box = (x0, y0, x0 + int(side), y0 + int(side))
+
+    def stats(self):
+        return {"tracking": self.tracking, "crops": self.crops, "full_frames": self.full_frames}
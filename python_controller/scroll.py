@@ -0,0 +1,203 @@
+# scroll.py
+"""
+Inertial scroll engine
+----------------------
+- Ticks at a fixed rate on its own thread, independent of the camera FPS
+- Gestures hold a target velocity (scroll-zone depth -> speed); voice adds
+  an impulse that coasts out; "scroll faster/slower" scales both
+- Velocity follows the target with bounded acceleration and decays with
+  inertia once released; fractional motion accumulates, so the wheel gets
+  a steady stream of small deltas instead of coarse steps
+- The extension is told the current velocity ({"type": "scroll", ...})
+  when it changes noticeably, not once per step
+
+Replay drives run_until() from the simulated clock instead of starting the
+thread, so the same fixed-step simulation runs there.
+"""
+
+import math
+import threading
+import time
+
+from metrics import NULL_METRICS
+
+SCROLL_TICK_HZ = 120            # fixed simulation / emission rate
+SCROLL_ACCEL = 15000.0          # units/s^2 while chasing a held target
+SCROLL_INERTIA = 0.25           # s; velocity time constant once released
+SCROLL_STOP_SPEED = 30.0        # units/s; below this a coasting scroll stops
+SCROLL_SPEED_STEP = 1.5         # factor per "scroll faster" / "scroll slower"
+SCROLL_SPEED_RANGE = (0.25, 4.0)
+SCROLL_REPORT_INTERVAL = 0.1    # s between velocity reports to the extension
+SCROLL_REPORT_CHANGE = 0.15     # ...and only when it changed by this fraction
+
+
+class ScrollEngine:
+    def __init__(self, actuator, send, rate=SCROLL_TICK_HZ, accel=SCROLL_ACCEL,
+                 inertia=SCROLL_INERTIA, min_delta=None, clock=time.time, metrics=NULL_METRICS):
+        self.actuator = actuator
+        self.send = send
+        self.dt = 1.0 / rate
+        self.accel = accel
+        self.decay = math.exp(-self.dt / inertia)
+        self.inertia = inertia
+        # smallest delta the backend can express (120 for notch-only wheels)
+        self.min_delta = min_delta or getattr(actuator, "scroll_resolution", 1)
+        self.clock = clock
+        self.metrics = metrics
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._running = False
+        self._t = None                  # simulated time of the last tick
+        self.target = 0.0               # held velocity (units/s, + = up), before speed scaling
+        self.holding = False
+        self.velocity = 0.0
+        self.speed = 1.0
+        self.source = None
+        self._pending = 0.0             # accumulated, not yet emitted units
+        self._reported = 0.0
+        self._last_report = float("-inf")
+
+        # counters
+        self.emitted = 0
+        self.deltas = 0
+        self.reports = 0
+
+    # ---------- controls ----------
+    def hold(self, velocity, source="gesture"):
+        """Scroll at `velocity` units/s (+ = up) until release()."""
+        with self._lock:
+            self._restart_clock()
+            self.target = velocity
+            self.holding = True
+            self.source = source
+        self._wake.set()
+
+    def release(self):
+        """Let go: the current velocity coasts out."""
+        with self._lock:
+            self.holding = False
+            self.target = 0.0
+
+    def impulse(self, distance, source="voice"):
+        """Add a flick that coasts roughly `distance` units (+ = up)."""
+        with self._lock:
+            self._restart_clock()
+            self.velocity += distance * self.speed / self.inertia
+            self.source = source
+        self._wake.set()
+
+    def faster(self):
+        return self._scale(SCROLL_SPEED_STEP)
+
+    def slower(self):
+        return self._scale(1.0 / SCROLL_SPEED_STEP)
+
+    def _scale(self, factor):
+        lo, hi = SCROLL_SPEED_RANGE
+        with self._lock:
+            self.speed = max(lo, min(hi, self.speed * factor))
+            if not self.holding:
+                self.velocity *= factor
+            return self.speed
+
+    def stop_scrolling(self):
+        with self._lock:
+            self.holding = False
+            self.target = self.velocity = self._pending = 0.0
+
+    # ---------- simulation ----------
+    def _restart_clock(self):
+        if self.idle():
+            self._t = None      # don't replay the idle period as ticks
+
+    def idle(self):
+        return not self.holding and self.velocity == 0.0 and self._reported == 0.0
+
+    def run_until(self, now):
+        """Advance the fixed-step simulation up to `now`."""
+        with self._lock:
+            if self._t is None or self.idle():
+                self._t = now
+                return
+            while self._t + self.dt <= now:
+                self._t += self.dt
+                self._tick(self._t)
+
+    def _tick(self, now):
+        v = self.velocity
+        if self.holding:
+            target = self.target * self.speed
+            step = self.accel * self.dt
+            v = min(v + step, target) if v < target else max(v - step, target)
+        else:
+            v *= self.decay
+            if abs(v) < SCROLL_STOP_SPEED:
+                v = 0.0
+                self._pending = 0.0
+        self.velocity = v
+
+        self._pending += v * self.dt
+        if abs(self._pending) >= self.min_delta:
+            delta = int(self._pending / self.min_delta) * self.min_delta
+            self._pending -= delta
+            self.actuator.scroll(delta)
+            self.emitted += abs(delta)
+            self.deltas += 1
+        self._report(now)
+
+    def _report(self, now):
+        v, last = self.velocity, self._reported
+        if v == last:
+            return
+        stopped = v == 0.0 or last == 0.0
+        changed = abs(v - last) > SCROLL_REPORT_CHANGE * max(abs(last), SCROLL_STOP_SPEED)
+        if stopped or (changed and now - self._last_report >= SCROLL_REPORT_INTERVAL):
+            self._reported = v
+            self._last_report = now
+            self.reports += 1
+            self.send({"type": "scroll", "velocity": round(v), "speed": round(self.speed, 2),
+                       "source": self.source})
+
+    # ---------- thread ----------
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="scroll", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        next_tick = time.perf_counter()
+        while self._running:
+            if self.idle():
+                self._wake.wait()
+                self._wake.clear()
+                next_tick = time.perf_counter()
+                continue
+            t0 = time.perf_counter()
+            self.run_until(self.clock())
+            self.metrics.observe("scroll.tick", time.perf_counter() - t0)
+            next_tick += self.dt
+            wait = next_tick - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            else:
+                next_tick = time.perf_counter()
+
+    def stats(self):
+        return {
+            "velocity": round(self.velocity, 1),
+            "speed": self.speed,
+            "holding": self.holding,
+            "emitted": self.emitted,
+            "deltas": self.deltas,
+            "reports": self.reports,
+        }
+
+    def close(self):
+        self._running = False
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
@@ -0,0 +1,189 @@
+# session.py
+"""
+Controller engine: camera sessions and per-hand state
+-----------------------------------------------------
+- HandSession: one hand, picked by MediaPipe handedness ("Left"/"Right",
+  or "any"), with its own GesturePipeline limited to a role:
+  "all" (cursor, click, scroll), "cursor" (cursor + click) or "scroll"
+- CameraSession: one camera source (LocalHandSource or an InferenceWorker)
+  and its hand sessions. The landmark pass is shared: one hands.process per
+  frame finds every hand, and each hand session only sees its own
+- Engine: schedules camera sessions. The first one runs on the calling
+  thread, every other one on its own thread; their inference runs in one
+  worker process each, pinned to its own core (config "cpu"), so stations
+  add throughput instead of queueing behind one GIL
+"""
+
+import threading
+
+from metrics import NULL_METRICS
+from pipeline import CURSOR_FILTER, GESTURE_ROLES, GesturePipeline
+from scroll import ScrollEngine
+
+HAND_ROLES = {
+    "all": GESTURE_ROLES,
+    "cursor": ("cursor", "click"),
+    "scroll": ("scroll",),
+}
+ANY_HAND = "any"        # handedness that takes whichever hand is left over
+
+
+class HandSession:
+    """Gesture state for one hand."""
+
+    def __init__(self, handedness, role, pipeline):
+        self.handedness = handedness
+        self.role = role
+        self.pipeline = pipeline
+
+        # counters
+        self.frames = 0     # frames this hand was seen in
+
+    def step(self, hand, capture_ts):
+        if hand is not None:
+            self.frames += 1
+        return self.pipeline.process(hand, capture_ts)
+
+    def stats(self):
+        return {"role": self.role, "frames": self.frames}
+
+
+class CameraSession:
+    """
+    One camera and the hands it tracks. `hand_roles` maps handedness to a
+    role, e.g. {"any": "all"} for one hand doing everything or
+    {"Right": "cursor", "Left": "scroll"} for two. Only the primary session
+    ends metrics frames; the others count under their name. The recorder
+    gets every hand of every session, tagged with the station (None for
+    the primary). Without a `scroll` engine the session starts one for its
+    hands and stops it on close().
+    """
+
+    def __init__(self, name, source, actuator, send, screen_size, hand_roles, scroll=None,
+                 cursor_filter=CURSOR_FILTER, metrics=NULL_METRICS, recorder=None, primary=True):
+        self.name = name
+        self.source = source
+        self.metrics = metrics
+        self.recorder = recorder
+        self.primary = primary
+        self._own_scroll = scroll is None
+        if self._own_scroll:
+            scroll = ScrollEngine(actuator, send, metrics=metrics).start()
+        self.scroll = scroll
+        # named hands pick first, "any" takes what's left
+        order = sorted(hand_roles.items(), key=lambda kv: kv[0] == ANY_HAND)
+        self.hands = [HandSession(handedness, role,
+                                  GesturePipeline(actuator, send, screen_size, cursor_filter,
+                                                  metrics=metrics, scroll=scroll,
+                                                  roles=HAND_ROLES[role]))
+                      for handedness, role in order]
+        self._timer = "pipeline" if primary else f"pipeline.{name}"
+
+        # counters
+        self.frames = 0
+        self.skipped = 0    # frames skipped for the quality budget
+
+    def route(self, hands):
+        """[(HandSession, landmarks or None)] for one frame's (handedness, landmarks) pairs."""
+        free = list(hands)
+        routed = []
+        for session in self.hands:
+            hand = None
+            for i, (label, landmarks) in enumerate(free):
+                if session.handedness in (ANY_HAND, label):
+                    hand = landmarks
+                    del free[i]
+                    break
+            routed.append((session, hand))
+        return routed
+
+    def step(self):
+        """Read and handle one frame. Returns the cursor position it moved to, or None."""
+        hf = self.source.read()
+        if hf is None:
+            return None
+        self.frames += 1
+        cursor = None
+        if hf.inferred or hf.hand is None:  # frames skipped for the quality budget repeat the last hands
+            routed = self.route(hf.hands)
+            if self.recorder is not None:
+                saved = None
+                if self.recorder.save_frames and hf.frame is not None:
+                    import cv2
+                    saved = cv2.flip(hf.frame, 1)
+                self.recorder.hand(hf.capture_ts, [(s.handedness, s.role, hand) for s, hand in routed],
+                                   saved, station=None if self.primary else self.name)
+            with self.metrics.timer(self._timer):
+                for session, hand in routed:
+                    moved, _ = session.step(hand, hf.capture_ts)
+                    cursor = cursor or moved
+        else:
+            self.skipped += 1
+        if self.primary:
+            self.metrics.end_frame(hand=hf.hand is not None, inferred=hf.inferred, state=hf.state)
+        return cursor
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "hands": {s.handedness: s.stats() for s in self.hands},
+            **self.source.stats(),
+        }
+
+    def close(self):
+        if self._own_scroll:
+            self.scroll.close()
+        return self.source.close()
+
+
+class Engine:
+    """Runs camera sessions until stop(); see the module docstring."""
+
+    def __init__(self, metrics=NULL_METRICS):
+        self.metrics = metrics
+        self.sessions = []
+        self.running = False
+        self._threads = []
+
+    def add(self, session):
+        self.sessions.append(session)
+        self.metrics.add_source("hands" if session.primary else f"hands.{session.name}", session.stats)
+        return session
+
+    def _loop(self, session):
+        while self.running:
+            session.step()
+
+    def run(self, on_frame=None):
+        """
+        Block until stop(). on_frame(cursor) is called after every frame of
+        the first session; returning True stops the engine.
+        """
+        if not self.sessions:
+            return
+        self.running = True
+        first, rest = self.sessions[0], self.sessions[1:]
+        for session in rest:
+            t = threading.Thread(target=self._loop, args=(session,), daemon=True,
+                                 name=f"session-{session.name}")
+            t.start()
+            self._threads.append(t)
+        while self.running:
+            cursor = first.step()
+            if on_frame is not None and on_frame(cursor):
+                break
+        self.stop()
+
+    def stop(self):
+        self.running = False
+        for t in self._threads:
+            t.join(timeout=2.0)
+        self._threads = []
+
+    def close(self):
+        """Stop and close every session; returns {name: source stats}."""
+        self.stop()
+        closed = {s.name: s.close() for s in self.sessions}
+        self.sessions = []
+        return closed
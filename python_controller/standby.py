@@ -0,0 +1,116 @@
+# standby.py
+"""
+Idle power states
+-----------------
+- ACTIVE: full capture mode, MediaPipe on every frame
+- STANDBY: entered after `idle_after` seconds without a hand. The grabber
+  drops to a low resolution / frame rate and inference is skipped unless a
+  cheap frame-difference motion detector fires (or a periodic probe is due)
+- Motion wakes the controller on that same frame and restores full capture
+"""
+
+import time
+
+import cv2
+
+ACTIVE = "active"
+STANDBY = "standby"
+
+
+class MotionDetector:
+    """Frame differencing on a tiny grayscale thumbnail."""
+
+    def __init__(self, thumb_size=(64, 48), pixel_threshold=12, min_fraction=0.01):
+        self.thumb_size = thumb_size
+        self.pixel_threshold = pixel_threshold
+        self.min_fraction = min_fraction
+        self.prev = None
+
+    def reset(self):
+        self.prev = None
+
+    def detect(self, frame):
+        thumb = cv2.cvtColor(cv2.resize(frame, self.thumb_size, interpolation=cv2.INTER_AREA),
+                             cv2.COLOR_BGR2GRAY)
+        prev, self.prev = self.prev, thumb
+        if prev is None:
+            return False
+        changed = (cv2.absdiff(thumb, prev) > self.pixel_threshold).mean()
+        return changed >= self.min_fraction
+
+
+class StandbyController:
+    def __init__(self, grabber, idle_after=10.0, standby_mode=(320, 240, 5), probe_interval=2.0,
+                 motion=None, on_change=None, clock=time.time):
+        self.grabber = grabber
+        self.idle_after = idle_after
+        self.standby_mode = standby_mode
+        self.active_mode = (grabber.width, grabber.height, grabber.fps)
+        self.probe_interval = probe_interval
+        self.motion = motion or MotionDetector()
+        self.on_change = on_change      # called with the new state (e.g. to reset ROI tracking)
+        self.clock = clock
+
+        now = clock()
+        self.state = ACTIVE
+        self.state_since = now
+        self.last_hand = now
+        self.last_probe = now
+        self.time_in = {ACTIVE: 0.0, STANDBY: 0.0}
+        self.transitions = 0
+        self.wakeups_by_motion = 0
+        self.skipped_frames = 0
+
+    def _enter(self, state, now):
+        self.time_in[self.state] += now - self.state_since
+        self.state = state
+        self.state_since = now
+        self.transitions += 1
+        if state == STANDBY:
+            w, h, fps = self.standby_mode
+        else:
+            w, h, fps = self.active_mode
+        self.grabber.set_mode(w, h, fps)
+        self.motion.reset()
+        print(f"[power] -> {state} ({w}x{h} @ {fps}fps)")
+        if self.on_change is not None:
+            self.on_change(state)
+
+    def should_infer(self, frame, now=None):
+        """Decide whether this frame goes to MediaPipe. Wakes up on motion."""
+        if self.state == ACTIVE:
+            return True
+        now = self.clock() if now is None else now
+        if self.motion.detect(frame):
+            self.wakeups_by_motion += 1
+            self.last_hand = now    # give the hand idle_after seconds to show up
+            self._enter(ACTIVE, now)
+            return True
+        if now - self.last_probe >= self.probe_interval:
+            self.last_probe = now
+            return True
+        self.skipped_frames += 1
+        return False
+
+    def observe(self, hand_present, now=None):
+        """Feed the detection result of a frame that was (or wasn't) inferred."""
+        now = self.clock() if now is None else now
+        if hand_present:
+            self.last_hand = now
+            if self.state == STANDBY:
+                self._enter(ACTIVE, now)
+        elif self.state == ACTIVE and now - self.last_hand >= self.idle_after:
+            self.last_probe = now
+            self._enter(STANDBY, now)
+
+    def stats(self):
+        now = self.clock()
+        time_in = dict(self.time_in)
+        time_in[self.state] += now - self.state_since
+        return {
+            "state": self.state,
+            "time_in_s": {k: round(v, 1) for k, v in time_in.items()},
+            "transitions": self.transitions,
+            "wakeups_by_motion": self.wakeups_by_motion,
+            "skipped_frames": self.skipped_frames,
+        }
@@ -0,0 +1,196 @@
+# stt_pool.py
+"""
+Speech-to-text worker pool
+--------------------------
+- The microphone listener only enqueues captured audio; a few worker
+  threads run the (blocking, network-bound) recognizer
+- The queue is bounded: when it is full the oldest waiting utterance is
+  dropped, since it is the least likely to still be wanted
+- Results are applied strictly in capture order; anything older than
+  `max_age` when it is dequeued or due to be applied is dropped instead
+- A recognition still running `head_timeout` after it started, while newer
+  results wait behind it, is given up on so those can go out while fresh;
+  its result is discarded if it turns up later
+- Every utterance reports its queue wait and recognition time
+"""
+
+import threading
+import time
+from collections import deque
+
+from metrics import NULL_METRICS
+
+
+class Utterance:
+    __slots__ = ("seq", "audio", "captured", "started", "finished", "text", "error")
+
+    def __init__(self, seq, audio, captured):
+        self.seq = seq
+        self.audio = audio
+        self.captured = captured
+        self.started = None
+        self.finished = None
+        self.text = None
+        self.error = None
+
+    def timings(self):
+        return {
+            "seq": self.seq,
+            "queue_wait_ms": round((self.started - self.captured) * 1000.0, 1) if self.started else None,
+            "recognize_ms": (round((self.finished - self.started) * 1000.0, 1)
+                             if self.finished and self.started else None),
+        }
+
+
+class RecognizerPool:
+    """
+    recognize(audio) -> text runs on the workers; on_result(text, audio, timings)
+    and on_error(exc, timings) run in capture order, one at a time.
+    """
+
+    def __init__(self, recognize, on_result, on_error=None, workers=2, max_queue=4, max_age=3.0,
+                 head_timeout=1.5, clock=time.time, metrics=NULL_METRICS):
+        self.recognize = recognize
+        self.on_result = on_result
+        self.on_error = on_error
+        self.max_queue = max_queue
+        self.max_age = max_age
+        self.head_timeout = head_timeout    # s a stuck head may hold back finished results
+        self.clock = clock
+        self.metrics = metrics
+
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._running = True
+        self._seq = 0
+        self._next = 1                  # next seq to apply
+        self._done = {}                 # seq -> finished Utterance (None = dropped)
+        self._in_flight = {}            # seq -> Utterance being recognized
+        self._apply_lock = threading.Lock()
+        self.recent = deque(maxlen=20)  # timings of the last applied/dropped utterances
+
+        # counters
+        self.submitted = 0
+        self.applied = 0
+        self.dropped_full = 0
+        self.dropped_stale = 0
+        self.dropped_late = 0           # finished after being given up on
+        self.errors = 0
+
+        self._threads = [threading.Thread(target=self._work, name=f"stt-{i}", daemon=True)
+                         for i in range(workers)]
+        for t in self._threads:
+            t.start()
+
+    # ---------- producer ----------
+    def submit(self, audio, captured=None):
+        """Called from the listener thread; never blocks."""
+        captured = self.clock() if captured is None else captured
+        with self._cond:
+            self._seq += 1
+            self.submitted += 1
+            if len(self._queue) >= self.max_queue:
+                old = self._queue.popleft()
+                self.dropped_full += 1
+                self._done[old.seq] = None
+            self._queue.append(Utterance(self._seq, audio, captured))
+            self._cond.notify()
+        self._apply_ready()
+
+    # ---------- workers ----------
+    def _work(self):
+        while True:
+            with self._cond:
+                while self._running and not self._queue:
+                    self._cond.wait(0.1)
+                    if self._done:
+                        break   # results wait behind an unfinished head; re-check its age
+                if not self._running:
+                    return
+                utt = self._queue.popleft() if self._queue else None
+                if utt is not None:
+                    utt.started = self.clock()
+                    if utt.started - utt.captured > self.max_age:
+                        self.dropped_stale += 1
+                        self._done[utt.seq] = None
+                        utt = None
+                    else:
+                        self._in_flight[utt.seq] = utt
+            if utt is None:
+                self._apply_ready()
+                continue
+
+            try:
+                utt.text = self.recognize(utt.audio)
+            except Exception as e:
+                utt.error = e
+            utt.finished = self.clock()
+            info = utt.timings()
+            self.metrics.observe("voice.queue_wait", info["queue_wait_ms"] / 1000.0)
+            self.metrics.observe("voice.recognize", info["recognize_ms"] / 1000.0)
+            with self._cond:
+                self._in_flight.pop(utt.seq, None)
+                if utt.seq >= self._next:
+                    self._done[utt.seq] = utt
+                else:
+                    self.dropped_late += 1     # already given up on as a stuck head
+            self._apply_ready()
+
+    # ---------- in-order delivery ----------
+    def _next_ready(self):
+        """Pop the next utterance to apply (or drop), None if we must wait."""
+        with self._cond:
+            while True:
+                if self._next in self._done:
+                    utt = self._done.pop(self._next)
+                    self._next += 1
+                    if utt is None:
+                        continue
+                    return utt
+                head = self._in_flight.get(self._next)
+                if head is not None and self._done and self.clock() - head.started > self.head_timeout:
+                    # stuck head (e.g. slow network): give up on it so newer speech can go
+                    self._done[self._next] = None
+                    self.dropped_stale += 1
+                    continue
+                return None
+
+    def _apply_ready(self):
+        with self._apply_lock:
+            while True:
+                utt = self._next_ready()
+                if utt is None:
+                    return
+                info = utt.timings()
+                info["age_ms"] = round((self.clock() - utt.captured) * 1000.0, 1)
+                if self.clock() - utt.captured > self.max_age:
+                    self.dropped_stale += 1
+                    info["dropped"] = "stale"
+                    self.recent.append(info)
+                    continue
+                self.recent.append(info)
+                if utt.error is not None:
+                    self.errors += 1
+                    if self.on_error is not None:
+                        self.on_error(utt.error, info)
+                    continue
+                self.applied += 1
+                self.on_result(utt.text, utt.audio, info)
+
+    def stats(self):
+        return {
+            "submitted": self.submitted,
+            "applied": self.applied,
+            "dropped_full": self.dropped_full,
+            "dropped_stale": self.dropped_stale,
+            "dropped_late": self.dropped_late,
+            "errors": self.errors,
+            "queued": len(self._queue),
+            "in_flight": len(self._in_flight),
+            "recent": list(self.recent),
+        }
+
+    def close(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
@@ -0,0 +1,141 @@
+# test_outbox.py
+"""
+WsOutbox: command overflow, reconnect and in-order flush
+--------------------------------------------------------
+Runs against a throwaway relay on localhost (needs `pip install websockets`):
+
+  python -m unittest test_outbox
+"""
+
+import asyncio
+import json
+import threading
+import time
+import unittest
+
+from outbox import WsOutbox
+
+PORT = 8871
+
+
+class FakeRelay:
+    """Answers the hello, records every text frame, and can drop its clients."""
+
+    def __init__(self, port=PORT):
+        self.port = port
+        self.received = []
+        self._clients = set()
+        self._loop = None
+        self._stop = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._main()), daemon=True)
+
+    async def _handler(self, ws, *_):
+        self._clients.add(ws)
+        try:
+            async for message in ws:
+                msg = json.loads(message) if isinstance(message, str) else None
+                if msg is not None and msg.get("type") == "hello":
+                    await ws.send(json.dumps({"type": "welcome", "hover_format": "json", "deadband_px": 0}))
+                elif msg is not None:
+                    self.received.append(msg)
+        except Exception:
+            pass
+        finally:
+            self._clients.discard(ws)
+
+    async def _main(self):
+        import websockets
+        self._loop = asyncio.get_running_loop()
+        self._stop = self._loop.create_future()
+        async with websockets.serve(self._handler, "localhost", self.port):
+            self._ready.set()
+            await self._stop
+
+    def start(self):
+        self._thread.start()
+        self._ready.wait(5.0)
+        return self
+
+    def drop_clients(self):
+        async def close_all():
+            for ws in list(self._clients):
+                await ws.close()
+        asyncio.run_coroutine_threadsafe(close_all(), self._loop).result(5.0)
+
+    def stop(self):
+        self._loop.call_soon_threadsafe(lambda: self._stop.done() or self._stop.set_result(None))
+        self._thread.join(5.0)
+
+    def commands(self):
+        return [m["command"] for m in list(self.received) if "command" in m]
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+
+
+class CommandOverflowTest(unittest.TestCase):
+    def test_full_queue_rejects_and_counts(self):
+        outbox = WsOutbox(f"ws://localhost:{PORT}", max_commands=3)
+        results = [outbox.send({"command": f"c{i}"}) for i in range(5)]
+        self.assertEqual(results, [True, True, True, False, False])
+        self.assertEqual(outbox.command_overflow, 2)
+        self.assertEqual(outbox.stats()["queue_depth"], 3)
+
+    def test_hover_does_not_use_the_command_queue(self):
+        outbox = WsOutbox(f"ws://localhost:{PORT}", max_commands=1)
+        outbox.send({"command": "c0"})
+        self.assertTrue(outbox.send({"x": 1, "y": 1}))
+        self.assertTrue(outbox.send({"x": 50, "y": 50}))
+        self.assertEqual(outbox.command_overflow, 0)
+        self.assertEqual(outbox.hover_coalesced, 1)
+
+
+class ReconnectFlushTest(unittest.TestCase):
+    def setUp(self):
+        self.relay = None
+        self.outbox = WsOutbox(f"ws://localhost:{PORT}", retry_interval=0.1, connect_timeout=1,
+                               hello_timeout=0.5)
+
+    def tearDown(self):
+        self.outbox.stop()
+        if self.relay is not None:
+            self.relay.stop()
+
+    def test_commands_queued_while_down_are_flushed_in_order(self):
+        self.outbox.start()
+        for i in range(10):
+            self.outbox.send({"command": f"c{i}"})
+        time.sleep(0.3)     # a few failed connects
+        self.assertFalse(self.outbox.connected)
+
+        self.relay = FakeRelay().start()
+        self.assertTrue(wait_for(lambda: len(self.relay.commands()) == 10))
+        self.assertEqual(self.relay.commands(), [f"c{i}" for i in range(10)])
+        seqs = [m["seq"] for m in self.relay.received]
+        self.assertEqual(seqs, sorted(seqs))
+
+    def test_reconnects_after_the_relay_drops_us(self):
+        self.relay = FakeRelay().start()
+        self.outbox.start()
+        self.outbox.send({"command": "before"})
+        self.assertTrue(wait_for(lambda: self.relay.commands() == ["before"]))
+
+        self.relay.drop_clients()
+        for i in range(5):
+            self.outbox.send({"command": f"after{i}"})
+        self.assertTrue(wait_for(lambda: len(self.relay.commands()) >= 6))
+        # nothing lost, nothing out of order (a command whose send failed is resent)
+        self.assertEqual(self.relay.commands(), ["before"] + [f"after{i}" for i in range(5)])
+        self.assertGreaterEqual(self.outbox.connects, 2)
+        self.assertEqual(self.outbox.stats()["queue_depth"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
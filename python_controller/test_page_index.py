@@ -0,0 +1,38 @@
+# test_page_index.py
+"""
+PageIndex: label updates and malformed items
+--------------------------------------------
+  python -m unittest test_page_index
+"""
+
+import unittest
+
+from page_index import PageIndex
+
+
+class LabelsTest(unittest.TestCase):
+    def test_malformed_items_are_skipped(self):
+        index = PageIndex()
+        index.on_labels(1, {"type": "labels", "reset": True, "add": [
+            {"id": "a", "label": "Log in"},
+            {"label": "no id"},
+            {"id": ["not", "hashable"], "label": "Sign up"},
+            {"id": "b", "label": 42},
+            "junk",
+            {"id": "c", "label": "Search"},
+        ]})
+        self.assertEqual(index.stats()["pages"], {1: 2})
+        self.assertEqual(index.stats()["rejected"], 4)
+        self.assertEqual(index.resolve("login").id, "a")
+
+    def test_bad_remove_ids_and_lists_are_ignored(self):
+        index = PageIndex()
+        index.on_labels(1, {"reset": True, "add": [{"id": "a", "label": "Log in"}]})
+        index.on_labels(1, {"remove": [{"id": "a"}, "missing"], "add": {"id": "x"}})
+        self.assertEqual(index.stats()["pages"], {1: 1})
+        self.assertEqual(index.stats()["rejected"], 1)
+        self.assertEqual(index.stats()["updates"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
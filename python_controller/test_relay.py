@@ -0,0 +1,191 @@
+# test_relay.py
+"""
+LocalRelay: acknowledgements, expiry and the ping/pong clock offset
+-------------------------------------------------------------------
+Bookkeeping is checked on _Client / LocalRelay directly; the last test runs
+a page with a skewed clock against a real relay on localhost (needs
+`pip install websockets`):
+
+  python -m unittest test_relay
+"""
+
+import asyncio
+import json
+import time
+import unittest
+from unittest import mock
+
+import protocol
+import relay
+from relay import LocalRelay, _Client
+
+PORT = 8872
+OFFSET_MS = 5000.0      # the fake page's clock runs this far ahead of ours
+
+
+def make_client():
+    c = _Client(1, None, max_queue=16)
+    c.acks = True
+    return c
+
+
+class AckTest(unittest.TestCase):
+    def setUp(self):
+        self.relay = LocalRelay(port=PORT)
+        self.c = make_client()
+
+    def test_ack_counts_and_measures_latency(self):
+        now = protocol.monotonic_ms()
+        self.c.track(1, "command", now - 30.0)
+        self.c.track(2, "hover", now - 20.0)
+        self.c.offset_ms = OFFSET_MS
+        self.relay._on_ack(self.c, {"type": "ack", "acks": [[1, now + OFFSET_MS], [2, now + OFFSET_MS]]})
+        self.assertEqual(self.c.acked, 2)
+        self.assertEqual(len(self.c.outstanding), 0)
+        self.assertAlmostEqual(self.c.latency["command"][0], 30.0, places=3)
+        self.assertAlmostEqual(self.c.latency["hover"][0], 20.0, places=3)
+
+    def test_unknown_duplicate_and_malformed_acks_are_ignored(self):
+        self.c.track(1, "command", protocol.monotonic_ms())
+        self.relay._on_ack(self.c, {"type": "ack", "acks": [[1, 0.0], [1, 0.0], [99, 0.0], ["x"], None]})
+        self.assertEqual(self.c.acked, 1)
+
+    def test_no_latency_before_the_clock_offset_is_known(self):
+        self.c.track(1, "command", protocol.monotonic_ms())
+        self.relay._on_ack(self.c, {"type": "ack", "acks": [[1, 0.0]]})
+        self.assertEqual(self.c.acked, 1)
+        self.assertEqual(len(self.c.latency["command"]), 0)
+
+    def test_untracked_without_acks(self):
+        self.c.acks = False
+        self.c.track(1, "command", protocol.monotonic_ms())
+        self.assertEqual(len(self.c.outstanding), 0)
+
+
+class ExpiryTest(unittest.TestCase):
+    def setUp(self):
+        self.c = make_client()
+
+    def test_unacked_messages_are_lost_after_the_timeout(self):
+        self.c.track(1, "command", 0.0)
+        self.c.track(2, "hover", 0.0)
+        sent_ms = self.c.outstanding[1][2]
+        self.c.expire(sent_ms + relay.ACK_TIMEOUT * 1000.0 - 1.0)
+        self.assertEqual((self.c.lost, len(self.c.outstanding)), (0, 2))
+        self.c.expire(sent_ms + relay.ACK_TIMEOUT * 1000.0 + 1.0)
+        self.assertEqual((self.c.lost, len(self.c.outstanding)), (2, 0))
+
+    def test_hover_followed_by_a_pong_is_unpainted_not_lost(self):
+        self.c.track(1, "hover", 0.0)
+        self.c.track(2, "command", 0.0)
+        sent_ms = self.c.outstanding[1][2]
+        self.c.last_ack = sent_ms + 1.0     # a pong came back after the hover went out
+        self.c.expire(sent_ms + relay.ACK_TIMEOUT * 1000.0 + 1.0)
+        self.assertEqual(self.c.hover_unpainted, 1)
+        self.assertEqual(self.c.lost, 1)    # commands still have to be acked
+
+    def test_outstanding_is_bounded(self):
+        with mock.patch.object(relay, "MAX_OUTSTANDING", 4):
+            for seq in range(1, 7):
+                self.c.track(seq, "command", 0.0)
+        self.assertEqual(list(self.c.outstanding), [3, 4, 5, 6])
+        self.assertEqual(self.c.lost, 2)
+
+    def test_hover_pauses_without_acks(self):
+        self.c.last_ack = 0.0
+        self.assertTrue(self.c.hover_live(relay.HOVER_ACK_TIMEOUT * 1000.0 - 1.0))
+        self.assertFalse(self.c.hover_live(relay.HOVER_ACK_TIMEOUT * 1000.0 + 1.0))
+
+
+class ClockOffsetTest(unittest.TestCase):
+    def test_lowest_round_trip_ping_gives_the_offset(self):
+        r = LocalRelay(port=PORT)
+        c = make_client()
+        # t2 (our receive time) is fixed by the patched clock; the fast ping is exact,
+        # the slow one answered late and would put the offset 100 ms off
+        with mock.patch.object(protocol, "monotonic_ms", return_value=1000.0):
+            r._on_pong(c, {"type": "pong", "t0": 800.0, "t1": 900.0 + OFFSET_MS + 100.0})
+            self.assertAlmostEqual(c.offset_ms, OFFSET_MS + 100.0)
+            r._on_pong(c, {"type": "pong", "t0": 990.0, "t1": 995.0 + OFFSET_MS})
+            r._on_pong(c, {"type": "pong", "t0": "bad"})
+        self.assertAlmostEqual(c.offset_ms, OFFSET_MS)
+        self.assertEqual(c.last_ack, 1000.0)
+        self.assertEqual(len(c.pings), 2)
+
+
+class HandlerErrorTest(unittest.TestCase):
+    def test_a_failing_handler_drops_only_that_message(self):
+        r = LocalRelay(port=PORT)
+        seen = []
+
+        def on_labels(page, msg):
+            if msg.get("bad"):
+                raise KeyError("id")
+            seen.append(msg["n"])
+
+        r.handlers["labels"] = on_labels
+        c = make_client()
+        for n, bad in ((1, False), (2, True), (3, False)):
+            r._on_message(c, json.dumps({"type": "labels", "n": n, "bad": bad}))
+        self.assertEqual(seen, [1, 3])
+        self.assertEqual(r.stats()["handler_errors"], 1)
+
+
+class LiveRelayTest(unittest.TestCase):
+    """A page with a clock 5 s ahead acks commands over a real socket."""
+
+    def setUp(self):
+        patcher = mock.patch.object(relay, "PING_INTERVAL", 0.1)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.relay = LocalRelay(port=PORT)
+        self.relay.start()
+        self.addCleanup(self.relay.stop)
+
+    async def page(self, commands, apply_ms=10.0):
+        import websockets
+        acked = 0
+        async with websockets.connect(f"ws://localhost:{PORT}") as ws:
+            await ws.send(json.dumps({"type": "hello", "role": "page", "topics": ["command"],
+                                      "acks": True}))
+            deadline = time.time() + 5.0
+            while acked < commands and time.time() < deadline:
+                try:
+                    msg = json.loads(await asyncio.wait_for(ws.recv(), 0.2))
+                except asyncio.TimeoutError:
+                    continue
+                page_now = protocol.monotonic_ms() + OFFSET_MS
+                if msg.get("type") == "welcome":
+                    self.assertTrue(msg["acks"])
+                elif msg.get("type") == "ping":
+                    await ws.send(json.dumps({"type": "pong", "t0": msg["t0"], "t1": page_now}))
+                elif "seq" in msg:
+                    await ws.send(json.dumps({"type": "ack", "acks": [[msg["seq"], page_now + apply_ms]]}))
+                    acked += 1
+            await asyncio.sleep(0.1)    # let the last ack land
+            (stats,) = self.relay.stats()["clients"].values()
+        return acked, stats
+
+    def test_acks_and_offset_over_the_wire(self):
+        async def run():
+            page = asyncio.ensure_future(self.page(commands=5))
+            while not self.relay.connected:
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.3)    # a few pings first, so the offset is known
+            for _ in range(5):
+                self.relay.send({"command": "click", "capture_ts": time.time()})
+                await asyncio.sleep(0.02)
+            return await page
+
+        acked, stats = asyncio.run(run())
+        self.assertEqual(acked, 5)
+        self.assertEqual((stats["acked"], stats["lost"]), (5, 0))
+        self.assertAlmostEqual(stats["offset_ms"], OFFSET_MS, delta=50.0)
+        # capture -> applied is the 10 ms the page took plus the trip over localhost
+        self.assertEqual(stats["latency_ms"]["command"]["n"], 5)
+        self.assertGreaterEqual(stats["latency_ms"]["command"]["p50"], 5.0)
+        self.assertLess(stats["latency_ms"]["command"]["p50"], 200.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+# test_stt_pool.py
+"""
+RecognizerPool: in-order delivery, head timeout and late results
+----------------------------------------------------------------
+Fake recognizers that finish out of order or hang; no microphone needed:
+
+  python -m unittest test_stt_pool
+"""
+
+import threading
+import time
+import unittest
+
+from stt_pool import RecognizerPool
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+class FakeRecognizer:
+    """recognize(audio) blocks until release(audio); the text is the audio's name."""
+
+    def __init__(self):
+        self._gates = {}
+        self._lock = threading.Lock()
+        self.started = []
+
+    def _gate(self, audio):
+        with self._lock:
+            return self._gates.setdefault(audio, threading.Event())
+
+    def release(self, audio):
+        self._gate(audio).set()
+
+    def __call__(self, audio):
+        self.started.append(audio)
+        if not self._gate(audio).wait(10.0):
+            raise TimeoutError(audio)
+        if audio.startswith("bad"):
+            raise ValueError(audio)
+        return audio
+
+
+class PoolTest(unittest.TestCase):
+    def make_pool(self, **kwargs):
+        self.recognizer = FakeRecognizer()
+        self.results = []
+        self.errors = []
+        kwargs.setdefault("workers", 3)
+        kwargs.setdefault("max_age", 10.0)
+        pool = RecognizerPool(self.recognizer, lambda text, audio, info: self.results.append(text),
+                              on_error=lambda exc, info: self.errors.append(str(exc)), **kwargs)
+        self.addCleanup(pool.close)
+        self.addCleanup(lambda: [self.recognizer.release(a) for a in list(self.recognizer.started)])
+        return pool
+
+
+class InOrderTest(PoolTest):
+    def test_results_finishing_out_of_order_are_applied_in_capture_order(self):
+        pool = self.make_pool(head_timeout=10.0)
+        for audio in ("one", "two", "three"):
+            pool.submit(audio)
+        self.assertTrue(wait_for(lambda: len(self.recognizer.started) == 3))
+
+        self.recognizer.release("three")
+        self.recognizer.release("two")
+        time.sleep(0.2)
+        self.assertEqual(self.results, [])      # both wait behind "one"
+
+        self.recognizer.release("one")
+        self.assertTrue(wait_for(lambda: len(self.results) == 3))
+        self.assertEqual(self.results, ["one", "two", "three"])
+        self.assertEqual(pool.stats()["applied"], 3)
+
+    def test_errors_keep_their_place_in_line(self):
+        pool = self.make_pool(head_timeout=10.0)
+        for audio in ("one", "bad", "three"):
+            pool.submit(audio)
+        for audio in ("three", "bad", "one"):
+            self.recognizer.release(audio)
+        self.assertTrue(wait_for(lambda: len(self.results) == 2))
+        self.assertEqual(self.results, ["one", "three"])
+        self.assertEqual(self.errors, ["bad"])
+        self.assertEqual(pool.stats()["errors"], 1)
+
+    def test_full_queue_drops_the_oldest_waiting(self):
+        pool = self.make_pool(workers=1, max_queue=2, head_timeout=10.0)
+        pool.submit("busy")
+        self.assertTrue(wait_for(lambda: self.recognizer.started == ["busy"]))
+        for audio in ("a", "b", "c"):
+            pool.submit(audio)
+        for audio in ("busy", "a", "b", "c"):
+            self.recognizer.release(audio)
+        self.assertTrue(wait_for(lambda: len(self.results) == 3))
+        self.assertEqual(self.results, ["busy", "b", "c"])
+        self.assertEqual(pool.stats()["dropped_full"], 1)
+
+
+class HeadTimeoutTest(PoolTest):
+    def test_hanging_head_is_given_up_on(self):
+        pool = self.make_pool(head_timeout=0.3)
+        pool.submit("hangs")
+        pool.submit("fast")
+        self.assertTrue(wait_for(lambda: len(self.recognizer.started) == 2))
+        self.recognizer.release("fast")
+
+        started = time.time()
+        self.assertTrue(wait_for(lambda: self.results == ["fast"], timeout=2.0))
+        self.assertGreaterEqual(time.time() - started, 0.2)
+        self.assertEqual(pool.stats()["dropped_stale"], 1)
+
+    def test_late_result_is_dropped_and_not_kept(self):
+        pool = self.make_pool(head_timeout=0.3)
+        pool.submit("hangs")
+        pool.submit("fast")
+        self.assertTrue(wait_for(lambda: len(self.recognizer.started) == 2))
+        self.recognizer.release("fast")
+        self.assertTrue(wait_for(lambda: self.results == ["fast"], timeout=2.0))
+
+        self.recognizer.release("hangs")
+        self.assertTrue(wait_for(lambda: pool.stats()["dropped_late"] == 1))
+        pool.submit("later")
+        self.recognizer.release("later")
+        self.assertTrue(wait_for(lambda: len(self.results) == 2))
+        self.assertEqual(self.results, ["fast", "later"])
+        self.assertEqual(pool._done, {})
+        self.assertEqual(pool.stats()["in_flight"], 0)
+
+    def test_slow_head_without_waiting_results_is_not_dropped(self):
+        pool = self.make_pool(head_timeout=0.1)
+        pool.submit("slow")
+        self.assertTrue(wait_for(lambda: self.recognizer.started == ["slow"]))
+        time.sleep(0.3)     # nothing waits behind it, so it may take its time
+        self.recognizer.release("slow")
+        self.assertTrue(wait_for(lambda: self.results == ["slow"]))
+        self.assertEqual(pool.stats()["dropped_stale"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
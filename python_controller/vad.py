@@ -0,0 +1,188 @@
+# vad.py
+"""
+Voice activity detection + endpointing
+--------------------------------------
+- FrameVad: per-frame speech/non-speech decision (20 ms frames) from
+  energy above an adaptive noise floor plus two spectral checks (share of
+  energy in the speech band, spectral flatness); no network, NumPy only
+- The noise floor tracks the room continuously: it falls quickly and rises
+  slowly while nobody is speaking, so there is no one-off calibration
+- Endpointer: groups frames into utterances with a pre-roll buffer (onsets
+  aren't clipped) and ends them ~200 ms after speech stops
+- VadListener: reads the microphone and hands finished utterances to a
+  callback (e.g. stt_pool.RecognizerPool.submit)
+"""
+
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from metrics import NULL_METRICS
+
+VAD_FRAME_MS = 20
+VAD_MARGIN_DB = 9.0         # speech must be this far above the noise floor
+VAD_BAND = (80.0, 4000.0)   # Hz, voice fundamentals + formants; excludes rumble and hiss
+VAD_MIN_BAND_RATIO = 0.6    # share of frame energy that must be inside VAD_BAND
+VAD_MAX_FLATNESS = 0.45     # noise is spectrally flat (~1), voiced speech isn't
+VAD_FLOOR_FALL = 0.2        # per frame, towards quieter frames
+VAD_FLOOR_RISE = 0.01       # per non-speech frame, towards louder frames
+VAD_FLOOR_DRIFT = 0.0005    # per speech frame, so a new steady noise is learned eventually
+
+
+class FrameVad:
+    def __init__(self, sample_rate=16000, frame_ms=VAD_FRAME_MS, noise_floor_db=None,
+                 margin_db=VAD_MARGIN_DB):
+        self.sample_rate = sample_rate
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self.margin_db = margin_db
+        self.noise_floor_db = noise_floor_db
+        self._window = np.hanning(self.frame_samples).astype(np.float32)
+        freqs = np.fft.rfftfreq(self.frame_samples, 1.0 / sample_rate)
+        self._band = (freqs >= VAD_BAND[0]) & (freqs <= VAD_BAND[1])
+        self.last = {}
+
+    def is_speech(self, frame):
+        """frame: int16 mono PCM bytes (or array) of frame_samples samples."""
+        x = np.frombuffer(frame, dtype=np.int16).astype(np.float32)
+        if len(x) != self.frame_samples:
+            x = np.resize(x, self.frame_samples)
+        energy_db = 10.0 * float(np.log10(float(np.dot(x, x)) / len(x) + 1e-3))
+
+        if self.noise_floor_db is None:
+            self.noise_floor_db = energy_db
+        loud = energy_db > self.noise_floor_db + self.margin_db
+        speech = False
+        band_ratio = flatness = None
+        if loud:
+            power = np.abs(np.fft.rfft(x * self._window)) ** 2 + 1e-9
+            band = power[self._band]
+            band_ratio = float(band.sum() / power.sum())
+            flatness = float(np.exp(np.log(band).mean()) / band.mean())
+            speech = band_ratio >= VAD_MIN_BAND_RATIO and flatness <= VAD_MAX_FLATNESS
+
+        floor = self.noise_floor_db
+        if energy_db < floor:
+            floor += VAD_FLOOR_FALL * (energy_db - floor)
+        elif not speech:
+            floor += VAD_FLOOR_RISE * (energy_db - floor)
+        else:
+            floor += VAD_FLOOR_DRIFT * (energy_db - floor)
+        self.noise_floor_db = floor
+        self.last = {"energy_db": energy_db, "floor_db": floor, "band_ratio": band_ratio,
+                     "flatness": flatness, "speech": speech}
+        return speech
+
+
+class Endpointer:
+    """Feeds frames through a FrameVad; feed() returns a finished utterance (bytes) or None."""
+
+    def __init__(self, vad, pre_roll_ms=300, hangover_ms=200, start_ms=40, min_speech_ms=80,
+                 max_utterance_s=6.0, frame_ms=VAD_FRAME_MS):
+        self.vad = vad
+        self.frame_ms = frame_ms
+        self.start_frames = max(1, start_ms // frame_ms)
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.max_frames = int(max_utterance_s * 1000 // frame_ms)
+        self._pre_roll = deque(maxlen=max(1, pre_roll_ms // frame_ms))
+        self._frames = []
+        self._in_speech = False
+        self._run = 0               # consecutive speech frames (before start) / silent frames (during)
+        self._voiced = 0
+
+    @property
+    def in_speech(self):
+        return self._in_speech
+
+    def feed(self, frame):
+        speech = self.vad.is_speech(frame)
+        if not self._in_speech:
+            self._pre_roll.append(frame)
+            self._run = self._run + 1 if speech else 0
+            if self._run >= self.start_frames:
+                self._in_speech = True
+                self._frames = list(self._pre_roll)
+                self._pre_roll.clear()
+                self._voiced = self._run
+                self._run = 0
+            return None
+
+        self._frames.append(frame)
+        if speech:
+            self._voiced += 1
+            self._run = 0
+        else:
+            self._run += 1
+        if self._run >= self.hangover_frames or len(self._frames) >= self.max_frames:
+            return self._finish()
+        return None
+
+    def _finish(self):
+        frames, voiced = self._frames, self._voiced
+        self._frames = []
+        self._in_speech = False
+        self._run = self._voiced = 0
+        if voiced < self.min_speech_frames:
+            return None
+        return b"".join(frames)
+
+
+class VadListener:
+    """
+    Replacement for Recognizer.listen_in_background: `on_audio(pcm, sample_rate,
+    sample_width, ended_at)` gets each utterance as soon as the endpointer closes it.
+    """
+
+    def __init__(self, on_audio, sample_rate=16000, noise_floor_db=None, hangover_ms=200,
+                 pre_roll_ms=300, max_utterance_s=6.0, metrics=NULL_METRICS):
+        self.on_audio = on_audio
+        self.sample_rate = sample_rate
+        self.vad = FrameVad(sample_rate, noise_floor_db=noise_floor_db)
+        self.endpointer = Endpointer(self.vad, pre_roll_ms=pre_roll_ms, hangover_ms=hangover_ms,
+                                     max_utterance_s=max_utterance_s)
+        self.metrics = metrics
+        self._running = False
+        self._thread = None
+
+        # counters
+        self.frames = 0
+        self.utterances = 0
+
+    @property
+    def chunk_size(self):
+        return self.vad.frame_samples
+
+    def listen_in_background(self, mic):
+        """`mic` should be opened with sample_rate and chunk_size matching this listener."""
+        self._running = True
+        self._thread = threading.Thread(target=self._run, args=(mic,), name="vad-listener", daemon=True)
+        self._thread.start()
+
+        def stopper(wait_for_stop=True):
+            self._running = False
+            if wait_for_stop and self._thread is not None:
+                self._thread.join()
+        return stopper
+
+    def _run(self, mic):
+        with mic as source:
+            width = source.SAMPLE_WIDTH
+            while self._running:
+                data = source.stream.read(self.chunk_size)
+                t0 = time.perf_counter()
+                pcm = self.endpointer.feed(data)
+                self.metrics.observe("vad.frame", time.perf_counter() - t0)
+                self.frames += 1
+                if pcm is not None:
+                    self.utterances += 1
+                    self.on_audio(pcm, self.sample_rate, width, time.time())
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "utterances": self.utterances,
+            "in_speech": self.endpointer.in_speech,
+            "noise_floor_db": round(self.vad.noise_floor_db or 0.0, 1),
+        }
@@ -0,0 +1,104 @@
+# vosk_listener.py
+"""
+Streaming offline speech recognition (Vosk)
+-------------------------------------------
+- Reads microphone chunks continuously on its own thread
+- Fires short, complete commands ("scroll down", "click") from partial
+  hypotheses instead of waiting for the end of the phrase
+- Everything else is handed over as a final transcript
+
+Needs `pip install vosk` and an unpacked model, e.g. vosk-model-small-en-us-0.15
+from https://alphacephei.com/vosk/models
+"""
+
+import json
+import os
+import threading
+import time
+
+import vosk
+
+
+class VoskStreamListener:
+    """
+    `on_text(text, partial)` is called with either a partial command that just
+    fired (partial=True) or a final transcript (partial=False).
+
+    `terminal_phrases` fire as soon as a partial equals them. `open_phrases`
+    may still be followed by a target ("click" -> "click login"), so they only
+    fire once the partial has stayed unchanged for `stable_after` seconds. If
+    the final transcript then turns out to carry that target after all, it
+    is dropped rather than sent on as a command of its own.
+    """
+
+    def __init__(self, model_path, on_text, terminal_phrases=(), open_phrases=(),
+                 sample_rate=16000, stable_after=0.3):
+        if not os.path.isdir(model_path):
+            raise FileNotFoundError(f"Vosk model not found at {model_path!r}")
+        vosk.SetLogLevel(-1)
+        self.model = vosk.Model(model_path)
+        self.on_text = on_text
+        self.terminal_phrases = set(terminal_phrases)
+        self.open_phrases = set(open_phrases)
+        self.sample_rate = sample_rate
+        self.stable_after = stable_after
+
+        self._running = False
+        self._thread = None
+        self._partial = ""
+        self._partial_since = 0.0
+        self._fired = None      # phrase already acted on for the current utterance
+        self._fired_open = False    # ...and whether it was an open phrase
+
+    def listen_in_background(self, mic):
+        """Start streaming from a speech_recognition Microphone; returns a stopper like sr does."""
+        self._running = True
+        self._thread = threading.Thread(target=self._run, args=(mic,), name="vosk-listener", daemon=True)
+        self._thread.start()
+
+        def stopper(wait_for_stop=True):
+            self._running = False
+            if wait_for_stop and self._thread is not None:
+                self._thread.join()
+        return stopper
+
+    def _run(self, mic):
+        rec = vosk.KaldiRecognizer(self.model, self.sample_rate)
+        with mic as source:
+            while self._running:
+                data = source.stream.read(source.CHUNK)
+                if rec.AcceptWaveform(data):
+                    self._on_final(json.loads(rec.Result()).get("text", ""))
+                else:
+                    self._on_partial(json.loads(rec.PartialResult()).get("partial", ""))
+
+    def _on_partial(self, text, now=None):
+        text = text.strip()
+        now = time.time() if now is None else now
+        if text != self._partial:
+            self._partial = text
+            self._partial_since = now
+        if not text or self._fired is not None:
+            return
+        if text in self.terminal_phrases or (
+                text in self.open_phrases and now - self._partial_since >= self.stable_after):
+            self._fired = text
+            self._fired_open = text not in self.terminal_phrases
+            self.on_text(text, True)
+
+    def _on_final(self, text):
+        text = text.strip()
+        fired, self._fired = self._fired, None
+        self._partial = ""
+        if fired is not None:
+            # the head of this utterance was already acted on; only pass on the rest
+            words, head = text.split(), fired.split()
+            if words[:len(head)] != head:
+                return
+            text = " ".join(words[len(head):])
+            if text and self._fired_open:
+                # the pause after "click" wasn't the end: this is its target, too late
+                print(f"[voice] Dropped late target {text!r} after {fired!r}")
+                return
+        if text:
+            self.on_text(text, False)
@@ -1,20 +1,97 @@
 const WebSocket = require('ws');
 const wss = new WebSocket.Server({ port: 8765 });
 
+// Hover wire formats (see python_controller/protocol.py)
+//   json: {"x", "y", "seq", "ts"} text frames
+//   bin1: 20-byte little-endian frame: u8 type, u8 version, u16 reserved,
+//         u32 seq, f64 ts (ms), i16 x, i16 y
+const HOVER_FORMATS = ['bin1', 'json'];
+const MSG_HOVER = 0x01;
+const PROTOCOL_VERSION = 1;
+const BIN1_LENGTH = 20;
+// page -> controller messages only the embedded relay (python_controller/relay.py)
+// handles; not forwarded or logged, so they don't flood the other tabs and the controller
+const LOCAL_TYPES = new Set(['labels', 'page_focus', 'ack', 'pong']);
+// high-rate reports (scroll velocity, ~120 Hz) are forwarded but only logged with DEBUG=1
+const QUIET_TYPES = new Set(['scroll']);
+const DEBUG = Boolean(process.env.DEBUG);
+const DEADBAND_PX = process.env.DEADBAND_PX !== undefined ? Number(process.env.DEADBAND_PX) : null;
+
+function decodeHover(buf) {
+    if (buf.length !== BIN1_LENGTH || buf.readUInt8(0) !== MSG_HOVER || buf.readUInt8(1) !== PROTOCOL_VERSION) {
+        return null;
+    }
+    return {
+        seq: buf.readUInt32LE(4),
+        ts: buf.readDoubleLE(8),
+        x: buf.readInt16LE(16),
+        y: buf.readInt16LE(18)
+    };
+}
+
+function handleHello(ws, msg) {
+    const offered = Array.isArray(msg.hover_formats) ? msg.hover_formats : [];
+    ws.role = msg.role || 'client';
+    ws.stations = new Set(Array.isArray(msg.stations) ? msg.stations : []);
+    ws.hoverFormat = offered.find(f => HOVER_FORMATS.includes(f)) || 'json';
+    const deadband = DEADBAND_PX !== null ? DEADBAND_PX : (Number(msg.deadband_px) || 0);
+    ws.send(JSON.stringify({ type: 'welcome', hover_format: ws.hoverFormat, deadband_px: deadband }));
+    console.log(`${ws.role} connected (hover=${ws.hoverFormat}, deadband=${deadband}px)`);
+}
+
+function broadcastHover(sender, raw, hover) {
+    let asJson = null;
+    wss.clients.forEach(client => {
+        if (client === sender || client.readyState !== WebSocket.OPEN) return;
+        if (client.hoverFormat === 'bin1') {
+            client.send(raw, { binary: true });
+        } else {
+            // clients that never said hello get the old JSON shape
+            if (asJson === null) asJson = JSON.stringify(hover);
+            client.send(asJson);
+        }
+    });
+}
+
 wss.on('connection', ws => {
-    console.log('Python controller connected');
+    ws.hoverFormat = 'json';
+    console.log('Client connected');
+
+    ws.on('message', (message, isBinary) => {
+        if (isBinary) {
+            const hover = decodeHover(message);
+            if (hover) broadcastHover(ws, message, hover);
+            return;
+        }
 
-    ws.on('message', message => {
-        console.log('Received:', message);
-        // Broadcast to all clients (Chrome extensions)
+        const text = message.toString();
+        let msg = null;
+        try { msg = JSON.parse(text); } catch (e) { /* forward as-is */ }
+        if (msg && msg.type === 'hello') {
+            handleHello(ws, msg);
+            return;
+        }
+        if (msg && LOCAL_TYPES.has(msg.type)) {
+            // meant for the embedded relay (page index, acks); nobody here uses them
+            return;
+        }
+        const isHover = msg && msg.x !== undefined && msg.y !== undefined && msg.command === undefined;
+        const isQuiet = msg && QUIET_TYPES.has(msg.type);
+        if (!isHover && (!isQuiet || DEBUG)) {
+            // hover updates are far too frequent to log
+            console.log('Received:', text);
+        }
+        // Broadcast to all other clients (Chrome extensions); messages from an
+        // extra camera station only go to clients that asked for that station
+        const station = msg ? msg.station : undefined;
         wss.clients.forEach(client => {
-            if(client.readyState === WebSocket.OPEN){
-                client.send(message);
-            }
+            if (client === ws || client.readyState !== WebSocket.OPEN) return;
+            if (station !== undefined && !(client.stations && client.stations.has(station))) return;
+            client.send(text);
         });
     });
 
-    ws.on('close', () => console.log('Python disconnected'));
+    ws.on('close', () => console.log(`${ws.role || 'Client'} disconnected`));
 });
 
 console.log('WebSocket server running on ws://localhost:8765');